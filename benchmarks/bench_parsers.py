@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+解析函数性能测试
+使用方法: python benchmarks/bench_parsers.py [-n 次数] [关键字 ...]
+
+使用 fixtures 目录中保存的页面，测量各解析函数的每秒调用次数和单次调用的内存峰值。
+所有用例都传入预先准备好的条目信息，不会发出网络请求。
+
+fixtures 中的页面（条目详情页、想看列表、片单、广播和 search_subjects 接口返回的 JSON）都是按豆瓣页面结构合成的，
+不是抓取的真实页面，也不包含任何用户的数据；结果适合比较不同实现的相对性能，绝对数值与真实页面会有差异。
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+# 添加父目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bs4 import BeautifulSoup
+
+from src.utils.douban_utils import parse_api_item
+from src.utils.subject_extractor import extract_subject_info
+from src.parsers.parse_douban import parse_movie_item
+from src.parsers.parse_douban_doulist import parse_doulist_item, get_page_count
+from src.parsers.parse_douban_status import process_status
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def read_fixture(name):
+    """读取测试页面"""
+    with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+        return f.read()
+
+
+def build_cases():
+    """准备测试用例，返回 [(名称, 函数, 参数列表)]，每次调用依次使用下一组参数"""
+    movie_html = read_fixture('subject_movie.html')
+    tv_html = read_fixture('subject_tv.html')
+    movie_info = extract_subject_info(movie_html)
+    tv_info = extract_subject_info(tv_html)
+
+    wish_items = BeautifulSoup(read_fixture('list_wish.html'), 'html.parser').find_all('div', class_='item')
+    doulist_html = read_fixture('doulist.html')
+    doulist_items = BeautifulSoup(doulist_html, 'html.parser').select('.doulist-item')
+    status_items = BeautifulSoup(read_fixture('status.html'), 'html.parser').find_all('div', class_='status-wrapper')
+    api_items = json.loads(read_fixture('search_subjects.json'))['subjects']
+
+    return [
+        ('extract_subject_info[movie]', extract_subject_info, [(movie_html,)]),
+        ('extract_subject_info[tv]', extract_subject_info, [(tv_html,)]),
+        ('parse_movie_item', parse_movie_item, [(item, '', movie_info) for item in wish_items]),
+        ('parse_doulist_item', parse_doulist_item, [(item, '', movie_info) for item in doulist_items]),
+        ('get_page_count', get_page_count, [(doulist_html,)]),
+        ('process_status[early_check]', lambda status: process_status(status, '', early_check=True),
+         [(status,) for status in status_items]),
+        ('parse_api_item', parse_api_item,
+         [(item, '', tv_info if index % 2 else movie_info) for index, item in enumerate(api_items)]),
+    ]
+
+
+def run_case(func, args_list, repeat):
+    """运行单个用例，返回 (每秒调用次数, 单次调用内存峰值 KB)"""
+    calls = max(repeat, len(args_list))
+
+    # 预热一轮
+    for args in args_list:
+        func(*args)
+
+    start = time.perf_counter()
+    for index in range(calls):
+        func(*args_list[index % len(args_list)])
+    elapsed = time.perf_counter() - start
+
+    # 单独统计每组参数的内存峰值，取平均
+    peaks = []
+    tracemalloc.start()
+    try:
+        for args in args_list:
+            tracemalloc.reset_peak()
+            baseline, _ = tracemalloc.get_traced_memory()
+            func(*args)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+    finally:
+        tracemalloc.stop()
+
+    return calls / elapsed, sum(peaks) / len(peaks) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='解析函数性能测试')
+    parser.add_argument('-n', '--repeat', type=int, default=200, help='每个用例的调用次数')
+    parser.add_argument('keywords', nargs='*', help='只运行名称包含这些关键字的用例')
+    args = parser.parse_args()
+
+    cases = build_cases()
+    if args.keywords:
+        cases = [case for case in cases if any(keyword in case[0] for keyword in args.keywords)]
+
+    print(f"{'用例':<30} {'次/秒':>12} {'内存峰值 KB/次':>16}")
+    for name, func, args_list in cases:
+        # 解析函数会输出处理进度，测试时屏蔽
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            ops, peak_kb = run_case(func, args_list, args.repeat)
+        print(f"{name:<30} {ops:>12.1f} {peak_kb:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
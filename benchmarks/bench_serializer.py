@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+"""
+数据文件序列化对比测试
+使用方法: python benchmarks/bench_serializer.py [-n 条目数] [-r 重复次数]
+
+生成与 movies.json 结构相同的数据（默认 10000 个条目），比较各格式的文件大小、写入（序列化）
+和读取（解析）耗时，并检查每种格式都能还原出相同的数据。未安装的编码库会被跳过。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+# 添加父目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils import serializer
+
+
+def build_movies_data(item_count, users=5):
+    """生成 movies.json 结构的数据：{用户ID: {'movies': [...], 'tv_shows': [...]}}"""
+    data = {}
+    for index in range(item_count):
+        user_id = f'user{index % users}'
+        is_tv = index % 4 == 0
+        subject_id = str(30000000 + index)
+        item = {
+            'title': f'条目标题{index}',
+            'subtitle': f'Subject Title {index}',
+            'full_title': f'条目标题{index} / Subject Title {index}',
+            'info': [f'{2000 + index % 25}-0{index % 9 + 1}-15(中国大陆)', '导演甲', '演员乙', '演员丙', '剧情 / 爱情'],
+            'date_added': f'2025-0{index % 9 + 1}-{index % 28 + 1:02d}',
+            'cover_url': f'https://img1.doubanio.com/view/photo/s_ratio_poster/public/p{2900000000 + index}.jpg',
+            'url': f'https://movie.douban.com/subject/{subject_id}/',
+            'playable': index % 3 == 0,
+            'type': 'tv' if is_tv else 'movie',
+            'id': subject_id,
+            'imdb_id': f'tt{9000000 + index}' if index % 5 else None,
+            'notified': True,
+            'source': 'wish' if index % 2 else 'collect',
+        }
+        user_data = data.setdefault(user_id, {'movies': [], 'tv_shows': []})
+        user_data['tv_shows' if is_tv else 'movies'].append(item)
+    return data
+
+
+def build_variants():
+    """返回 [(名称, 序列化函数, 解析函数)]"""
+    variants = [
+        ('json indent (原格式)',
+         lambda data: json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8'),
+         lambda raw: json.loads(raw.decode('utf-8'))),
+        ('json compact',
+         lambda data: json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+         lambda raw: json.loads(raw.decode('utf-8'))),
+    ]
+    if serializer.orjson is not None:
+        orjson = serializer.orjson
+        variants += [
+            ('orjson indent', lambda data: orjson.dumps(data, option=orjson.OPT_INDENT_2), orjson.loads),
+            ('orjson compact', orjson.dumps, orjson.loads),
+        ]
+    if serializer.msgpack is not None:
+        msgpack = serializer.msgpack
+        variants.append(('msgpack',
+                         lambda data: msgpack.packb(data, use_bin_type=True),
+                         lambda raw: msgpack.unpackb(raw, raw=False, strict_map_key=False)))
+    return variants
+
+
+def time_per_call(func, arg, repeat):
+    """返回单次调用的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(arg)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据文件序列化对比测试')
+    parser.add_argument('-n', '--items', type=int, default=10000, help='生成的条目数')
+    parser.add_argument('-r', '--repeat', type=int, default=5, help='每种格式重复的次数')
+    args = parser.parse_args()
+
+    data = build_movies_data(args.items)
+    missing = [name for name, module in (('orjson', serializer.orjson), ('msgpack', serializer.msgpack)) if module is None]
+    print(f"{args.items} 个条目，重复 {args.repeat} 次" + (f"（未安装: {', '.join(missing)}）" if missing else ''))
+    print(f"{'格式':<22} {'大小 KB':>10} {'写入 ms':>10} {'读取 ms':>10}")
+
+    for name, dumps, loads in build_variants():
+        raw = dumps(data)
+        if loads(raw) != data or serializer.loads(raw) != data:
+            print(f"{name}: 解析结果与原数据不一致！")
+            sys.exit(1)
+
+        dump_ms = time_per_call(dumps, data, args.repeat)
+        load_ms = time_per_call(loads, raw, args.repeat)
+        print(f"{name:<22} {len(raw) / 1024:>10.0f} {dump_ms:>10.1f} {load_ms:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
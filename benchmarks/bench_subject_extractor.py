@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+条目详情页解析对比测试
+使用方法: python benchmarks/bench_subject_extractor.py [重复次数]
+
+对比整页解析（原实现）与只解析所需片段的耗时，并检查两者提取的结果完全一致
+
+fixtures 中的两个条目详情页是按豆瓣页面结构合成的，不是抓取的真实页面：电影和剧集使用同一个模板，
+主要区别在标题和信息区（#info、评分、简介、JSON-LD），页头脚本、评论和推荐等区块按真实页面的大小重复填充。
+结果适合比较不同实现的相对耗时，绝对耗时与真实页面会有差异
+"""
+
+import os
+import sys
+import time
+
+# 添加父目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from src.utils.subject_extractor import extract_subject_info, DEFAULT_BACKEND
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+SUBJECT_FIXTURES = ['subject_movie.html', 'subject_tv.html']
+
+
+def time_per_call(func, repeat):
+    """返回单次调用的平均耗时（毫秒）"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+    variants = [
+        ('整页 html.parser', lambda html: extract_subject_info(html, backend='html.parser', scoped=False)),
+        ('片段 html.parser', lambda html: extract_subject_info(html, backend='html.parser')),
+    ]
+    if DEFAULT_BACKEND != 'html.parser':
+        variants.append((f'片段 {DEFAULT_BACKEND}', lambda html: extract_subject_info(html)))
+
+    for name in SUBJECT_FIXTURES:
+        with open(os.path.join(FIXTURES_DIR, name), encoding='utf-8') as f:
+            html = f.read()
+
+        print(f"\n{name} ({len(html) / 1024:.0f} KB, 重复 {repeat} 次)")
+
+        baseline_info = variants[0][1](html)
+        baseline_ms = None
+        for label, func in variants:
+            if func(html) != baseline_info:
+                print(f"  {label}: 提取结果与整页解析不一致！")
+                sys.exit(1)
+
+            ms = time_per_call(lambda: func(html), repeat)
+            baseline_ms = baseline_ms or ms
+            print(f"  {label:<20} {ms:8.2f} ms/页  {baseline_ms / ms:6.1f}x")
+
+
+if __name__ == '__main__':
+    main()
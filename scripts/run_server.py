@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""
+以生产模式启动豆瓣RSS API服务
+使用 gunicorn 的多个工作进程（每个进程多个线程）提供服务，订阅轮询可以用上多个 CPU 核心；
+定时任务只在其中一个进程中运行。未安装 gunicorn 时使用多线程的 werkzeug 服务器（单进程，不开启调试模式）
+使用方法: python run_server.py
+"""
+
+import sys
+import os
+import logging
+
+# 添加父目录到 Python 路径
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# 监听地址，端口与Dockerfile中的EXPOSE设置一致
+BIND_HOST = '0.0.0.0'
+BIND_PORT = 9150
+
+# 默认每个工作进程的线程数
+DEFAULT_THREADS = 4
+
+
+def get_server_options():
+    """读取配置中的工作进程数（server_workers，默认为 CPU 核心数）和每个进程的线程数（server_threads）"""
+    from src.utils.douban_utils import load_config
+    config = load_config()
+    workers = config.get('server_workers') or os.cpu_count() or 1
+    threads = config.get('server_threads') or DEFAULT_THREADS
+    return max(int(workers), 1), max(int(threads), 1)
+
+
+def run_gunicorn(workers, threads):
+    """使用 gunicorn 启动：每个工作进程加载 src.api.wsgi（注册路由并启动定时器）"""
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', f"{BIND_HOST}:{BIND_PORT}")
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('worker_class', 'gthread')
+            # 不预先加载应用：定时器线程和调度锁需要在各个工作进程中创建
+            self.cfg.set('preload_app', False)
+            self.cfg.set('accesslog', None)
+
+        def load(self):
+            from src.api.wsgi import app
+            return app
+
+    print(f"✅ 使用 gunicorn 启动: {workers} 个工作进程, 每个进程 {threads} 个线程")
+    Server().run()
+
+
+def run_werkzeug():
+    """未安装 gunicorn 时使用多线程的 werkzeug 服务器"""
+    from src.api.wsgi import app
+
+    # 禁用Werkzeug默认的日志输出，减少控制台信息
+    log = logging.getLogger('werkzeug')
+    log.setLevel(logging.ERROR)  # 只记录错误级别的日志
+
+    print("未安装 gunicorn，使用多线程的 werkzeug 服务器（单进程）")
+    app.run(host=BIND_HOST, port=BIND_PORT, threaded=True, debug=False)
+
+
+def main():
+    """主函数"""
+    # 设置环境变量 - 如果未设置CONFIG_DIR则使用默认路径（需在导入 src 模块之前设置）
+    if 'CONFIG_DIR' not in os.environ:
+        os.environ['CONFIG_DIR'] = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'config'))
+        print(f"已设置CONFIG_DIR环境变量为: {os.environ['CONFIG_DIR']}")
+    else:
+        print(f"使用已设置的CONFIG_DIR: {os.environ['CONFIG_DIR']}")
+
+    try:
+        workers, threads = get_server_options()
+        try:
+            import gunicorn  # noqa: F401
+        except ImportError:
+            run_werkzeug()
+        else:
+            run_gunicorn(workers, threads)
+    except Exception as e:
+        print(f"启动API服务时出错: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
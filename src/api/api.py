@@ -1,6 +1,5 @@
 from flask import Flask, jsonify, render_template, request, session, redirect, url_for, Response, g
 import json
-import re
 import os
 import subprocess
 import threading
@@ -11,6 +10,12 @@ from datetime import datetime
 import schedule
 import logging
 from logging.config import dictConfig
+from src.utils.douban_client import DoubanClient
+from src.utils import serializer
+from src.utils.data_reader import load_data_file
+from src.api.feed_server import serve_feed
+from src.utils.coordination import (get_parser_lock, get_scheduler_lock, load_parser_status, load_secret_key,
+                                    save_parser_status)
 
 # 获取当前文件所在目录的父级的父级目录（项目根目录）
 app_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../..'))
@@ -64,13 +69,21 @@ for handler in app.logger.handlers:
 scheduler_thread = None
 stop_scheduler = False
 
-# 全局变量来跟踪解析进程状态
+# 未持有调度锁的进程每隔多少秒检查一次持有调度锁的进程是否已退出
+SCHEDULER_RETRY_SECONDS = 30
+
+# 持有调度锁的进程等待期间每隔多少秒重新读取一次配置：在其他工作进程中保存的更新间隔也能及时生效
+CONFIG_CHECK_SECONDS = 5
+
+# 全局变量来跟踪解析进程状态（同时写入状态文件，多个工作进程返回相同的状态）
 parser_status = {
     "is_running": False,
     "last_run": None,
     "next_run": None,
     "current_process": None
 }
+parser_status.update(load_parser_status())
+parser_status["is_running"] = False
 
 # 获取配置目录
 CONFIG_DIR = os.getenv('CONFIG_DIR', '.')
@@ -82,13 +95,32 @@ HOT_MOVIES_FILE = os.path.join(CONFIG_DIR, 'hot_movies.json')
 HIDDEN_GEMS_FILE = os.path.join(CONFIG_DIR, 'hidden_gems.json')
 DOULIST_FILE = os.path.join(CONFIG_DIR, 'doulists.json')
 
-# 添加 session 密钥
-app.secret_key = os.urandom(24)
+# 添加 session 密钥（保存在配置目录中，所有工作进程共用，登录状态在各进程间有效）
+app.secret_key = load_secret_key()
+
+def update_parser_status(**fields):
+    """更新解析进度并写入状态文件"""
+    parser_status.update(fields)
+    save_parser_status(parser_status)
+
+def is_parser_running():
+    """解析程序是否正在运行（包括在其他工作进程中运行）"""
+    return get_parser_lock().locked()
 
 def run_parser(is_manual=False):
-    """运行解析程序"""
+    """运行解析程序
+
+    运行期间持有解析锁，其他工作进程已在运行时直接跳过
+    """
+    parser_lock = get_parser_lock()
+    if not parser_lock.acquire():
+        print("解析程序正在其他进程中运行，跳过本次运行")
+        if is_manual:
+            start_scheduler()
+        return {"status": "skipped", "tasks_count": 0}
+
     try:
-        parser_status["is_running"] = True
+        update_parser_status(is_running=True)
         config = load_config()
         
         # 获取监控配置
@@ -103,15 +135,15 @@ def run_parser(is_manual=False):
             monitors.get('status', False),  # 添加广播监控
             monitors.get('doulist', False)  # 添加片单监控
         ])
+        if total_tasks:
+            total_tasks += 1  # 最后续期条目缓存
         current_task = 0
         
-        parser_status["total_users"] = total_tasks
-        parser_status["current_user"] = 0
+        update_parser_status(total_users=total_tasks, current_user=0)
         
         def run_monitor(script_name, name):
             nonlocal current_task
-            parser_status["current_user"] = current_task + 1
-            parser_status["current_user_name"] = f"正在运行{name}..."
+            update_parser_status(current_user=current_task + 1, current_user_name=f"正在运行{name}...")
             
             # 使用新的脚本路径
             cmd = [sys.executable, os.path.join(app_root, 'scripts', 'run_parser.py'), script_name]
@@ -121,7 +153,9 @@ def run_parser(is_manual=False):
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
                 universal_newlines=True,
-                bufsize=1
+                bufsize=1,
+                # 子进程继承解析锁：本进程被重启时，子进程运行结束前其他进程不会再启动解析程序
+                pass_fds=parser_lock.pass_fds()
             )
             
             # 实时读取输出
@@ -165,6 +199,10 @@ def run_parser(is_manual=False):
         if monitors.get('doulist'):
             print("开始执行片单爬取任务...")
             run_monitor("douban_doulist", "片单监控")
+        
+        if total_tasks:
+            print("开始续期即将过期的条目缓存...")
+            run_monitor("refresh_subject_cache", "条目缓存续期")
             
         print("\n所有监控程序运行完成")
         
@@ -174,18 +212,12 @@ def run_parser(is_manual=False):
         print(f"运行监控程序时出错: {e}")
         raise
     finally:
-        parser_status["is_running"] = False
-        parser_status["last_run"] = time.strftime("%Y-%m-%d %H:%M:%S")
-        parser_status["current_process"] = None
+        update_parser_status(is_running=False, last_run=time.strftime("%Y-%m-%d %H:%M:%S"), current_process=None)
+        parser_lock.release()
         
-        # 如果是手动更新完成，重新启动自动更新
+        # 如果是手动更新完成，重新启动自动更新（下次运行时间由定时器循环更新）
         if is_manual:
             start_scheduler()
-        else:
-            # 自动更新完成后，更新下次运行时间
-            interval = config.get('update_interval', 3600)
-            parser_status["next_run"] = time.strftime("%Y-%m-%d %H:%M:%S", 
-                time.localtime(time.time() + interval))
 
 def start_scheduler():
     """启动定时器"""
@@ -199,34 +231,75 @@ def start_scheduler():
     # 重置停止标志
     stop_scheduler = False
     
-    # 更新下次运行时间
-    config = load_config()
-    interval = config.get('update_interval', 3600)
-    parser_status["next_run"] = time.strftime("%Y-%m-%d %H:%M:%S", 
-        time.localtime(time.time() + interval))
-    
     # 创建新的定时器线程
     scheduler_thread = threading.Thread(target=scheduler_loop)
     scheduler_thread.daemon = True
     scheduler_thread.start()
 
+def get_last_run():
+    """上次运行结束的时间（可能由其他工作进程记录在状态文件中）"""
+    return load_parser_status().get("last_run") or parser_status["last_run"]
+
+def seconds_until_next_run(last_run, interval):
+    """距离下次运行的秒数：从上次运行结束起等待 interval 秒，没有运行记录时等待 interval 秒"""
+    if not last_run:
+        return interval
+    try:
+        elapsed = time.time() - time.mktime(time.strptime(last_run, "%Y-%m-%d %H:%M:%S"))
+    except ValueError:
+        return interval
+    return int(min(max(interval - elapsed, 0), interval))
+
+def sleep_unless_stopped(seconds):
+    """等待指定的秒数，定时器被停止时提前返回"""
+    for _ in range(seconds):
+        if stop_scheduler:
+            break
+        time.sleep(1)
+
+def wait_for_next_run(wait, interval):
+    """等待 wait 秒到下次运行时间，返回 True；定时器被停止或配置中的更新间隔不再是 interval 时提前返回 False"""
+    for elapsed in range(wait):
+        if stop_scheduler:
+            return False
+        if elapsed and elapsed % CONFIG_CHECK_SECONDS == 0 and load_config().get('update_interval', 3600) != interval:
+            print("更新间隔已修改，重新计算下次运行时间")
+            return False
+        time.sleep(1)
+    return not stop_scheduler
+
 def scheduler_loop():
-    """定时器循环"""
+    """定时器循环：多个工作进程中只有持有调度锁的进程按时运行解析程序"""
+    scheduler_lock = get_scheduler_lock()
     while not stop_scheduler:
+        if not scheduler_lock.acquire():
+            # 其他进程负责定时运行，定期检查它是否已退出
+            sleep_unless_stopped(SCHEDULER_RETRY_SECONDS)
+            continue
+        
         config = load_config()
         interval = config.get('update_interval', 3600)
-        
-        # 等待指定的时间间隔
-        for _ in range(interval):
-            if stop_scheduler:
-                break
-            time.sleep(1)
+        last_run = get_last_run()
+        wait = seconds_until_next_run(last_run, interval)
+        update_parser_status(next_run=time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() + wait)))
+        
+        # 等待到下次运行时间；更新间隔被修改（可能是在其他工作进程中保存的配置）时重新计算
+        if not wait_for_next_run(wait, interval):
+            continue
+        
+        # 等待期间其他进程手动运行过解析程序时，重新计算下次运行时间
+        if get_last_run() != last_run:
+            continue
+        
+        if is_parser_running():
+            # 解析程序正在其他进程中运行，结束后再重新计算
+            sleep_unless_stopped(SCHEDULER_RETRY_SECONDS)
+            continue
             
-        if not stop_scheduler and not parser_status["is_running"]:
-            try:
-                run_parser()
-            except Exception as e:
-                print(f"定时任务执行出错: {e}")
+        try:
+            run_parser()
+        except Exception as e:
+            print(f"定时任务执行出错: {e}")
 
 def stop_existing_scheduler():
     """停止现有的定时器"""
@@ -239,7 +312,7 @@ def stop_existing_scheduler():
 @app.route('/run_parser', methods=['POST'])
 def start_parser():
     """启动解析程序"""
-    if parser_status["is_running"]:
+    if is_parser_running():
         return jsonify({
             "status": "error",
             "message": "解析程序正在运行中"
@@ -259,14 +332,28 @@ def start_parser():
 
 @app.route('/parser_status')
 def get_parser_status():
-    """获取解析程序状态"""
+    """获取解析程序状态（解析程序可能在其他工作进程中运行，从状态文件读取）"""
+    status = dict(parser_status, **load_parser_status())
     return jsonify({
-        "is_running": parser_status["is_running"],
-        "last_run": parser_status["last_run"],
-        "next_run": parser_status["next_run"],
-        "total_users": parser_status.get("total_users", 0),
-        "current_user": parser_status.get("current_user", 0),
-        "current_user_name": parser_status.get("current_user_name", "")
+        "is_running": is_parser_running(),
+        "last_run": status.get("last_run"),
+        "next_run": status.get("next_run"),
+        "total_users": status.get("total_users", 0),
+        "current_user": status.get("current_user", 0),
+        "current_user_name": status.get("current_user_name", "")
+    })
+
+@app.route('/cache_stats')
+def get_cache_stats():
+    """获取缓存统计信息"""
+    if not session.get('logged_in'):
+        return jsonify({"status": "error", "message": "未登录"})
+
+    from src.utils.negative_cache import get_negative_cache
+    from src.api import response_cache
+    return jsonify({
+        "response_cache": response_cache.get_stats(),
+        "negative_cache": get_negative_cache().get_stats()
     })
 
 def load_config():
@@ -317,10 +404,8 @@ def load_config():
 def save_config(config):
     """保存配置"""
     try:
-        # 确保配置目录存在
-        os.makedirs(CONFIG_DIR, exist_ok=True)
-        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-            json.dump(config, f, ensure_ascii=False, indent=2)
+        # 原子写入，解析器进程不会读到写了一半的配置；配置文件始终使用带缩进的 JSON
+        serializer.write_file(config, CONFIG_FILE, 'json')
         return True
     except Exception as e:
         print(f"保存配置失败: {e}")
@@ -520,6 +605,10 @@ def save_config_handler():
             # 保留原有片单配置
             config['doulists'] = current_config.get('doulists', [])
         
+        # 保留界面上没有的其他配置项（如 config.json 中的高级配置）
+        for key, value in current_config.items():
+            config.setdefault(key, value)
+        
         save_config(config)
         
         return jsonify({"status": "success"})
@@ -527,206 +616,72 @@ def save_config_handler():
         return jsonify({"status": "error", "message": str(e)})
 
 def load_json_file(file_path):
-    """加载指定的 JSON 文件"""
-    try:
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-    except Exception as e:
-        print(f"加载数据失败: {e}")
-    return {}
+    """加载指定的 JSON 文件（包含尚未合并的增量日志，并从条目缓存补全元数据）
 
-def clean_title(title, info, is_tv=False):
-    """清理标题并添加年份"""
-    # 获取主标题（/前的部分）
-    main_title = title.split(' / ')[0].strip()
-    
-    # 如果是剧集，去掉"第x季"的部分
-    if is_tv:
-        main_title = re.sub(r'\s*第[一二三四五六七八九十\d]+季.*$', '', main_title)
-        return main_title  # 电视剧直接返回标题，不添加年份
-    
-    # 电影才添加年份
-    year = None
-    for info_item in info:
-        # 匹配年份格式 YYYY-MM-DD 或 YYYY
-        if isinstance(info_item, str):
-            match = re.search(r'(\d{4})(?:-\d{2}-\d{2})?(?:\(|$)', info_item)
-            if match:
-                year = match.group(1)
-                break
-    
-    # 如果找到年份，添加到标题中（仅对电影）
-    if year:
-        return f"{main_title} {year}"
-    return main_title
-
-def convert_to_radarr_format(items, is_tv=False):
-    """转换为Radarr格式"""
-    result = []
-    for item in items:
-        # 获取标题和年份
-        title = item.get('title', '')
-        year = item.get('year')  # 直接从item中获取year字段
-        
-        # 处理标题
-        main_title = title.split(' / ')[0].strip()
-        if is_tv:
-            # 电视剧去掉"第x季"的部分
-            main_title = re.sub(r'\s*第[一二三四五六七八九十\d]+季.*$', '', main_title)
-        elif year:
-            # 电影添加年份
-            main_title = f"{main_title} {year}"
-            
-        # 构建返回数据
-        media_data = {
-            "title": main_title,
-            "poster_url": item.get('cover_url', '')
-        }
-        
-        # 只有在有 imdb_id 时才添加该字段
-        if item.get('imdb_id'):
-            media_data["imdb_id"] = item.get('imdb_id')
-            
-        result.append(media_data)
-    return result
-
-def get_unique_items(data, item_type='movies'):
-    """获取去重后的条目列表"""
-    all_items = []
-    
-    # 遍历所有用户的数据
-    for user_data in data.values():
-        items = user_data.get(item_type, [])
-        all_items.extend(items)
-    
-    # 去重（基于标题）
-    seen = set()
-    unique_items = []
-    for item in all_items:
-        title = item.get('title', '')
-        if title and title not in seen:
-            seen.add(title)
-            unique_items.append(item)
-    
-    return unique_items
+    文件没有变化时直接返回上次的结果，返回的数据在多个请求之间共享
+    """
+    return load_data_file(file_path)
 
 @app.route('/rss/movies')
 def get_movies():
     """获取所有用户想看的电影"""
-    data = load_json_file(MOVIES_FILE)
-    unique_movies = get_unique_items(data, 'movies')
-    return jsonify(convert_to_radarr_format(unique_movies))
+    return serve_feed(MOVIES_FILE, '/rss/movies')
 
 @app.route('/rss/tv')
 def get_tv_shows():
     """获取所有用户想看的电视剧"""
-    data = load_json_file(MOVIES_FILE)
-    unique_shows = get_unique_items(data, 'tv_shows')
-    return jsonify(convert_to_radarr_format(unique_shows, is_tv=True))
+    return serve_feed(MOVIES_FILE, '/rss/tv')
 
 # 添加广播相关的API接口
 @app.route('/rss/status_movies')
 def get_status_movies():
     """获取从广播中提取的电影"""
-    data = load_json_file(STATUS_FILE)
-    unique_movies = get_unique_items(data, 'movies')
-    return jsonify(convert_to_radarr_format(unique_movies))
+    return serve_feed(STATUS_FILE, '/rss/status_movies')
 
 @app.route('/rss/status_tv')
 def get_status_tv():
     """获取从广播中提取的电视剧"""
-    data = load_json_file(STATUS_FILE)
-    unique_shows = get_unique_items(data, 'tv_shows')
-    return jsonify(convert_to_radarr_format(unique_shows, is_tv=True))
+    return serve_feed(STATUS_FILE, '/rss/status_tv')
 
 @app.route('/rss/new_movies')
 def get_new_movies():
     """获取最新电影"""
-    data = load_json_file(NEW_MOVIES_FILE)
-    movies = data.get('movies', [])
-    return jsonify(convert_to_radarr_format(movies))
+    return serve_feed(NEW_MOVIES_FILE, '/rss/new_movies')
 
 @app.route('/rss/hot_movies')
 def get_hot_movies():
     """获取热门电影"""
-    data = load_json_file(HOT_MOVIES_FILE)
-    movies = data.get('movies', [])
-    return jsonify(convert_to_radarr_format(movies))
+    return serve_feed(HOT_MOVIES_FILE, '/rss/hot_movies')
 
 @app.route('/rss/hot_tv')
 def get_hot_tv():
     """获取热门电视剧"""
-    data = load_json_file(HOT_MOVIES_FILE)
-    tv_shows = data.get('tv_shows', [])
-    return jsonify(convert_to_radarr_format(tv_shows, is_tv=True))
+    return serve_feed(HOT_MOVIES_FILE, '/rss/hot_tv')
 
 @app.route('/rss/hidden_gems_movies')
 def get_hidden_gems_movies():
     """获取冷门佳片电影"""
-    data = load_json_file(HIDDEN_GEMS_FILE)
-    movies = data.get('movies', [])
-    return jsonify(convert_to_radarr_format(movies))
+    return serve_feed(HIDDEN_GEMS_FILE, '/rss/hidden_gems_movies')
 
 @app.route('/rss/doulists')
 def get_doulists():
     """获取所有片单中的电影"""
-    data = load_json_file(DOULIST_FILE)
-    all_items = []
-    
-    # 收集所有片单中的条目
-    for doulist_id, doulist_data in data.get('lists', {}).items():
-        items = doulist_data.get('items', [])
-        # 筛选电影类型条目
-        movie_items = [item for item in items if item.get('type') == 'movie']
-        all_items.extend(movie_items)
-    
-    return jsonify(convert_to_radarr_format(all_items))
+    return serve_feed(DOULIST_FILE, '/rss/doulists')
 
 @app.route('/rss/doulist/<doulist_id>')
 def get_doulist(doulist_id):
     """获取指定片单的电影"""
-    data = load_json_file(DOULIST_FILE)
-    doulist_data = data.get('lists', {}).get(doulist_id, {})
-    
-    if not doulist_data:
-        return jsonify({"error": f"片单 {doulist_id} 未找到"}), 404
-        
-    items = doulist_data.get('items', [])
-    # 筛选电影类型条目
-    movie_items = [item for item in items if item.get('type') == 'movie']
-    
-    return jsonify(convert_to_radarr_format(movie_items))
+    return serve_feed(DOULIST_FILE, '/rss/doulist/<doulist_id>', doulist_id=doulist_id)
 
 @app.route('/rss/doulists_tv')
 def get_doulists_tv():
     """获取所有片单中的电视剧"""
-    data = load_json_file(DOULIST_FILE)
-    all_items = []
-    
-    # 收集所有片单中的条目
-    for doulist_id, doulist_data in data.get('lists', {}).items():
-        items = doulist_data.get('items', [])
-        # 筛选电视剧类型条目
-        tv_items = [item for item in items if item.get('type') == 'tv']
-        all_items.extend(tv_items)
-    
-    return jsonify(convert_to_radarr_format(all_items, is_tv=True))
+    return serve_feed(DOULIST_FILE, '/rss/doulists_tv')
 
 @app.route('/rss/doulist_tv/<doulist_id>')
 def get_doulist_tv(doulist_id):
     """获取指定片单的电视剧"""
-    data = load_json_file(DOULIST_FILE)
-    doulist_data = data.get('lists', {}).get(doulist_id, {})
-    
-    if not doulist_data:
-        return jsonify({"error": f"片单 {doulist_id} 未找到"}), 404
-        
-    items = doulist_data.get('items', [])
-    # 筛选电视剧类型条目
-    tv_items = [item for item in items if item.get('type') == 'tv']
-    
-    return jsonify(convert_to_radarr_format(tv_items, is_tv=True))
+    return serve_feed(DOULIST_FILE, '/rss/doulist_tv/<doulist_id>', doulist_id=doulist_id)
 
 @app.route('/health')
 def health_check():
@@ -774,14 +729,13 @@ def check_cookie():
                 "message": "请输入 Cookie"
             })
         
-        # 使用一个简单的豆瓣请求来测试 cookie
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Cookie': cookie
-        }
-        
-        # 尝试访问豆瓣电影主页
-        response = requests.get('https://movie.douban.com/', headers=headers, timeout=10)
+        # 尝试访问豆瓣电影主页来测试 cookie
+        # 使用单独的客户端：不改动共享客户端的 Cookie，也不占用解析程序的请求配额
+        client = DoubanClient(cookie)
+        try:
+            response = client.get('https://movie.douban.com/', timeout=10)
+        finally:
+            client.close()
         
         # 调试输出
         print("\n=== 调试信息 ===")
@@ -0,0 +1,131 @@
+"""
+订阅文件发送模块
+解析器运行结束后已把订阅内容写入 feeds 目录（见 src.utils.feeds），接口直接用 send_file 发送文件，
+按请求的 Accept-Encoding 发送预先压缩的 gzip/brotli 版本；订阅文件过期或不存在、以及带 offset/limit 的分页请求按请求逐段生成
+（并缓存生成的响应）。RSS 订阅文件（未配置 feed_base_url 时解析器不生成）不存在或过期时按请求生成订阅文件，之后的请求直接发送。
+两种方式都带有 ETag 和 Last-Modified，内容没有变化的轮询只返回 304。
+发送订阅文件时，内容没有变化的轮询只读取数据文件、增量日志、条目缓存标记文件和所选订阅文件的文件信息，不打开文件
+"""
+
+from flask import Response, jsonify, request, send_file
+
+from src.api import response_cache
+from src.utils.compression import ENCODINGS, SUFFIXES, negotiate
+from src.utils.data_reader import file_stat, load_data_file
+from src.utils.feeds import (MIMETYPES, artifact_path, build_feed, feed_extension, format_rfc822, fresh_artifact_stat,
+                             source_mtime, source_mtime_ns, source_stats, write_feed)
+
+
+def choose_artifact(file_path, source_file, stats):
+    """选择要发送的订阅文件：按客户端的 Accept-Encoding 依次尝试最新的压缩版本，最后是原文件
+
+    返回 (文件路径, 编码, 文件的 (修改时间, 大小))，都不是最新的时返回 None。
+    压缩版本先于原文件写入，通常第一次检查就能选定，只需读取一个文件的信息
+    """
+    encodings = list(ENCODINGS)
+    while True:
+        encoding = negotiate(request.accept_encodings, encodings)
+        send_path = file_path + SUFFIXES[encoding] if encoding else file_path
+        stat = fresh_artifact_stat(send_path, source_file, stats)
+        if stat:
+            return send_path, encoding, stat
+        if encoding is None:
+            return None
+        encodings.remove(encoding)
+
+
+def send_artifact(file_path, artifact, stats, mimetype):
+    """发送选定的订阅文件（artifact 为 choose_artifact 的结果）
+
+    ETag 由所发送文件的修改时间、大小和编码生成，Last-Modified 为数据文件（包括增量日志）的更新时间；
+    客户端带着相同的校验信息再次请求时直接返回 304，不打开文件
+    """
+    send_path, encoding, stat = artifact
+    etag = f"{stat[0]:x}-{stat[1]:x}-{encoding or 'identity'}"
+    last_modified = source_mtime(stats)
+
+    not_modified = Response(mimetype=mimetype)
+    not_modified.set_etag(etag)
+    not_modified.last_modified = last_modified
+    not_modified.cache_control.no_cache = True
+    not_modified = not_modified.make_conditional(request)
+    if not_modified.status_code == 304:
+        response_cache.count('not_modified')
+        return response_cache.set_encoding(not_modified, encoding)
+
+    response_cache.count('artifacts')
+    response = send_file(send_path, mimetype=mimetype, conditional=True, etag=etag, last_modified=last_modified)
+    response_cache.set_encoding(response, encoding)
+    raw_stat = stat if encoding is None else file_stat(file_path)
+    if response.status_code != 304 and raw_stat:
+        response_cache.count_bytes(response_cache.current_rule(), encoding, raw_stat[1], stat[1])
+    return response
+
+
+def not_found_response(route, params):
+    """片单不存在时的响应：JSON 订阅返回错误信息，RSS 订阅返回文本"""
+    message = f"片单 {params.get('doulist_id', '')} 未找到"
+    if feed_extension(route) == '.json':
+        response = jsonify({"error": message})
+        response.status_code = 404
+        return response
+    return Response(message, status=404)
+
+
+def page_params():
+    """请求中的分页参数 (offset, limit)：?offset=跳过的条目数&limit=最多返回的条目数，无效的值会被忽略"""
+    offset = request.args.get('offset', type=int)
+    limit = request.args.get('limit', type=int)
+    offset = offset if offset and offset > 0 else 0
+    limit = limit if limit is not None and limit >= 0 else None
+    return offset, limit
+
+
+def write_rss_artifact(source_file, route, stats, **params):
+    """按请求生成 RSS 订阅文件，返回是否写入（片单不存在时不写入）
+
+    链接使用配置的 feed_base_url，未配置时使用请求的站点地址；订阅文件的修改时间设为读取数据之前的更新时间，
+    生成期间数据有更新时下次请求会重新生成
+    """
+    from src.utils.douban_utils import load_config
+
+    base_url = load_config().get('feed_base_url') or request.url_root
+    data = load_data_file(source_file)
+    mtime_ns = source_mtime_ns(stats)
+    build_date = format_rfc822(source_mtime(stats))
+    return write_feed(source_file, route, data, base_url, build_date, mtime_ns, **params) is not None
+
+
+def serve_feed(source_file, route, **params):
+    """发送订阅：优先发送预先生成的订阅文件；分页请求、订阅文件过期或不存在时按请求逐段生成，
+    其中 RSS 订阅先生成订阅文件再发送
+
+    内容没有变化的轮询（返回 304）读取的文件信息：source_stats 的三个文件（数据文件、增量日志、条目缓存标记文件）
+    加上所选订阅文件，共四次 stat，不打开文件。客户端首选编码的压缩版本不存在或过期时（例如卸载了 brotli），
+    choose_artifact 每尝试一个编码多一次 stat，最多 len(ENCODINGS) + 1 次。
+    数据文件和增量日志由解析器分别写入、条目缓存由任意进程写入，没有一个所有写入方都会更新的标记文件，
+    这三次 stat 不能合并为一次
+    """
+    mimetype = MIMETYPES[feed_extension(route)]
+    file_path = artifact_path(source_file, route, **params)
+    stats = source_stats(source_file)
+    page = page_params()
+    # 数据文件和增量日志都不存在时没有可比较的更新时间，按请求生成
+    use_artifact = page == (0, None) and any(stats[:2])
+    artifact = choose_artifact(file_path, source_file, stats) if use_artifact else None
+    if not artifact and use_artifact and feed_extension(route) == '.xml':
+        if not write_rss_artifact(source_file, route, stats, **params):
+            return not_found_response(route, params)
+        artifact = choose_artifact(file_path, source_file, stats)
+    if artifact:
+        return send_artifact(file_path, artifact, stats, mimetype)
+
+    def build():
+        data = load_data_file(source_file)
+        link = request.url_root.rstrip('/') + request.path
+        chunks = build_feed(route, data, link, format_rfc822(source_mtime(stats)), page, **params)
+        if chunks is None:
+            return not_found_response(route, params)
+        return chunks
+
+    return response_cache.cached([source_file], build, mimetype)
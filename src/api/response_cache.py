@@ -0,0 +1,234 @@
+"""
+接口响应缓存模块
+Radarr/Sonarr 会定时轮询 /rss/* 和 /rsshub/* 接口，每次都要整理条目、转换格式或生成 XML。
+生成的响应内容按（路由、查询参数、站点地址）缓存，并记录生成时数据文件的版本（修改时间和大小、
+增量日志、条目缓存标记文件和条目缓存的版本），数据文件没有变化时直接返回缓存的响应。
+订阅接口优先发送解析器预先生成的订阅文件（见 feed_server），只有订阅文件过期时才用到这里的缓存。
+客户端支持压缩时发送压缩后的内容，压缩结果与响应内容一起缓存，同一版本的内容每种编码只压缩一次
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import Response, request
+
+from src.utils.compression import StreamCompressor, compress, negotiate
+from src.utils.feeds import source_stats
+from src.utils.subject_store import get_subject_reader
+
+# 最多缓存的响应数（片单等带参数的路由会产生多个缓存）
+MAX_ENTRIES = 256
+
+# 单个响应超过这个大小（字节）时不缓存，只边生成边发送
+MAX_BODY_SIZE = 4 * 1024 * 1024
+
+# 条目缓存的版本（SQLite 的 PRAGMA data_version）最多每隔这么多秒重新查询一次，数据文件或条目缓存标记文件有变化时立即重新查询
+STORE_VERSION_INTERVAL = 10
+
+# {缓存键: (数据文件版本, 响应内容, {编码: 压缩后的内容})}
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+# {数据文件路径: (数据文件、增量日志和条目缓存标记文件的文件信息, 数据文件版本, 查询条目缓存版本的时间)}
+_versions = {}
+
+# {路由: {'hits': 命中次数, 'misses': 未命中次数, 'artifacts': 直接发送订阅文件的次数, 'not_modified': 返回 304 的次数,
+#         'raw_bytes': 未压缩的内容大小, 'sent_bytes': 实际发送的大小, 'encodings': {编码: 发送次数}}}
+_stats = {}
+
+
+def current_rule():
+    """当前请求的路由"""
+    return request.url_rule.rule if request.url_rule else request.path
+
+
+def route_stats(rule):
+    """路由的统计信息（调用方需持有 _cache_lock）"""
+    return _stats.setdefault(rule, {'hits': 0, 'misses': 0, 'artifacts': 0, 'not_modified': 0,
+                                    'raw_bytes': 0, 'sent_bytes': 0, 'encodings': {}})
+
+
+def count(field):
+    """记录当前请求的路由的一次命中（hits）、未命中（misses）、直接发送订阅文件（artifacts）或返回 304（not_modified）
+
+    返回 304 的请求只计入 not_modified，不计入其他三项
+    """
+    rule = current_rule()
+    with _cache_lock:
+        route_stats(rule)[field] += 1
+
+
+def count_bytes(rule, encoding, raw_size, sent_size):
+    """记录一次发送的内容大小（未压缩的大小和实际发送的大小），encoding 为 None 表示未压缩"""
+    with _cache_lock:
+        stats = route_stats(rule)
+        stats['raw_bytes'] += raw_size
+        stats['sent_bytes'] += sent_size
+        name = encoding or 'identity'
+        stats['encodings'][name] = stats['encodings'].get(name, 0) + 1
+
+
+def set_encoding(response, encoding):
+    """标记响应的压缩编码；响应内容随 Accept-Encoding 变化，缓存代理需要按它区分"""
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def file_version(file_path):
+    """数据文件当前的版本：feeds.source_stats 的结果加上条目缓存的版本
+
+    每次读取数据文件、增量日志和条目缓存标记文件的文件信息（三次 stat），其他进程写入条目缓存后标记文件随之更新；
+    条目缓存的版本只在它们变化、或距上次查询超过 STORE_VERSION_INTERVAL 秒时重新查询，内容没有变化的轮询通常不访问 SQLite
+    """
+    stats = source_stats(file_path)
+    now = time.monotonic()
+    with _cache_lock:
+        memo = _versions.get(file_path)
+    if memo and memo[0] == stats and now - memo[2] < STORE_VERSION_INTERVAL:
+        return memo[1]
+
+    version = stats + (get_subject_reader().version(),)
+    with _cache_lock:
+        _versions[file_path] = (stats, version, now)
+    return version
+
+
+def cached(file_paths, build, mimetype):
+    """返回当前请求的响应：有缓存且数据文件没有变化时直接返回缓存的内容，否则调用 build() 生成
+
+    build() 返回逐段输出内容（bytes）的可迭代对象，边生成（和压缩）边发送，发送完成后缓存；
+    也可以返回 Response（例如 404），这类响应不缓存。
+    ETag 由缓存键、数据文件版本和压缩编码生成（同一版本的数据生成的内容相同），在生成之前就能确定，
+    客户端已有最新内容时直接返回 304，不再生成
+    """
+    key = (request.path, request.query_string, request.url_root)
+    rule = current_rule()
+    encoding = negotiate(request.accept_encodings)
+    # 先记下数据文件的版本再生成响应：生成期间数据文件有更新时，下次请求会重新生成
+    version = tuple(file_version(file_path) for file_path in file_paths)
+    etag = hashlib.sha256(repr((key, version, encoding)).encode('utf-8')).hexdigest()[:32]
+
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit and hit[0] == version:
+            _cache.move_to_end(key)
+        else:
+            hit = None
+    if hit:
+        _, raw, variants = hit
+        body = raw
+        if encoding:
+            body = variants.get(encoding)
+            if body is None:
+                # 该编码第一次被请求：压缩一次并随缓存保存
+                body = compress(raw, encoding)
+                with _cache_lock:
+                    variants[encoding] = body
+        response = make_conditional(set_encoding(Response(body, mimetype=mimetype), encoding), etag, version)
+        if response.status_code == 304:
+            count('not_modified')
+        else:
+            count('hits')
+            count_bytes(rule, encoding, len(raw), len(body))
+        return response
+
+    not_modified = make_conditional(set_encoding(Response(mimetype=mimetype), encoding), etag, version)
+    if not_modified.status_code == 304:
+        count('not_modified')
+        return not_modified
+
+    count('misses')
+
+    result = build()
+    if isinstance(result, Response):
+        return result
+
+    def stream():
+        compressor = StreamCompressor(encoding) if encoding else None
+        # 缓存用的未压缩内容和压缩内容，超过大小上限后为 None
+        body, compressed = [], []
+        raw_size = sent_size = 0
+        for chunk in result:
+            raw_size += len(chunk)
+            if raw_size > MAX_BODY_SIZE:
+                # 内容过大时不缓存，释放已保留的内容
+                body = compressed = None
+            if body is not None:
+                body.append(chunk)
+            if compressor:
+                chunk = compressor.compress(chunk)
+                if not chunk:
+                    continue
+                if compressed is not None:
+                    compressed.append(chunk)
+            sent_size += len(chunk)
+            yield chunk
+        if compressor:
+            chunk = compressor.flush()
+            if compressed is not None:
+                compressed.append(chunk)
+            sent_size += len(chunk)
+            yield chunk
+        count_bytes(rule, encoding, raw_size, sent_size)
+        # 完整发送后才缓存
+        if body is not None:
+            store(key, version, b''.join(body), {encoding: b''.join(compressed)} if encoding else {})
+
+    # direct_passthrough：计算 Content-Length 时不会先把整个生成器读入内存
+    response = Response(stream(), mimetype=mimetype, direct_passthrough=True)
+    return make_conditional(set_encoding(response, encoding), etag, version)
+
+
+def store(key, version, body, variants=None):
+    """缓存响应内容及其压缩版本，超出数量上限时移除最久没有使用的缓存"""
+    with _cache_lock:
+        _cache[key] = (version, body, variants or {})
+        _cache.move_to_end(key)
+        while len(_cache) > MAX_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def version_mtime(version):
+    """数据文件版本中最晚的修改时间（Unix 时间戳），数据文件都不存在时返回 None"""
+    mtimes = [stat[0] for file_version in version for stat in file_version[:-1] if stat]
+    return max(mtimes) / 1e9 if mtimes else None
+
+
+def make_conditional(response, etag, version):
+    """给响应加上校验信息（ETag 和数据文件的更新时间 Last-Modified），请求中的校验信息与之相同时改为 304 响应"""
+    response.set_etag(etag)
+    last_modified = version_mtime(version)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def get_stats():
+    """获取缓存统计信息：缓存的响应数，每个路由的命中、未命中、直接发送订阅文件和返回 304 的次数，以及压缩节省的流量"""
+    with _cache_lock:
+        routes = {}
+        for rule, stats in _stats.items():
+            routes[rule] = dict(stats, encodings=dict(stats['encodings']))
+        entries = len(_cache)
+
+    def total(field):
+        return sum(stats[field] for stats in routes.values())
+
+    raw_bytes, sent_bytes = total('raw_bytes'), total('sent_bytes')
+    return {
+        'entries': entries,
+        'hits': total('hits'),
+        'misses': total('misses'),
+        'artifacts': total('artifacts'),
+        'not_modified': total('not_modified'),
+        'raw_bytes': raw_bytes,
+        'sent_bytes': sent_bytes,
+        'saved_bytes': raw_bytes - sent_bytes,
+        'saved_ratio': round(1 - sent_bytes / raw_bytes, 4) if raw_bytes else 0,
+        'routes': routes
+    }
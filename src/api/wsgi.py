@@ -0,0 +1,12 @@
+"""
+WSGI 入口
+供 gunicorn 等多进程 WSGI 服务器加载，例如：gunicorn -w 4 --threads 4 -b 0.0.0.0:9150 src.api.wsgi:app
+加载时注册 RSS 路由并启动定时器。每个工作进程各自加载本模块，定时任务只在持有调度锁的进程中运行
+（见 src.utils.coordination）；不要使用 --preload，定时器线程和调度锁不能在 fork 之前创建
+"""
+
+from src.api.api import app, start_scheduler
+from src.api.rss_api import register_rss_routes
+
+register_rss_routes(app)
+start_scheduler()
@@ -7,17 +7,56 @@ import re
 import random
 import traceback
 # 导入豆瓣工具模块
-from src.utils.douban_utils import extract_subject_id, load_config, check_cookie_valid, send_telegram_message, send_wecom_message, make_douban_headers, load_json_data, save_json_data, get_subject_info_with_cache, migrate_legacy_cache_data, load_subject_cache, is_cache_expired
+from src.utils.douban_utils import extract_subject_id, load_config, check_cookie_valid, send_telegram_message, send_wecom_message, make_douban_headers, load_json_data, save_json_data, get_subject_info_with_cache, migrate_legacy_cache_data
+from src.utils.douban_client import get_douban_client
+from src.utils.feeds import write_feeds
+from src.utils.subject_fetcher import fetch_subject_infos
+from src.utils.validator_store import conditional_get, get_validator_store
+from src.utils.prefetch import prefetch
+from src.utils.journal import append_journal, op_setdefault, op_remove, op_upsert
+from src.utils.item_index import ItemIndex
 
 # 获取配置目录
 CONFIG_DIR = os.getenv('CONFIG_DIR', 'config')
 CONFIG_FILE = os.path.join(CONFIG_DIR, 'config.json')
 MOVIES_FILE = os.path.join(CONFIG_DIR, 'movies.json')
 
+# 用户列表每页条目数
+LIST_PAGE_SIZE = 15
 
+# 默认全量核对间隔（小时），超过该间隔会翻完配置的全部页数
+DEFAULT_RECONCILE_INTERVAL_HOURS = 24
 
-def parse_movie_item(item, cookie):
-    """解析电影条目"""
+
+
+def get_item_subject_id(item):
+    """从列表条目中提取豆瓣 ID"""
+    link_elem = item.find('a', href=True)
+    if link_elem:
+        return extract_subject_id(link_elem['href'])
+    return None
+
+def iter_items_with_info(pending, cookie):
+    """并发获取待处理条目的详细信息，按完成顺序产出 (条目, 详细信息)"""
+    entries_by_id = {}
+    for entry in pending:
+        subject_id = get_item_subject_id(entry['item'])
+        entries_by_id.setdefault(subject_id, []).append(entry)
+    
+    # 无法提取ID的条目不需要获取详细信息
+    for entry in entries_by_id.pop(None, []):
+        yield entry, None
+    
+    for subject_id, info in fetch_subject_infos(list(entries_by_id), cookie):
+        for entry in entries_by_id[subject_id]:
+            # 获取失败时传入空字典，避免重复请求
+            yield entry, info or {}
+
+def parse_movie_item(item, cookie, info=None):
+    """解析电影条目
+    
+    info: 预先获取的条目详细信息，为 None 时自动获取
+    """
     # 获取标题
     title_elem = item.find('li', class_='title')
     if not title_elem or not title_elem.find('em'):
@@ -39,7 +78,8 @@ def parse_movie_item(item, cookie):
     subject_id = extract_subject_id(url)
     if subject_id:
         print(f"处理条目: {title} (ID: {subject_id})")
-        info = get_subject_info_with_cache(subject_id, cookie)
+        if info is None:
+            info = get_subject_info_with_cache(subject_id, cookie)
         if info:
             media_type = info['type']
             imdb_id = info['imdb_id']
@@ -93,36 +133,67 @@ def save_all_data(all_data):
     """保存所有数据到文件"""
     save_json_data(all_data, MOVIES_FILE)
 
-def check_item_status(title, user_id, all_data):
-    """检查条目状态：新增、重复、或需要更新缓存
+def save_item_change(all_data, user_id, data, removed_id=None):
+    """实时保存单个条目的改动
+    
+    只把这个条目追加到增量日志，不改写整个文件；一次运行结束时 save_all_data 会合并日志
+    removed_id: 被替换的旧条目ID（缓存过期更新时）
+    """
+    list_name = 'movies' if data['type'] == 'movie' else 'tv_shows'
+    records = [op_setdefault([user_id], {'movies': [], 'tv_shows': []})]
+    if removed_id:
+        records.append(op_remove([user_id, 'movies'], removed_id))
+        records.append(op_remove([user_id, 'tv_shows'], removed_id))
+    records.append(op_upsert([user_id, list_name], data))
+    append_journal(MOVIES_FILE, records, all_data)
+
+def check_item_status(title, item_index, subject_id=None):
+    """检查条目状态：新增或重复
+    
+    item_index: 用户已保存条目的 ItemIndex，按豆瓣ID和标题/完整标题查找
+    条目元数据保存在条目缓存中，过期后由续期任务（refresh_subject_cache）更新，这里不再处理
     
     返回值:
         - ('new', None): 全新条目
-        - ('duplicate', item): 重复条目，缓存未过期
-        - ('cache_expired', item): 重复条目，但缓存已过期，需要更新
+        - ('duplicate', item): 重复条目
     """
-    user_data = all_data.get(user_id, {'movies': [], 'tv_shows': []})
-    all_items = user_data['movies'] + user_data['tv_shows']
+    item = item_index.find(subject_id, title)
+    if item is None:
+        return ('new', None)  # 全新条目
+    return ('duplicate', item)
+
+def get_list_item_entry(item):
+    """提取列表条目的 (豆瓣ID, 标记日期)"""
+    date_elem = item.find('span', class_='date')
+    date = date_elem.text.strip() if date_elem else ''
+    return get_item_subject_id(item), date
+
+def is_reconcile_due(watermark, interval_hours):
+    """判断是否需要全量核对（首次抓取或距上次全量核对超过间隔）"""
+    last_full_scan = watermark.get('last_full_scan')
+    if not last_full_scan:
+        return True
     
-    # 同时检查主标题和完整标题
-    for item in all_items:
-        if title == item.get('title') or title == item.get('full_title'):
-            # 找到重复条目，检查其缓存是否过期
-            subject_id = item.get('id')
-            if subject_id:
-                # 检查缓存是否过期
-                cache_data = load_subject_cache()
-                if subject_id in cache_data:
-                    cached_at = cache_data[subject_id].get('cached_at')
-                    if is_cache_expired(cached_at):
-                        print(f"条目 {title} 缓存已过期，将更新信息（不会发送通知）")
-                        return ('cache_expired', item)
-                
-            return ('duplicate', item)  # 缓存未过期或无缓存信息，算作重复
+    try:
+        import datetime
+        last_time = datetime.datetime.strptime(last_full_scan, '%Y-%m-%d %H:%M:%S')
+        return datetime.datetime.now() - last_time >= datetime.timedelta(hours=interval_hours)
+    except Exception:
+        return True
+
+def update_watermark(user_id, all_data, list_type, newest=None, full_scan=False):
+    """记录列表最新条目（高水位），newest 为 (豆瓣ID, 标记日期)"""
+    user_data = all_data.setdefault(user_id, {'movies': [], 'tv_shows': []})
+    watermark = user_data.setdefault('watermarks', {}).setdefault(list_type, {})
+    now = time.strftime('%Y-%m-%d %H:%M:%S')
     
-    return ('new', None)  # 全新条目
+    if newest and newest[0]:
+        watermark['subject_id'], watermark['date'] = newest
+        watermark['updated_at'] = now
+    if full_scan:
+        watermark['last_full_scan'] = now
 
-def get_douban_html(user_id, cookie, list_type='wish', page=1):
+def get_douban_html(user_id, cookie, list_type='wish', page=1, conditional=False):
     """获取豆瓣HTML内容
     
     list_type: 列表类型，可选值：
@@ -130,6 +201,7 @@ def get_douban_html(user_id, cookie, list_type='wish', page=1):
     - do: 在看
     - collect: 已看
     page: 页码，默认为第1页
+    conditional: 是否使用条件请求，为 True 时页面没有变化会返回 None
     """
     # 计算起始位置：每页15个条目
     start = (page - 1) * 15
@@ -141,10 +213,14 @@ def get_douban_html(user_id, cookie, list_type='wish', page=1):
         url = f'https://movie.douban.com/people/{user_id}/collect?start={start}&sort=time&rating=all&mode=grid&type=all&filter=all'
     else:  # 默认为wish
         url = f'https://movie.douban.com/people/{user_id}/wish?start={start}&sort=time&rating=all&mode=grid&type=all&filter=all'
-        
-    headers = make_douban_headers(cookie)
     
-    response = requests.get(url, headers=headers)
+    if conditional:
+        response, changed = conditional_get(url, cookie)
+        if not changed:
+            return None
+    else:
+        response = get_douban_client(cookie).get(url)
+    
     if response.status_code == 200:
         return response.text
     else:
@@ -170,57 +246,64 @@ def fetch_user_data(user_id, cookie, user_config=None):
             if user_config.get('monitor_collect'):
                 list_types.append('collect')
         
+        reconcile_interval = load_config().get('reconcile_interval_hours', DEFAULT_RECONCILE_INTERVAL_HOURS)
+        
         all_data = load_all_data()
         has_updates = False
         
-        print(f"用户 {user_note or user_id} 监控列表类型: {', '.join(list_types)}，抓取 {max_pages} 页")
+        # 已保存条目的索引，本次运行内随新增条目同步更新
+        item_index = ItemIndex.from_user_data(all_data.get(user_id, {}))
+        
+        print(f"用户 {user_note or user_id} 监控列表类型: {', '.join(list_types)}，最多抓取 {max_pages} 页")
         
         for list_type in list_types:
             try:
                 print(f"获取 {list_type} 列表数据中...")
                 
-                # 获取所有页面的HTML内容
-                all_html_content = ""
-                for page in range(1, max_pages + 1):
-                    print(f"  获取第 {page}/{max_pages} 页...")
-                    
-                    html_content = get_douban_html(user_id, cookie, list_type, page)
-                    all_html_content += html_content
-                    
-                    # 如果不是最后一页，添加延迟
-                    if page < max_pages:
-                        delay = random.uniform(1, 3)
-                        print(f"  等待 {delay:.1f} 秒后获取下一页...")
-                        time.sleep(delay)
+                # 列表按时间倒序排列，新条目只会出现在前面：
+                # 平时遇到整页都是已知条目或上次记录的最新条目就停止翻页，定期全量核对时才翻完所有页
+                watermark = all_data.get(user_id, {}).get('watermarks', {}).get(list_type, {})
+                full_scan = is_reconcile_due(watermark, reconcile_interval)
+                known_ids = item_index.known_ids()
+                if full_scan:
+                    print(f"  本次为全量核对，将抓取全部 {max_pages} 页")
+                
+                # 逐页获取并解析：后台线程预取下一页，当前页的条目同时在处理
+                pages = iter_list_pages(user_id, cookie, list_type, max_pages,
+                                        watermark, known_ids, full_scan)
+                pages_parsed = 0
+                new_items_count = 0
+                newest = None
+                for page, items in prefetch(pages):
+                    if page == 1 and items:
+                        newest = get_list_item_entry(items[0])
+                    pages_parsed += 1
+                    new_items_count += process_list_page(items, page, user_id, all_data, cookie, list_type, item_index)
                 
-                # 保存合并后的HTML内容到文件但不输出提示
-                html_file = f'douban_{user_id}_{list_type}.html'
-                if os.path.exists(html_file):
-                    os.remove(html_file)
+                if not pages_parsed:
+                    print(f"用户 {user_id} 的 {list_type} 列表页面均没有变化，跳过解析")
+                    update_watermark(user_id, all_data, list_type, full_scan=full_scan)
+                    continue
                 
-                with open(html_file, 'w', encoding='utf-8') as f:
-                    f.write(all_html_content)
+                user_data = all_data.get(user_id, {'movies': [], 'tv_shows': []})
+                print(f"{list_type}列表处理完成! 发现 {new_items_count} 个新条目，当前用户共有 {len(user_data['movies'])} 部电影, {len(user_data['tv_shows'])} 部电视剧")
                 
-                print(f"解析 {list_type} 列表数据中...")
-                user_data = generate_movies_json(all_html_content, user_id, all_data, cookie, list_type)
+                # 列表处理完成后再确认页面校验信息和高水位，中途出错时下次会重新解析
+                get_validator_store().commit()
+                update_watermark(user_id, all_data, list_type, newest, full_scan)
                 
                 # 检查是否有更新
-                has_list_updates = user_data['new_items_count'] > 0
+                has_list_updates = new_items_count > 0
                 has_updates = has_updates or has_list_updates
                 
                 # 如果这个列表有更新才保存数据
                 if has_list_updates:
-                    print(f"用户 {user_id} 的 {list_type} 列表有更新: {user_data['new_items_count']} 个新条目")
+                    print(f"用户 {user_id} 的 {list_type} 列表有更新: {new_items_count} 个新条目")
                 else:
                     print(f"用户 {user_id} 的 {list_type} 列表无变化")
-                
-                # 添加一个延迟，避免请求过于频繁
-                if list_type != list_types[-1]:
-                    delay = random.uniform(1, 3)
-                    print(f"等待 {delay:.1f} 秒后继续获取下一个列表...")
-                    time.sleep(delay)
                     
             except Exception as e:
+                get_validator_store().discard()
                 print(f"处理用户 {user_id} 的 {list_type} 列表时出错: {e}")
         
         # 更新用户数据的标记
@@ -236,22 +319,61 @@ def fetch_user_data(user_id, cookie, user_config=None):
         print(f"处理用户 {user_id} 时出错: {e}")
         raise
 
-def generate_movies_json(html_content, user_id, all_data, cookie, list_type='wish'):
-    """解析HTML内容并生成JSON数据"""
-    soup = BeautifulSoup(html_content, 'html.parser')
+def iter_list_pages(user_id, cookie, list_type, max_pages, watermark, known_ids, full_scan=False):
+    """逐页获取并解析用户列表，产出 (页码, 条目列表)
     
+    每次只保留当前页的解析结果；是否继续翻页在这里根据页面内容决定：
+    - 页面没有变化、不足一整页时停止
+    - 非全量核对时，遇到上次记录的最新条目或整页都是已知条目时停止
+    """
+    for page in range(1, max_pages + 1):
+        print(f"  获取第 {page}/{max_pages} 页...")
+        
+        html_content = get_douban_html(user_id, cookie, list_type, page, conditional=True)
+        if html_content is None:
+            print(f"  第 {page} 页内容没有变化，跳过解析")
+            if not full_scan:
+                return
+            continue
+        
+        items = BeautifulSoup(html_content, 'html.parser').find_all('div', class_='item')
+        yield page, items
+        
+        if len(items) < LIST_PAGE_SIZE:
+            # 不足一整页，已经到达列表末尾
+            return
+        if full_scan:
+            continue
+        
+        page_ids = [subject_id for subject_id, _ in map(get_list_item_entry, items) if subject_id]
+        if watermark.get('subject_id') in page_ids:
+            print(f"  第 {page} 页包含上次记录的最新条目，停止翻页")
+            return
+        if all(subject_id in known_ids for subject_id in page_ids):
+            print(f"  第 {page} 页条目均已存在，停止翻页")
+            return
+
+def process_list_page(items, page, user_id, all_data, cookie, list_type='wish', item_index=None):
+    """处理一页列表条目并实时保存，返回新增条目数
+    
+    item_index: 用户已保存条目的 ItemIndex，为空时根据 all_data 构建
+    """
     # 获取或初始化用户数据
     user_data = all_data.get(user_id, {'movies': [], 'tv_shows': []})
     movies = user_data['movies']
     tv_shows = user_data['tv_shows']
     
-    # 找到电影列表容器
-    items = soup.find_all('div', class_='item')
+    if item_index is None:
+        item_index = ItemIndex.from_user_data(user_data)
+    
     total_items = len(items)
     new_items = 0
     
-    print(f"开始处理 {list_type} 列表中的 {total_items} 个条目...")
+    print(f"开始处理 {list_type} 列表第 {page} 页的 {total_items} 个条目...")
     
+    # 第一遍：检查条目状态，收集需要获取详细信息的条目
+    pending = []
+    pending_titles = set()
     for index, item in enumerate(items, 1):
         # 获取标题
         title_elem = item.find('li', class_='title')
@@ -261,88 +383,55 @@ def generate_movies_json(html_content, user_id, all_data, cookie, list_type='wis
             title = titles[0].strip()
             
             # 检查条目状态
-            status, existing_item = check_item_status(title, user_id, all_data)
+            status, _ = check_item_status(title, item_index, get_item_subject_id(item))
             
-            if status == 'duplicate':
+            if status == 'duplicate' or title in pending_titles:
                 print(f"条目已存在，跳过: {title}")
                 continue
-            elif status == 'cache_expired':
-                # 缓存过期，需要更新信息但不算新增
-                print(f"处理缓存过期条目 [{index}/{total_items}]: {title}")
-                
-                # 获取更新后的信息
-                data = parse_movie_item(item, cookie)
-                
-                # 保留原有的notified状态，不改变通知状态
-                data['notified'] = existing_item.get('notified', True)  # 默认为True，表示不需要通知
-                
-                # 添加来源标记
-                data['source'] = list_type
-                
-                # 从原列表中移除旧条目
-                if existing_item in user_data['movies']:
-                    user_data['movies'].remove(existing_item)
-                elif existing_item in user_data['tv_shows']:
-                    user_data['tv_shows'].remove(existing_item)
-                
-                # 添加更新后的条目
-                if data["type"] == "movie":
-                    movies.append(data)
-                    print(f"更新电影信息: {data['title']} (来自{list_type}列表)")
-                else:
-                    tv_shows.append(data)
-                    print(f"更新剧集信息: {data['title']} (来自{list_type}列表)")
-                
-                # 实时保存数据
-                all_data[user_id] = {'movies': movies, 'tv_shows': tv_shows}
-                save_all_data(all_data)
-                
-                # 缓存更新不算新增，不增加new_items计数
-                
-            elif status == 'new':
-                # 全新条目
-                print(f"处理新条目 [{index}/{total_items}]: {title}")
-                new_items += 1
-                data = parse_movie_item(item, cookie)
-                
-                # 设置notified为False，表示这是一个新条目需要通知
-                data['notified'] = False
-                
-                # 添加来源标记，方便后续区分数据来源
-                data['source'] = list_type
-                
-                # 根据类型添加到对应列表
-                if data["type"] == "movie":
-                    movies.append(data)
-                    print(f"添加电影: {data['title']} (来自{list_type}列表)")
-                else:
-                    tv_shows.append(data)
-                    print(f"添加剧集: {data['title']} (来自{list_type}列表)")
-                
-                # 实时保存数据
-                all_data[user_id] = {'movies': movies, 'tv_shows': tv_shows}
-                save_all_data(all_data)
             
-            # 只在处理新条目时添加延迟
-            if index < total_items:
-                delay = random.uniform(1, 3)
-                print(f"等待 {delay:.1f} 秒后继续...")
-                time.sleep(delay)
+            pending_titles.add(title)
+            pending.append({
+                'index': index,
+                'item': item,
+                'title': title
+            })
     
-    print(f"{list_type}列表处理完成! 发现 {new_items} 个新条目，当前用户共有 {len(movies)} 部电影, {len(tv_shows)} 部电视剧")
-    
-    # 添加更新时间和新条目数量
-    result = {
-        'movies': movies,
-        'tv_shows': tv_shows,
-        'update_time': time.strftime('%Y-%m-%d %H:%M:%S'),
-        'new_items_count': new_items
-    }
+    # 第二遍：并发获取详细信息，按完成顺序逐个处理并保存
+    for entry, info in iter_items_with_info(pending, cookie):
+        index = entry['index']
+        item = entry['item']
+        title = entry['title']
+        
+        # 全新条目
+        print(f"处理新条目 [{index}/{total_items}]: {title}")
+        new_items += 1
+        data = parse_movie_item(item, cookie, info)
+        
+        # 设置notified为False，表示这是一个新条目需要通知
+        data['notified'] = False
+        
+        # 添加来源标记，方便后续区分数据来源
+        data['source'] = list_type
+        
+        # 根据类型添加到对应列表
+        if data["type"] == "movie":
+            movies.append(data)
+            print(f"添加电影: {data['title']} (来自{list_type}列表)")
+        else:
+            tv_shows.append(data)
+            print(f"添加剧集: {data['title']} (来自{list_type}列表)")
+        
+        # 实时保存数据
+        user_data['movies'] = movies
+        user_data['tv_shows'] = tv_shows
+        all_data[user_id] = user_data
+        item_index.add(data)
+        save_item_change(all_data, user_id, data)
     
-    return result
+    return new_items
 
 def cleanup_temp_files():
-    """清理临时文件"""
+    """清理旧版本遗留的临时文件"""
     try:
         # 删除所有 douban_*.html 文件
         for file in os.listdir():
@@ -398,12 +487,6 @@ def main():
                 
                 if has_updates:
                     any_updates = True
-                
-                # 如果不是最后一个用户，添加随机延迟
-                if i < total_users:
-                    delay = random.uniform(1, 3)  # 1-3秒的随机延迟
-                    print(f"等待 {delay:.1f} 秒后处理下一个用户...")
-                    time.sleep(delay)
                     
             except Exception as e:
                 print(f"处理用户 {user_id} 时出错: {e}")
@@ -510,6 +593,9 @@ def main():
         send_telegram_message(error_message, config, False)
         send_wecom_message(error_message, config, False)
     finally:
+        # 生成订阅文件，API 直接发送
+        write_feeds(MOVIES_FILE)
+        get_douban_client().print_stats()
         # 无论成功还是失败，都清理临时文件
         cleanup_temp_files()
 
@@ -8,6 +8,11 @@ import random
 import traceback
 # 导入豆瓣工具模块
 from src.utils.douban_utils import extract_subject_id, load_config, check_cookie_valid, send_telegram_message, send_wecom_message, make_douban_headers, load_json_data, save_json_data, get_subject_info_with_cache, migrate_legacy_cache_data
+from src.utils.douban_client import get_douban_client
+from src.utils.feeds import write_feeds
+from src.utils.subject_fetcher import fetch_subject_infos
+from src.utils.validator_store import conditional_get, get_validator_store
+from src.utils.journal import append_journal, op_set, op_upsert
 
 # 获取配置目录
 CONFIG_DIR = os.getenv('CONFIG_DIR', 'config')
@@ -42,29 +47,39 @@ def save_doulist_data(data):
         print(f"保存豆列数据失败: {e}")
         return False
 
-def get_doulist_html(doulist_id, cookie, page=1):
+def get_doulist_html(doulist_id, cookie, page=1, conditional=False):
     """获取片单HTML内容
     
     doulist_id: 片单ID
     page: 页码，默认为第1页
+    conditional: 是否使用条件请求，为 True 时页面没有变化会返回 None
     """
     # 计算起始位置：每页25个条目
     start = (page - 1) * 25
     
     # 按时间排序，使用start参数而不是page参数
     url = f'https://www.douban.com/doulist/{doulist_id}/?start={start}&sort=time&playable=0&sub_type='
-    headers = make_douban_headers(cookie)
     
-    response = requests.get(url, headers=headers)
+    if conditional:
+        response, changed = conditional_get(url, cookie)
+        if not changed:
+            return None
+    else:
+        response = get_douban_client(cookie).get(url)
+    
     if response.status_code == 200:
         return response.text
     else:
         raise requests.RequestException(f"获取片单HTML失败: HTTP {response.status_code}")
 
-def get_doulist_info(doulist_id, cookie):
-    """获取片单基本信息"""
+def get_doulist_info(doulist_id, cookie, html_content=None):
+    """获取片单基本信息
+    
+    html_content: 已获取的片单第一页内容，为空时重新请求
+    """
     try:
-        html_content = get_doulist_html(doulist_id, cookie)
+        if html_content is None:
+            html_content = get_doulist_html(doulist_id, cookie)
         soup = BeautifulSoup(html_content, 'html.parser')
         
         # 获取片单标题
@@ -110,8 +125,11 @@ def is_movie_or_tv(item_url):
     """判断条目是否为电影/剧集"""
     return "movie.douban.com/subject/" in item_url
 
-def parse_doulist_item(item, cookie):
-    """解析片单中的单个条目"""
+def parse_doulist_item(item, cookie, info=None):
+    """解析片单中的单个条目
+    
+    info: 预先获取的条目详细信息，为 None 时自动获取
+    """
     try:
         # 获取链接和标题
         title_elem = item.select_one('.title a')
@@ -142,9 +160,10 @@ def parse_doulist_item(item, cookie):
         if not subject_id:
             return None
             
-        # 获取详细信息，不使用缓存，每次都获取最新数据
-        print(f"获取详细信息: {title} (ID: {subject_id})")
-        info = get_subject_info_with_cache(subject_id, cookie)
+        # 获取详细信息
+        if info is None:
+            print(f"获取详细信息: {title} (ID: {subject_id})")
+            info = get_subject_info_with_cache(subject_id, cookie)
         
         if not info:
             print(f"无法获取详细信息，使用默认值")
@@ -259,14 +278,25 @@ def fetch_doulist(doulist_id, cookie, max_pages=5):
             existing_ids = {item.get("id") for item in all_data["lists"][doulist_id].get("items", [])}
             print(f"当前片单已有 {len(existing_ids)} 个唯一条目ID")
         
-        # 获取第一页并解析总页数
-        first_page_html = get_doulist_html(doulist_id, cookie)
+        # 获取第一页并解析总页数，第一页没有变化说明片单没有新条目
+        first_page_html = get_doulist_html(doulist_id, cookie, conditional=True)
+        if first_page_html is None:
+            print(f"片单 {doulist_id} 第一页内容没有变化，跳过本次更新")
+            return {
+                "success": True,
+                "list_info": all_data["lists"][doulist_id].get("list_info", {}),
+                "new_items": [],
+                "new_items_count": 0,
+                "update_time": time.strftime('%Y-%m-%d %H:%M:%S'),
+                "has_update": False
+            }
+        
         total_pages = min(get_page_count(first_page_html), max_pages)
         
         print(f"片单共有 {total_pages} 页，将获取最多 {max_pages} 页")
         
         # 获取片单基本信息
-        list_info = get_doulist_info(doulist_id, cookie)
+        list_info = get_doulist_info(doulist_id, cookie, first_page_html)
         all_data = load_doulist_data()
         all_data["lists"][doulist_id]["list_info"] = list_info
         print(f"更新片单基本信息: {list_info.get('title', '未知')}")
@@ -275,13 +305,17 @@ def fetch_doulist(doulist_id, cookie, max_pages=5):
         # 记录新条目和计数
         new_items = []
         new_items_count = 0
+        page_errors = 0
         
         # 处理所有页面
         for page in range(1, total_pages + 1):
             try:
                 if page > 1:
                     print(f"\n获取第 {page}/{total_pages} 页...")
-                    page_html = get_doulist_html(doulist_id, cookie, page)
+                    page_html = get_doulist_html(doulist_id, cookie, page, conditional=True)
+                    if page_html is None:
+                        print(f"第{page}页内容没有变化，跳过解析")
+                        continue
                     soup = BeautifulSoup(page_html, 'html.parser')
                 else:
                     print(f"\n处理第1页...")
@@ -290,52 +324,59 @@ def fetch_doulist(doulist_id, cookie, max_pages=5):
                 items = soup.select('.doulist-item')
                 print(f"第{page}页找到 {len(items)} 个条目")
                 
-                # 处理页面上的所有条目
+                # 先筛选出页面上的新条目，已存在的条目不需要获取详细信息
+                new_html_items = {}
                 for idx, html_item in enumerate(items, 1):
+                    # 先获取标题和链接，提取ID
+                    title_elem = html_item.select_one('.title a')
+                    if not title_elem:
+                        continue
+                    
+                    url = title_elem.get('href', '')
+                    title = title_elem.text.strip()
+                    
+                    # 跳过非电影/剧集条目
+                    if not is_movie_or_tv(url):
+                        continue
+                    
+                    # 从URL中提取ID
+                    subject_id = extract_subject_id(url)
+                    if not subject_id:
+                        continue
+                    
+                    # 检查该ID是否已存在
+                    if subject_id in existing_ids or subject_id in new_html_items:
+                        print(f"[{page}页-{idx}] 跳过已存在条目: {title} (ID: {subject_id})")
+                        continue
+                    
+                    print(f"[{page}页-{idx}] 发现新条目: {title} (ID: {subject_id})")
+                    new_html_items[subject_id] = html_item
+                
+                # 并发获取新条目的详细信息，按完成顺序逐个保存
+                for subject_id, info in fetch_subject_infos(list(new_html_items), cookie):
                     try:
-                        # 先获取标题和链接，提取ID
-                        title_elem = html_item.select_one('.title a')
-                        if not title_elem:
-                            continue
-                        
-                        url = title_elem.get('href', '')
-                        title = title_elem.text.strip()
-                        
-                        # 跳过非电影/剧集条目
-                        if not is_movie_or_tv(url):
-                            continue
-                        
-                        # 从URL中提取ID
-                        subject_id = extract_subject_id(url)
-                        if not subject_id:
-                            continue
-                        
-                        # 检查该ID是否已存在
-                        if subject_id in existing_ids:
-                            print(f"[{page}页-{idx}] 跳过已存在条目: {title} (ID: {subject_id})")
-                            continue
-                        
-                        # 只有新条目才获取详细信息
-                        print(f"[{page}页-{idx}] 发现新条目: {title} (ID: {subject_id})")
-                        item = parse_doulist_item(html_item, cookie)
+                        # 获取失败时传入空字典，避免重复请求
+                        item = parse_doulist_item(new_html_items[subject_id], cookie, info or {})
                         if not item:
                             continue
                         
-                        # 每次处理新条目时都重新加载数据
-                        current_data = load_doulist_data()
-                        
-                        # 再次检查是否重复（以防万一其他进程已添加）
-                        if is_duplicate(item["id"], doulist_id, current_data):
+                        # 再次检查是否重复
+                        if is_duplicate(item["id"], doulist_id, all_data):
                             continue
                         
                         # 添加到列表头部
-                        current_data["lists"][doulist_id]["items"].insert(0, item)
-                        current_data["lists"][doulist_id]["update_time"] = time.strftime('%Y-%m-%d %H:%M:%S')
-                        current_data["lists"][doulist_id]["has_update"] = True
+                        doulist_data = all_data["lists"][doulist_id]
+                        doulist_data["items"].insert(0, item)
+                        doulist_data["update_time"] = time.strftime('%Y-%m-%d %H:%M:%S')
+                        doulist_data["has_update"] = True
                         
-                        # 立即保存
+                        # 立即保存：只追加这个条目的增量日志，处理完成后再合并到数据文件
                         print(f"保存新条目: {item['title']}")
-                        save_doulist_data(current_data)
+                        append_journal(DOULIST_FILE, [
+                            op_upsert(["lists", doulist_id, "items"], item, head=True),
+                            op_set(["lists", doulist_id, "update_time"], doulist_data["update_time"]),
+                            op_set(["lists", doulist_id, "has_update"], True)
+                        ], all_data)
                         
                         # 添加到新ID集合
                         existing_ids.add(subject_id)
@@ -346,21 +387,17 @@ def fetch_doulist(doulist_id, cookie, max_pages=5):
                         print(f"处理条目时出错: {e}")
                         continue
                     
-                    # 处理完一个条目后添加延迟
-                    if idx < len(items):
-                        delay = random.uniform(0.5, 1.5)
-                        time.sleep(delay)
-                
-                # 添加页面间随机延迟
-                if page < total_pages:
-                    delay = random.uniform(2, 5)
-                    print(f"等待 {delay:.1f} 秒后获取下一页...")
-                    time.sleep(delay)
-                    
             except Exception as e:
                 print(f"获取或解析第 {page} 页时出错: {e}")
+                page_errors += 1
                 continue
         
+        # 所有页面都处理成功后才确认页面校验信息，否则下次重新解析
+        if page_errors:
+            get_validator_store().discard()
+        else:
+            get_validator_store().commit()
+        
         # 更新全局更新时间
         print("\n所有页面处理完成，更新时间戳")
         final_data = load_doulist_data()
@@ -378,6 +415,7 @@ def fetch_doulist(doulist_id, cookie, max_pages=5):
             "has_update": new_items_count > 0
         }
     except Exception as e:
+        get_validator_store().discard()
         print(f"获取片单 {doulist_id} 数据时出错: {e}")
         return {
             "success": False,
@@ -505,12 +543,6 @@ def main():
                 else:
                     print(f"片单 {note or doulist_id} 处理结果: 失败")
                     print(f"  - 错误信息: {result.get('error', '未知错误')}")
-                
-                # 添加随机延迟
-                if i < total_lists:
-                    delay = random.uniform(3, 6)
-                    print(f"\n等待 {delay:.1f} 秒后处理下一个片单...")
-                    time.sleep(delay)
             except Exception as e:
                 print(f"处理片单 {doulist_id} 时出错: {e}")
                 continue
@@ -595,6 +627,9 @@ def main():
         except Exception as send_err:
             print(f"发送错误通知失败: {send_err}")
     
+    # 生成订阅文件，API 直接发送
+    write_feeds(DOULIST_FILE)
+    get_douban_client().print_stats()
     print("\n======= 片单抓取任务结束 =======\n")
 
 if __name__ == "__main__":
@@ -6,6 +6,12 @@ import re
 import random
 # 导入豆瓣工具模块
 from src.utils.douban_utils import extract_subject_id, load_config, check_cookie_valid, send_telegram_message, send_wecom_message, make_douban_headers, get_api_data, parse_api_item, load_json_data, save_json_data, migrate_legacy_cache_data
+from src.utils.douban_client import get_douban_client
+from src.utils.feeds import write_feeds
+from src.utils.subject_fetcher import fetch_subject_infos
+from src.utils.validator_store import get_validator_store
+from src.utils.journal import append_journal, compact_journal, op_set, op_upsert
+from src.utils.retention import rotate_history
 
 # 获取配置目录
 CONFIG_DIR = os.getenv('CONFIG_DIR', 'config')
@@ -18,11 +24,11 @@ def load_new_data():
 
 def get_douban_new_movies(cookie):
     """获取豆瓣最新电影数据"""
-    return get_api_data('movie', '最新', cookie)
+    return get_api_data('movie', '最新', cookie, conditional=True)
 
 def get_douban_new_tv(cookie):
     """获取豆瓣最新电视剧数据"""
-    return get_api_data('tv', '最新', cookie)
+    return get_api_data('tv', '最新', cookie, conditional=True)
 
 def parse_new_movies(cookie):
     """解析最新电影和电视剧数据"""
@@ -52,21 +58,23 @@ def parse_new_movies(cookie):
         new_items = []
         
         # 预先检查哪些是新条目
+        existing_items = {existing_item['id']: existing_item for existing_item in data['movies'] + data['tv_shows']}
         for item in movies_data['subjects']:
-            is_exists = False
-            for existing_item in data['movies'] + data['tv_shows']:
-                if item['id'] == existing_item['id']:
-                    print(f"条目已存在: {item['title']} (ID: {item['id']})")
-                    is_exists = True
-                    break
-            if not is_exists:
+            existing_item = existing_items.get(item['id'])
+            if existing_item:
+                print(f"条目已存在: {item['title']} (ID: {item['id']})")
+                # 记录条目最近一次出现在榜单中的批次，保留策略据此判断是否移出
+                existing_item['last_seen'] = batch_id
+            else:
                 new_items.append(item)
                 
         print(f"其中有 {len(new_items)} 个新电影")
         
-        # 处理新条目
-        for item in new_items:
-            result = parse_api_item(item, cookie)
+        # 并发获取新条目的详细信息，按完成顺序逐个处理
+        items_by_id = {item['id']: item for item in new_items}
+        for subject_id, info in fetch_subject_infos(list(items_by_id), cookie):
+            # 获取失败时传入空字典，避免重复请求
+            result = parse_api_item(items_by_id[subject_id], cookie, info or {})
             if result:
                 # 明确设置notified为False，这是一个新条目需要通知
                 result['notified'] = False
@@ -82,14 +90,13 @@ def parse_new_movies(cookie):
                 
                 # 更新时间
                 data['update_time'] = time.strftime('%Y-%m-%d %H:%M:%S')
-                # 立即保存数据
-                save_new_data(data)
+                # 立即保存：只追加这个条目的增量日志，运行结束时再合并到数据文件
+                list_name = 'movies' if result['type'] == 'movie' else 'tv_shows'
+                append_journal(NEW_MOVIES_FILE, [
+                    op_upsert([list_name], result),
+                    op_set(['update_time'], data['update_time'])
+                ], data)
                 print(f"已保存新条目: {result['title']}")
-                    
-            # 添加随机延迟
-            delay = random.uniform(3, 7)
-            print(f"等待 {delay:.1f} 秒后继续...")
-            time.sleep(delay)
     
     # 获取最新电视剧数据
     tv_data = get_douban_new_tv(cookie)
@@ -98,21 +105,23 @@ def parse_new_movies(cookie):
         new_items = []
         
         # 预先检查哪些是新条目
+        existing_items = {existing_item['id']: existing_item for existing_item in data['movies'] + data['tv_shows']}
         for item in tv_data['subjects']:
-            is_exists = False
-            for existing_item in data['movies'] + data['tv_shows']:
-                if item['id'] == existing_item['id']:
-                    print(f"条目已存在: {item['title']} (ID: {item['id']})")
-                    is_exists = True
-                    break
-            if not is_exists:
+            existing_item = existing_items.get(item['id'])
+            if existing_item:
+                print(f"条目已存在: {item['title']} (ID: {item['id']})")
+                # 记录条目最近一次出现在榜单中的批次，保留策略据此判断是否移出
+                existing_item['last_seen'] = batch_id
+            else:
                 new_items.append(item)
                 
         print(f"其中有 {len(new_items)} 个新电视剧")
         
-        # 处理新条目
-        for item in new_items:
-            result = parse_api_item(item, cookie)
+        # 并发获取新条目的详细信息，按完成顺序逐个处理
+        items_by_id = {item['id']: item for item in new_items}
+        for subject_id, info in fetch_subject_infos(list(items_by_id), cookie):
+            # 获取失败时传入空字典，避免重复请求
+            result = parse_api_item(items_by_id[subject_id], cookie, info or {})
             if result:
                 # 明确设置notified为False，这是一个新条目需要通知
                 result['notified'] = False
@@ -128,14 +137,16 @@ def parse_new_movies(cookie):
                 
                 # 更新时间
                 data['update_time'] = time.strftime('%Y-%m-%d %H:%M:%S')
-                # 立即保存数据
-                save_new_data(data)
+                # 立即保存：只追加这个条目的增量日志，运行结束时再合并到数据文件
+                list_name = 'movies' if result['type'] == 'movie' else 'tv_shows'
+                append_journal(NEW_MOVIES_FILE, [
+                    op_upsert([list_name], result),
+                    op_set(['update_time'], data['update_time'])
+                ], data)
                 print(f"已保存新条目: {result['title']}")
-                    
-            # 添加随机延迟
-            delay = random.uniform(3, 7)
-            print(f"等待 {delay:.1f} 秒后继续...")
-            time.sleep(delay)
+    
+    # 全部处理完成后再确认本次的校验信息，中途出错时下次会重新解析
+    get_validator_store().commit()
     
     if new_movies == 0 and new_tv_shows == 0:
         print("没有发现新的内容，无需更新")
@@ -219,6 +230,9 @@ def main():
         # 解析数据
         data = parse_new_movies(cookie)
         
+        # 按保留策略把旧条目移入压缩归档，数据文件和 RSS 只保留窗口内的条目
+        rotate_history(data, NEW_MOVIES_FILE)
+        
         # 生成统计信息
         movies_count = len(data['movies'])
         tv_shows_count = len(data['tv_shows'])
@@ -316,6 +330,11 @@ def main():
         send_telegram_message(error_message, config, False)
         send_wecom_message(error_message, config, False)
     finally:
+        # 合并本次运行追加的增量日志
+        compact_journal(NEW_MOVIES_FILE)
+        # 生成订阅文件，API 直接发送
+        write_feeds(NEW_MOVIES_FILE)
+        get_douban_client().print_stats()
         # 无论成功还是失败，都清理临时文件
         cleanup_temp_files()
 
@@ -7,7 +7,13 @@ import re
 import random
 import logging
 # 导入豆瓣工具模块
-from src.utils.douban_utils import extract_subject_id, load_config, check_cookie_valid, send_telegram_message, send_wecom_message, make_douban_headers, load_json_data, save_json_data, migrate_legacy_cache_data
+from src.utils.douban_utils import extract_subject_id, load_config, check_cookie_valid, send_telegram_message, send_wecom_message, make_douban_headers, load_json_data, save_json_data, get_subject_info_with_cache, migrate_legacy_cache_data
+from src.utils.douban_client import get_douban_client
+from src.utils.feeds import write_feeds
+from src.utils.validator_store import conditional_get, get_validator_store
+from src.utils.prefetch import prefetch
+from src.utils.journal import append_journal, op_setdefault, op_upsert
+from src.utils.negative_cache import get_negative_cache, trailer_key, short_url_key, REASON_NOT_FOUND, REASON_NO_SUBJECT, REASON_REDIRECT_FAILED
 
 # 设置日志
 logging.basicConfig(
@@ -25,17 +31,19 @@ CONFIG_FILE = os.path.join(CONFIG_DIR, 'config.json')
 STATUS_FILE = os.path.join(CONFIG_DIR, 'status.json')
 URL_CACHE_FILE = os.path.join(CONFIG_DIR, 'url_cache.json')  # 添加URL缓存文件
 
+# 广播条目需要的条目缓存字段（较早版本的缓存中没有）
+STATUS_FIELDS = ('title', 'cover_url', 'rating', 'description', 'all_actors', 'release_dates')
+
+# 广播条目简介中最多列出的主演数
+MAX_INFO_ACTORS = 8
+
 # 全局缓存变量
+# 条目类型和详情保存在共享的条目缓存中（get_subject_info_with_cache），这里只缓存链接的解析结果
 url_cache = {
     'short_urls': {},  # 短链接 -> 实际URL
-    'trailer_urls': {},  # 预告片URL -> 电影/剧集信息
-    'subject_types': {},  # 条目ID -> 类型(movie/tv)
-    'subject_details': {}  # 条目ID -> 完整详情
+    'trailer_urls': {}  # 预告片URL -> 电影/剧集信息
 }
 
-# 全局URL缓存
-URL_CACHE = {}
-
 # 使用已导入的函数替换原有的引用
 def extract_trailer_id(url):
     """从预告片URL中提取ID"""
@@ -56,18 +64,18 @@ def get_subject_info_from_trailer(trailer_id, cookie, max_retries=3):
         print(f"从缓存获取预告片信息: {trailer_id} -> {cached_info['title']} (ID: {cached_info['id']})")
         return cached_info
     
+    # 最近确认无效的预告片直接跳过
+    failure = get_negative_cache().get(trailer_key(trailer_id))
+    if failure:
+        print(f"预告片 {trailer_id} 在 {failure['failed_at']} 获取失败 ({failure['reason']})，暂不重新获取")
+        return None
+    
     # 缓存不存在，进行请求
     for attempt in range(max_retries):
         try:
-            headers = make_douban_headers(cookie)
-            
             print(f"正在从预告片 {trailer_id} 获取电影信息...")
             
-            # 随机延迟1-3秒
-            delay = random.uniform(1, 3)
-            time.sleep(delay)
-            
-            response = requests.get(trailer_url, headers=headers)
+            response = get_douban_client(cookie).get(trailer_url)
             
             if response.status_code == 200:
                 soup = BeautifulSoup(response.text, 'html.parser')
@@ -93,13 +101,18 @@ def get_subject_info_from_trailer(trailer_id, cookie, max_retries=3):
                         return result
                 
                 print(f"无法从预告片 {trailer_id} 获取电影信息")
+                get_negative_cache().add(trailer_key(trailer_id), REASON_NO_SUBJECT)
+                return None
+            
+            elif response.status_code == 404:
+                print(f"预告片 {trailer_id} 不存在")
+                get_negative_cache().add(trailer_key(trailer_id), REASON_NOT_FOUND)
                 return None
                 
             else:
                 print(f"获取预告片 {trailer_id} 失败: HTTP {response.status_code}")
                 if attempt < max_retries - 1:
-                    print(f"将在 3 秒后重试...")
-                    time.sleep(3)
+                    print(f"稍后重试...")
                     continue
                 else:
                     raise requests.RequestException(f"获取预告片信息失败: HTTP {response.status_code}")
@@ -107,103 +120,13 @@ def get_subject_info_from_trailer(trailer_id, cookie, max_retries=3):
         except Exception as e:
             print(f"获取预告片 {trailer_id} 时出错: {e}")
             if attempt < max_retries - 1:
-                print(f"将在 3 秒后重试...")
-                time.sleep(3)
+                print(f"稍后重试...")
                 continue
             else:
                 raise
     
     return None
 
-def get_subject_type(subject_id, cookie, max_retries=3):
-    """获取条目类型（电影或电视剧），使用缓存"""
-    # 先检查缓存
-    global url_cache
-    if subject_id in url_cache['subject_types']:
-        cached_type = url_cache['subject_types'][subject_id]
-        print(f"从缓存获取条目类型: {subject_id} -> {cached_type}")
-        return cached_type
-    
-    # 缓存不存在，进行请求
-    for attempt in range(max_retries):
-        try:
-            url = f'https://movie.douban.com/subject/{subject_id}/'
-            headers = make_douban_headers(cookie)
-            
-            print(f"正在获取条目 {subject_id} 的类型...")
-            
-            # 随机延迟1-3秒
-            delay = random.uniform(1, 3)
-            time.sleep(delay)
-            
-            response = requests.get(url, headers=headers)
-            
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # 查找"谁在看"标题来判断类型
-                others_interests = soup.find('div', {'id': 'subject-others-interests'})
-                if others_interests:
-                    title = others_interests.find('i')
-                    if title:
-                        title_text = title.text.strip()
-                        # 根据标题判断类型
-                        if '这部剧集' in title_text:
-                            # 保存到缓存
-                            url_cache['subject_types'][subject_id] = 'tv'
-                            return 'tv'
-                        elif '这部电影' in title_text:
-                            # 保存到缓存
-                            url_cache['subject_types'][subject_id] = 'movie'
-                            return 'movie'
-                
-                # 如果无法从"谁在看"判断，则检查类型标签
-                info_div = soup.find('div', {'id': 'info'})
-                if info_div:
-                    genre_span = info_div.find('span', text='类型:')
-                    if genre_span:
-                        genre = genre_span.find_next('span', property='v:genre')
-                        if genre and genre.text.strip() in ['真人秀', '纪录片', '综艺']:
-                            # 保存到缓存
-                            url_cache['subject_types'][subject_id] = 'tv'
-                            return 'tv'
-                
-                # 从页面标题判断
-                title = soup.find('title')
-                if title:
-                    title_text = title.text.strip()
-                    if '剧集' in title_text or '电视剧' in title_text:
-                        # 保存到缓存
-                        url_cache['subject_types'][subject_id] = 'tv'
-                        return 'tv'
-                
-                # 默认为电影
-                # 保存到缓存
-                url_cache['subject_types'][subject_id] = 'movie'
-                return 'movie'
-                
-            else:
-                print(f"获取条目 {subject_id} 失败: HTTP {response.status_code}")
-                if attempt < max_retries - 1:
-                    print(f"将在 3 秒后重试...")
-                    time.sleep(3)
-                    continue
-                else:
-                    raise requests.RequestException(f"获取条目信息失败: HTTP {response.status_code}")
-                    
-        except Exception as e:
-            print(f"获取条目 {subject_id} 时出错: {e}")
-            if attempt < max_retries - 1:
-                print(f"将在 3 秒后重试...")
-                time.sleep(3)
-                continue
-            else:
-                raise
-    
-    # 默认返回电影并保存到缓存
-    url_cache['subject_types'][subject_id] = 'movie'
-    return 'movie'
-
 def get_redirect_url(short_url, headers, max_retries=3):
     """获取短链接的重定向目标URL，使用缓存"""
     # 先检查缓存
@@ -213,10 +136,16 @@ def get_redirect_url(short_url, headers, max_retries=3):
         print(f"从缓存获取短链接重定向: {short_url} -> {cached_url}")
         return cached_url
     
+    # 最近无法解析的短链接直接跳过
+    failure = get_negative_cache().get(short_url_key(short_url))
+    if failure:
+        print(f"短链接 {short_url} 在 {failure['failed_at']} 解析失败，暂不重新解析")
+        return None
+    
     # 缓存不存在，进行请求
     for attempt in range(max_retries):
         try:
-            response = requests.head(short_url, headers=headers, allow_redirects=False, timeout=10)
+            response = get_douban_client().head(short_url, headers=headers, allow_redirects=False, timeout=10)
             
             # 检查是否有重定向
             if response.status_code in (301, 302, 303, 307, 308) and 'Location' in response.headers:
@@ -232,7 +161,7 @@ def get_redirect_url(short_url, headers, max_retries=3):
                 return short_url
                 
             # 其他情况，尝试完整GET请求
-            response = requests.get(short_url, headers=headers, allow_redirects=True, timeout=10)
+            response = get_douban_client().get(short_url, headers=headers, allow_redirects=True, timeout=10)
             final_url = response.url
             # 保存到缓存
             url_cache['short_urls'][short_url] = final_url
@@ -240,232 +169,64 @@ def get_redirect_url(short_url, headers, max_retries=3):
                 
         except Exception as e:
             print(f"获取重定向URL时出错: {e}")
-            if attempt < max_retries - 1:
-                time.sleep(2)
-            else:
-                return None
     
+    get_negative_cache().add(short_url_key(short_url), REASON_REDIRECT_FAILED)
     return None
 
-def get_subject_details(subject_id, cookie, max_retries=3):
-    """获取条目的完整详情信息，使用缓存"""
-    # 先检查缓存
-    global url_cache
-    if subject_id in url_cache['subject_details']:
-        cached_details = url_cache['subject_details'][subject_id]
-        print(f"从缓存获取条目详情: {subject_id} -> {cached_details['title']}")
-        return cached_details
+def build_info_lines(info):
+    """把条目信息整理成广播条目的简介列表：上映日期、导演、主演、地区、片长、类型、语言"""
+    lines = []
+    # 优先选择中国大陆上映日期
+    dates = info.get('release_dates') or ([info['release_date']] if info.get('release_date') else [])
+    release_date = next((date for date in dates if '中国大陆' in date), dates[0] if dates else '')
+    if release_date:
+        lines.append(release_date)
+    lines.extend(info.get('director') or [])
+    lines.extend((info.get('all_actors') or info.get('actors') or [])[:MAX_INFO_ACTORS])
+    lines.extend(region.strip() for region in (info.get('region') or '').split('/') if region.strip())
+    if info.get('duration'):
+        lines.append(info['duration'])
+    if info.get('genres'):
+        lines.append('/'.join(info['genres']))
+    if info.get('languages'):
+        lines.append(info['languages'][0])
+    return lines
+
+def get_subject_details(subject_id, cookie, title=''):
+    """获取条目的完整详情信息
     
-    # 缓存不存在，进行请求
-    for attempt in range(max_retries):
-        try:
-            url = f'https://movie.douban.com/subject/{subject_id}/'
-            headers = make_douban_headers(cookie)
-            
-            print(f"正在获取条目 {subject_id} 的完整详情...")
-            
-            # 随机延迟1-3秒
-            delay = random.uniform(1, 3)
-            time.sleep(delay)
-            
-            response = requests.get(url, headers=headers)
-            
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # 获取标题
-                title = ""
-                title_elem = soup.find('span', property='v:itemreviewed')
-                if title_elem:
-                    title = title_elem.text.strip()
-                
-                # 分割主标题和副标题
-                main_title = title
-                subtitle = ""
-                full_title = title
-                if " " in title and not title.startswith(" "):
-                    parts = title.split(" ", 1)
-                    main_title = parts[0].strip()
-                    subtitle = parts[1].strip()
-                
-                # 获取评分
-                rating = ""
-                rating_elem = soup.find('strong', property='v:average')
-                if rating_elem:
-                    rating = rating_elem.text.strip()
-                
-                # 获取年份
-                year = ""
-                year_elem = soup.find('span', class_='year')
-                if year_elem:
-                    year_text = year_elem.text.strip()
-                    year_match = re.search(r'\((\d{4})\)', year_text)
-                    if year_match:
-                        year = year_match.group(1)
-                
-                # 获取海报URL
-                cover_url = ""
-                cover_elem = soup.find('img', rel='v:image')
-                if cover_elem and 'src' in cover_elem.attrs:
-                    cover_url = cover_elem['src']
-                
-                # 获取IMDb ID
-                imdb_id = ""
-                info_div = soup.find('div', {'id': 'info'})
-                if info_div:
-                    imdb_link = info_div.find('a', href=re.compile(r'https?://www.imdb.com/title/(tt\d+)'))
-                    if imdb_link:
-                        imdb_match = re.search(r'tt\d+', imdb_link['href'])
-                        if imdb_match:
-                            imdb_id = imdb_match.group(0)
-                    else:
-                        # 尝试从文本中提取IMDb信息
-                        imdb_text = info_div.text
-                        imdb_match = re.search(r'IMDb:\s*(tt\d+)', imdb_text)
-                        if imdb_match:
-                            imdb_id = imdb_match.group(1)
-                
-                # 获取所有信息项
-                info = []
-                if info_div:
-                    # 获取所有信息文本，并进行清理
-                    info_text = info_div.text.strip().replace('\n', ' ')
-                    info_text = re.sub(r'\s+', ' ', info_text)  # 压缩多余空格
-                    
-                    # 提取导演
-                    director_match = re.search(r'导演:\s*([^:]+?)(?:主演|编剧|制片国家|地区)', info_text)
-                    if director_match:
-                        directors = director_match.group(1).strip().split(' / ')
-                        for director in directors:
-                            if director.strip():
-                                info.append(director.strip())
-                    
-                    # 提取主演
-                    actor_match = re.search(r'主演:\s*([^:]+?)(?:类型|上映日期|片长)', info_text)
-                    if actor_match:
-                        actors = actor_match.group(1).strip().split(' / ')
-                        for actor in actors[:8]:  # 限制主演数量
-                            if actor.strip():
-                                info.append(actor.strip())
-                    
-                    # 提取制片国家/地区
-                    region_match = re.search(r'制片国家/地区:\s*([^:]+?)(?:语言|类型|上映日期)', info_text)
-                    if region_match:
-                        regions = region_match.group(1).strip().split(' / ')
-                        for region in regions:
-                            if region.strip():
-                                info.append(region.strip())
-                    
-                    # 提取导演（再次尝试，以确保能够提取到）
-                    if len(info) < 3:
-                        director_spans = info_div.find_all('span', class_='attrs')
-                        for span in director_spans:
-                            prev_span = span.find_previous('span')
-                            if prev_span and '导演' in prev_span.text:
-                                directors = span.text.strip().split(' / ')
-                                for director in directors:
-                                    if director.strip() and director.strip() not in info:
-                                        info.append(director.strip())
-                    
-                    # 提取上映日期
-                    date_spans = info_div.find_all('span', property='v:initialReleaseDate')
-                    if date_spans:
-                        dates = []
-                        for date_span in date_spans:
-                            date_text = date_span.text.strip()
-                            if date_text:
-                                dates.append(date_text)
-                        if dates:
-                            # 优先选择中国大陆上映日期
-                            cn_date = None
-                            for date in dates:
-                                if '中国大陆' in date:
-                                    cn_date = date
-                                    break
-                            info.insert(0, cn_date if cn_date else dates[0])
-                    
-                    # 提取片长
-                    duration_span = info_div.find('span', property='v:runtime')
-                    if duration_span:
-                        duration = duration_span.text.strip()
-                        if duration:
-                            info.append(duration)
-                    
-                    # 提取类型
-                    genre_spans = info_div.find_all('span', property='v:genre')
-                    if genre_spans:
-                        genres = []
-                        for genre_span in genre_spans:
-                            genre = genre_span.text.strip()
-                            if genre:
-                                genres.append(genre)
-                        if genres:
-                            info.append('/'.join(genres))
-                    
-                    # 提取语言
-                    language_match = re.search(r'语言:\s*([^:]+?)(?:类型|上映日期|片长|官方网站|制片国家)', info_text)
-                    if language_match:
-                        languages = language_match.group(1).strip().split(' / ')
-                        if languages:
-                            info.append(languages[0].strip())
-                
-                # 获取详情描述
-                description = ""
-                desc_span = soup.find('span', property='v:summary')
-                if desc_span:
-                    description = desc_span.text.strip()
-                
-                # 构建结果
-                result = {
-                    'id': subject_id,
-                    'title': main_title,
-                    'subtitle': subtitle,
-                    'full_title': full_title,
-                    'info': info,
-                    'year': year,
-                    'description': description,
-                    'cover_url': cover_url,
-                    'url': url,
-                    'rating': rating,
-                    'playable': True,
-                    'imdb_id': imdb_id if imdb_id else None
-                }
-                
-                # 确定类型
-                media_type = "movie"
-                others_interests = soup.find('div', {'id': 'subject-others-interests'})
-                if others_interests:
-                    title = others_interests.find('i')
-                    if title and '这部剧集' in title.text.strip():
-                        media_type = "tv"
-                
-                result['type'] = media_type
-                
-                # 保存到缓存
-                url_cache['subject_details'][subject_id] = result
-                url_cache['subject_types'][subject_id] = media_type
-                
-                return result
-                
-            else:
-                print(f"获取条目 {subject_id} 失败: HTTP {response.status_code}")
-                if attempt < max_retries - 1:
-                    print(f"将在 3 秒后重试...")
-                    time.sleep(3)
-                    continue
-                else:
-                    raise requests.RequestException(f"获取条目信息失败: HTTP {response.status_code}")
-                    
-        except Exception as e:
-            print(f"获取条目 {subject_id} 时出错: {e}")
-            if attempt < max_retries - 1:
-                print(f"将在 3 秒后重试...")
-                time.sleep(3)
-                continue
-            else:
-                raise
+    通过共享的条目缓存获取（与其他监控共用同一份缓存和详情页解析），缓存有效期内不会重复请求详情页。
+    较早版本缓存的条目没有标题、封面、评分、简介以及完整的主演和上映日期，会立即重新获取一次；
+    重新获取失败时使用广播中的标题 title
+    """
+    info = get_subject_info_with_cache(subject_id, cookie, required_fields=STATUS_FIELDS)
+    if not info:
+        return None
     
-    return None
+    # 分割主标题和副标题
+    full_title = info.get('title') or title or '未知标题'
+    main_title = full_title
+    subtitle = ""
+    if " " in full_title and not full_title.startswith(" "):
+        parts = full_title.split(" ", 1)
+        main_title = parts[0].strip()
+        subtitle = parts[1].strip()
+    
+    return {
+        'id': subject_id,
+        'title': main_title,
+        'subtitle': subtitle,
+        'full_title': full_title,
+        'info': build_info_lines(info),
+        'year': info.get('year', ''),
+        'description': info.get('description', ''),
+        'cover_url': info.get('cover_url', ''),
+        'url': f'https://movie.douban.com/subject/{subject_id}/',
+        'rating': info.get('rating', ''),
+        'playable': True,
+        'imdb_id': info.get('imdb_id'),
+        'type': info.get('type', 'movie')
+    }
 
 def process_status(status, cookie, early_check=False):
     """处理单条广播，尝试提取电影/剧集信息
@@ -489,11 +250,14 @@ def process_status(status, cookie, early_check=False):
                 if subject_link:
                     subject_url = subject_link['href']
                     subject_id = extract_subject_id(subject_url)
+                    # 第一个链接通常是海报，标题在卡片的标题链接中
+                    title_link = subject_block.select_one('.title a')
+                    subject_title = (title_link or subject_link).text.strip()
                     if subject_id and early_check:
-                        return {"id": subject_id, "title": subject_link.text.strip()}
+                        return {"id": subject_id, "title": subject_title}
                     elif subject_id:
                         # 获取完整电影信息
-                        subject_info = get_subject_details(subject_id, cookie)
+                        subject_info = get_subject_details(subject_id, cookie, subject_title)
         
         # 检查是否包含预告片链接
         elif 'block-video' in str(status):
@@ -518,7 +282,7 @@ def process_status(status, cookie, early_check=False):
                                 subject_id = subject_info_from_trailer['id']
                                 if subject_id:
                                     # 获取完整电影信息
-                                    subject_info = get_subject_details(subject_id, cookie)
+                                    subject_info = get_subject_details(subject_id, cookie, subject_info_from_trailer['title'])
         
         # 查找纯文本形式的链接
         if not subject_info and not (early_check and subject_id):
@@ -533,7 +297,7 @@ def process_status(status, cookie, early_check=False):
                         return {"id": subject_id, "title": link.text.strip()}
                     elif subject_id:
                         # 获取完整电影信息
-                        subject_info = get_subject_details(subject_id, cookie)
+                        subject_info = get_subject_details(subject_id, cookie, link.text.strip())
                         break
                 
                 # 处理预告片链接
@@ -550,7 +314,7 @@ def process_status(status, cookie, early_check=False):
                                 subject_id = subject_info_from_trailer['id']
                                 if subject_id:
                                     # 获取完整电影信息
-                                    subject_info = get_subject_details(subject_id, cookie)
+                                    subject_info = get_subject_details(subject_id, cookie, subject_info_from_trailer['title'])
                                     break
                 
                 # 处理短链接（douc.cc）
@@ -577,7 +341,7 @@ def process_status(status, cookie, early_check=False):
                                     subject_id = subject_info_from_trailer['id']
                                     if subject_id:
                                         # 获取完整电影信息
-                                        subject_info = get_subject_details(subject_id, cookie)
+                                        subject_info = get_subject_details(subject_id, cookie, subject_info_from_trailer['title'])
                                         break
         
         if early_check and subject_id:
@@ -615,38 +379,25 @@ def process_status(status, cookie, early_check=False):
     
     return None
 
-def get_douban_status_html(user_id, cookie, pages=1):
-    """获取豆瓣用户广播的HTML内容"""
-    all_html = ""
-    page_count = 0
+def iter_status_pages(user_id, cookie, pages=1):
+    """逐页获取并解析用户广播，产出 (页码, 广播条目列表)
     
-    # 使用douban_utils生成请求头
-    headers = make_douban_headers(cookie)
-    
-    try:
-        for page in range(1, pages + 1):
-            url = f"https://www.douban.com/people/{user_id}/statuses?p={page}"
-            print(f"获取第 {page}/{pages} 页广播")
-            
-            response = requests.get(url, headers=headers, timeout=10)
-            if response.status_code == 200:
-                all_html += response.text
-                page_count += 1
-                
-                # 在获取多页时添加随机延迟
-                if page < pages:
-                    delay = random.uniform(1, 3)  # 1-3秒随机延迟
-                    print(f"等待 {delay:.1f} 秒...")
-                    time.sleep(delay)
-            else:
-                print(f"获取第 {page} 页失败: HTTP状态码 {response.status_code}")
-                break
-                
-        print(f"成功获取了 {page_count} 页广播")
-        return all_html
-    except Exception as e:
-        print(f"获取广播时出错: {e}")
-        return ""
+    使用条件请求，内容没有变化的页面会被跳过；每次只保留当前页的解析结果
+    """
+    for page in range(1, pages + 1):
+        url = f"https://www.douban.com/people/{user_id}/statuses?p={page}"
+        print(f"获取第 {page}/{pages} 页广播")
+        
+        response, changed = conditional_get(url, cookie, timeout=10)
+        if not changed:
+            print(f"第 {page} 页广播没有变化，跳过解析")
+            continue
+        if response.status_code != 200:
+            print(f"获取第 {page} 页失败: HTTP状态码 {response.status_code}")
+            return
+        
+        soup = BeautifulSoup(response.text, 'html.parser')
+        yield page, soup.find_all('div', class_='status-wrapper')
 
 def load_config():
     """加载配置文件"""
@@ -672,21 +423,17 @@ def is_duplicate(subject_id, user_id, all_data):
             return True
     return False
 
-def parse_status_html(html_content, user_id, all_data, cookie):
-    """解析HTML内容并提取广播中的电影/剧集"""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    
+def parse_status_page(status_items, page, user_id, all_data, cookie):
+    """处理一页广播中的电影/剧集并实时保存，返回新增条目数"""
     # 获取或初始化用户数据
     user_data = all_data.get(user_id, {'movies': [], 'tv_shows': []})
     movies = user_data['movies']
     tv_shows = user_data['tv_shows']
     
-    # 找到广播列表
-    status_items = soup.find_all('div', class_='status-wrapper')
     total_items = len(status_items)
     new_items = 0
     
-    print(f"\n开始处理 {total_items} 条广播...")
+    print(f"\n开始处理第 {page} 页的 {total_items} 条广播...")
     
     for index, status in enumerate(status_items, 1):
         try:
@@ -718,32 +465,22 @@ def parse_status_html(html_content, user_id, all_data, cookie):
                         print(f"已添加到电视剧列表: {subject['title']}")
                     
                     # 实时保存数据
-                    all_data[user_id] = {'movies': movies, 'tv_shows': tv_shows}
-                    save_all_status_data(all_data)
+                    user_data['movies'] = movies
+                    user_data['tv_shows'] = tv_shows
+                    all_data[user_id] = user_data
+                    # 只追加增量日志，处理完成后 save_all_status_data 会合并日志
+                    list_name = 'movies' if subject["type"] == "movie" else 'tv_shows'
+                    append_journal(STATUS_FILE, [
+                        op_setdefault([user_id], {'movies': [], 'tv_shows': []}),
+                        op_upsert([user_id, list_name], subject)
+                    ], all_data)
                     print("数据已保存")
-                    
-                    # 只在成功处理新条目后添加延迟
-                    if index < total_items:
-                        delay = random.uniform(3, 7)
-                        print(f"等待 {delay:.1f} 秒后继续...")
-                        time.sleep(delay)
                 
         except Exception as e:
             print(f"处理广播条目时出错: {e}")
             continue
     
-    print(f"\n处理完成! 发现 {new_items} 个新条目")
-    print(f"当前用户共有 {len(movies)} 部电影, {len(tv_shows)} 部电视剧")
-    
-    # 添加更新时间和新条目数量
-    result = {
-        'movies': movies,
-        'tv_shows': tv_shows,
-        'update_time': time.strftime('%Y-%m-%d %H:%M:%S'),
-        'new_items_count': new_items
-    }
-    
-    return result
+    return new_items
 
 def send_telegram_message(message, config, has_new_content=False):
     """发送Telegram消息，这是一个转发函数"""
@@ -762,16 +499,17 @@ def cleanup_temp_files():
     pass
 
 def load_url_cache():
-    """加载URL缓存"""
-    global URL_CACHE
-    URL_CACHE = load_json_data(URL_CACHE_FILE, {})
-    print(f"已加载 {len(URL_CACHE)} 条URL缓存")
+    """加载URL缓存（旧版本缓存中的条目类型和详情已由共享的条目缓存代替，不再加载）"""
+    cached = load_json_data(URL_CACHE_FILE, {})
+    for key in url_cache:
+        url_cache[key] = cached.get(key) or {}
+    print(f"已加载 {sum(len(entries) for entries in url_cache.values())} 条URL缓存")
 
 def save_url_cache():
     """保存URL缓存"""
     try:
-        save_json_data(URL_CACHE, URL_CACHE_FILE)
-        print(f"已保存 {len(URL_CACHE)} 条URL缓存")
+        save_json_data(url_cache, URL_CACHE_FILE)
+        print(f"已保存 {sum(len(entries) for entries in url_cache.values())} 条URL缓存")
     except Exception as e:
         print(f"保存URL缓存失败: {e}")
 
@@ -781,24 +519,35 @@ def fetch_user_status(user_id, cookie, pages=1):
         # 加载现有数据
         all_data = load_all_status_data()
         
-        # 获取广播HTML内容
-        html_content = get_douban_status_html(user_id, cookie, pages)
+        # 逐页获取并解析：后台线程预取下一页，当前页的广播同时在处理
+        pages_parsed = 0
+        new_items_count = 0
+        for page, status_items in prefetch(iter_status_pages(user_id, cookie, pages)):
+            pages_parsed += 1
+            new_items_count += parse_status_page(status_items, page, user_id, all_data, cookie)
         
-        if not html_content:
-            print(f"未能获取用户 {user_id} 的广播内容")
+        if not pages_parsed:
+            print(f"用户 {user_id} 的广播没有需要解析的新内容")
             return False
-            
-        # 解析HTML并提取电影/剧集
-        result = parse_status_html(html_content, user_id, all_data, cookie)
         
         # 更新用户数据
-        all_data[user_id] = result
+        user_data = all_data.get(user_id, {'movies': [], 'tv_shows': []})
+        print(f"\n处理完成! 发现 {new_items_count} 个新条目")
+        print(f"当前用户共有 {len(user_data['movies'])} 部电影, {len(user_data['tv_shows'])} 部电视剧")
+        
+        user_data['update_time'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        user_data['new_items_count'] = new_items_count
+        all_data[user_id] = user_data
         save_all_status_data(all_data)
         
+        # 解析并保存完成后再确认页面校验信息
+        get_validator_store().commit()
+        
         # 检查是否有新内容
-        return result.get('new_items_count', 0) > 0
+        return new_items_count > 0
         
     except Exception as e:
+        get_validator_store().discard()
         print(f"获取用户 {user_id} 广播状态时出错: {e}")
         return False
 
@@ -850,12 +599,6 @@ def main():
                 
                 if has_updates:
                     any_updates = True
-                
-                # 如果不是最后一个用户，添加随机延迟
-                if i < total_users:
-                    delay = random.uniform(1, 3)  # 1-3秒的随机延迟
-                    print(f"等待 {delay:.1f} 秒后处理下一个用户...")
-                    time.sleep(delay)
                     
             except Exception as e:
                 print(f"处理用户广播 {user_id} 时出错: {e}")
@@ -953,6 +696,10 @@ def main():
         # 保存URL缓存
         save_url_cache()
         
+        # 生成订阅文件，API 直接发送
+        write_feeds(STATUS_FILE)
+        get_douban_client().print_stats()
+        
         # 无论成功还是失败，都清理临时文件
         cleanup_temp_files()
 
@@ -0,0 +1,93 @@
+"""
+条目缓存续期任务
+解析过程中遇到过期的缓存会先继续使用旧数据；这个任务在每轮监控之后运行，
+按过期时间从早到晚取出已过期或即将过期的条目，每轮最多重新获取 cache_refresh_limit 个
+"""
+
+import os
+import time
+
+from src.utils.douban_utils import load_config, check_cookie_valid, get_subject_info
+from src.utils.douban_client import get_douban_client
+from src.utils.feeds import SOURCE_NAMES, write_feeds
+from src.utils.subject_fetcher import fetch_subject_infos
+from src.utils.subject_store import get_subject_store
+
+# 获取配置目录
+CONFIG_DIR = os.getenv('CONFIG_DIR', 'config')
+
+# 每轮最多续期的条目数
+DEFAULT_REFRESH_LIMIT = 20
+
+# 提前续期的时间窗口（秒）：在这段时间内将要过期的条目也会被续期
+REFRESH_AHEAD = 24 * 3600
+
+# 获取失败的条目推迟多久再重试（秒），避免失效的条目每轮都排在最前面
+RETRY_DELAY = 24 * 3600
+
+
+def refresh_subject(subject_id, cookie):
+    """重新获取单个条目并写入缓存，失败时推迟该条目的下次续期"""
+    store = get_subject_store()
+    info = get_subject_info(subject_id, cookie)
+    if info:
+        store.upsert(subject_id, info)
+        return info
+
+    entry = store.get(subject_id)
+    if entry:
+        store.upsert_many({subject_id: dict(entry, expires_at=time.time() + RETRY_DELAY)})
+    return None
+
+
+def refresh_expiring_subjects(cookie, limit=None, now=None):
+    """续期已过期和即将过期的条目，返回 (续期成功数, 失败数)"""
+    if limit is None:
+        limit = load_config().get('cache_refresh_limit', DEFAULT_REFRESH_LIMIT)
+    if limit <= 0:
+        return 0, 0
+
+    now = now or time.time()
+    expiring = get_subject_store().expiring(now + REFRESH_AHEAD, limit)
+    if not expiring:
+        print("没有需要续期的条目缓存")
+        return 0, 0
+
+    expired_count = sum(1 for _, expires_at in expiring if expires_at <= now)
+    print(f"本轮续期 {len(expiring)} 个条目缓存（已过期 {expired_count} 个）")
+
+    refreshed = failed = 0
+    subject_ids = [subject_id for subject_id, _ in expiring]
+    for subject_id, info in fetch_subject_infos(subject_ids, cookie, fetch=refresh_subject):
+        if info:
+            refreshed += 1
+        else:
+            failed += 1
+            print(f"条目 {subject_id} 续期失败，稍后重试")
+
+    get_subject_store().flush()
+    print(f"条目缓存续期完成: 成功 {refreshed} 个，失败 {failed} 个")
+    return refreshed, failed
+
+
+def main():
+    try:
+        config = load_config()
+        cookie = config.get('cookie', '')
+        if not cookie or not check_cookie_valid(cookie):
+            print("Cookie 未配置或已失效，跳过条目缓存续期")
+            return
+
+        refreshed, _ = refresh_expiring_subjects(cookie)
+        if refreshed:
+            # 订阅中的元数据来自条目缓存，续期后重新生成全部订阅文件
+            for name in SOURCE_NAMES:
+                write_feeds(os.path.join(CONFIG_DIR, name))
+    except Exception as e:
+        print(f"续期条目缓存时出错: {e}")
+    finally:
+        get_douban_client().print_stats()
+
+
+if __name__ == "__main__":
+    main()
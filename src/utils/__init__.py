@@ -4,6 +4,7 @@
 
 # 导出douban_utils模块
 from . import douban_utils
+from . import douban_client
 
 # 定义版本号
 __version__ = '1.0.0' 
\ No newline at end of file
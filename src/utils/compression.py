@@ -0,0 +1,69 @@
+"""
+响应压缩模块
+订阅内容是大量重复的文本（相同的类型、地区、封面地址前缀），压缩后通常只有原来的十分之一左右。
+支持 gzip，安装了 brotli 时还支持 br（压缩率更高）。按请求的 Accept-Encoding 选择编码，
+同一版本的内容只压缩一次：订阅文件在生成时写入压缩版本，按请求生成的内容压缩后随响应一起缓存
+"""
+
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 所有编码及其压缩文件的扩展名
+SUFFIXES = {
+    'br': '.br',
+    'gzip': '.gz'
+}
+
+# 可用的编码，按优先级排列（客户端对多个编码的 q 值相同时选择靠前的）
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# 压缩级别：内容只压缩一次，使用较高的级别
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 9
+
+
+def compress(raw, encoding):
+    """压缩完整的内容（gzip 头中不写入时间，相同的内容压缩结果也相同）"""
+    if encoding == 'br':
+        return brotli.compress(raw, quality=BROTLI_QUALITY)
+    return gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """逐段压缩：compress(chunk) 返回目前可以输出的压缩内容，flush() 返回剩余的内容"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits=31：输出带 gzip 头的格式
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        if self.encoding == 'br':
+            return self._compressor.process(chunk)
+        return self._compressor.compress(chunk)
+
+    def flush(self):
+        if self.encoding == 'br':
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def negotiate(accept_encodings, encodings=ENCODINGS):
+    """根据请求的 Accept-Encoding（werkzeug 的 request.accept_encodings）选择编码，不压缩时返回 None
+
+    选择 q 值最高的编码，q=0 表示客户端不接受该编码；encodings 为可以使用的编码
+    """
+    best, best_quality = None, 0
+    for encoding in encodings:
+        quality = accept_encodings.quality(encoding)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
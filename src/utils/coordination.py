@@ -0,0 +1,171 @@
+"""
+进程间协调模块
+生产模式下 API 由多个工作进程提供服务（见 scripts/run_server.py），每个进程都会启动定时器线程，用配置目录下的锁文件协调：
+- 调度锁（scheduler.lock）：只有持有它的进程按时运行解析器；持有的进程退出后锁自动释放，由其他进程接替
+- 解析锁（parser.lock）：运行解析器期间持有，并传给解析器子进程。工作进程被重启时子进程仍持有该锁，
+  解析器运行结束前不会再启动一次
+- 状态文件（parser_status.json）：解析进度写入文件，任一工作进程都能返回相同的状态
+- 会话密钥（secret_key）：第一次启动时生成并保存，所有工作进程用同一个密钥签名登录状态
+不支持 fcntl 的平台上只有单个进程，锁总是可以获取
+"""
+
+import os
+import threading
+import time
+
+from src.utils import serializer
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 获取配置目录
+CONFIG_DIR = os.getenv('CONFIG_DIR', 'config')
+SCHEDULER_LOCK_FILE = os.path.join(CONFIG_DIR, 'scheduler.lock')
+PARSER_LOCK_FILE = os.path.join(CONFIG_DIR, 'parser.lock')
+PARSER_STATUS_FILE = os.path.join(CONFIG_DIR, 'parser_status.json')
+SECRET_KEY_FILE = os.path.join(CONFIG_DIR, 'secret_key')
+
+# 获取锁失败时重试的时长和间隔（秒）：其他进程检查锁状态时会短暂持有共享锁
+ACQUIRE_RETRY_SECONDS = 1.0
+ACQUIRE_RETRY_INTERVAL = 0.05
+
+# 会话密钥的字节数
+SECRET_KEY_BYTES = 32
+
+
+class ProcessLock:
+    """进程级的非阻塞文件锁：进程持有期间其他进程无法获取，进程退出时由系统释放"""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        return os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def acquire(self, retry_seconds=ACQUIRE_RETRY_SECONDS):
+        """尝试获取锁，本进程已持有或获取成功时返回 True
+
+        其他进程的 locked() 检查只会短暂持有锁，获取失败时在 retry_seconds 秒内重试；
+        锁被其他进程持续持有时返回 False
+        """
+        deadline = time.monotonic() + retry_seconds
+        while True:
+            with self._lock:
+                if self.fd is not None or fcntl is None:
+                    return True
+                fd = self._open()
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    self.fd = fd
+                    return True
+                except OSError:
+                    os.close(fd)
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(ACQUIRE_RETRY_INTERVAL)
+
+    def release(self):
+        """释放锁：只关闭本进程的文件描述符，继承了它的子进程仍在运行时锁继续有效"""
+        with self._lock:
+            if self.fd is not None:
+                os.close(self.fd)
+                self.fd = None
+
+    @property
+    def held(self):
+        """本进程是否持有锁"""
+        return self.fd is not None
+
+    def locked(self):
+        """锁是否被本进程或其他进程（包括其子进程）持有
+
+        用共享锁检查：多个进程同时检查时互不影响；与 acquire 冲突时由 acquire 重试
+        """
+        with self._lock:
+            if self.fd is not None:
+                return True
+            if fcntl is None:
+                return False
+            fd = self._open()
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+                return False
+            except OSError:
+                return True
+            finally:
+                os.close(fd)
+
+    def pass_fds(self):
+        """传给子进程的文件描述符（subprocess.Popen 的 pass_fds），子进程运行期间锁不会被释放"""
+        return (self.fd,) if self.fd is not None else ()
+
+
+# 进程内共享的锁
+_scheduler_lock = None
+_parser_lock = None
+_locks_lock = threading.Lock()
+
+
+def get_scheduler_lock():
+    """获取调度锁：持有它的进程负责按时运行解析器"""
+    global _scheduler_lock
+    with _locks_lock:
+        if _scheduler_lock is None:
+            _scheduler_lock = ProcessLock(SCHEDULER_LOCK_FILE)
+        return _scheduler_lock
+
+
+def get_parser_lock():
+    """获取解析锁：运行解析器期间持有"""
+    global _parser_lock
+    with _locks_lock:
+        if _parser_lock is None:
+            _parser_lock = ProcessLock(PARSER_LOCK_FILE)
+        return _parser_lock
+
+
+def load_parser_status():
+    """读取状态文件中的解析进度，文件不存在或读取失败时返回空字典"""
+    if not os.path.exists(PARSER_STATUS_FILE):
+        return {}
+    try:
+        return serializer.read_file(PARSER_STATUS_FILE)
+    except Exception as e:
+        print(f"读取解析状态失败: {e}")
+        return {}
+
+
+def save_parser_status(status):
+    """把解析进度写入状态文件"""
+    try:
+        serializer.write_file(status, PARSER_STATUS_FILE, 'json')
+    except Exception as e:
+        print(f"保存解析状态失败: {e}")
+
+
+def load_secret_key(file_path=SECRET_KEY_FILE):
+    """读取会话密钥，不存在时生成并保存
+
+    多个工作进程同时启动时，先写各自的临时文件再用 os.link 创建密钥文件（已存在时失败），
+    只有一个进程的密钥生效，其他进程读取同一个密钥
+    """
+    if not os.path.exists(file_path):
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        temp_path = f"{file_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(os.urandom(SECRET_KEY_BYTES))
+        try:
+            os.link(temp_path, file_path)
+            os.chmod(file_path, 0o600)
+        except FileExistsError:
+            pass
+        finally:
+            os.remove(temp_path)
+
+    with open(file_path, 'rb') as f:
+        return f.read()
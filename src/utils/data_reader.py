@@ -0,0 +1,63 @@
+"""
+数据文件读取缓存模块
+API 每个请求都要读取数据文件：解析、重放日志并补全元数据后的结果按
+（数据文件的修改时间和大小、增量日志的修改时间和大小、条目缓存的版本）缓存，都没有变化时直接返回
+"""
+
+import os
+import threading
+
+from src.utils import serializer
+from src.utils.file_lock import file_lock
+from src.utils.item_metadata import hydrate_data
+from src.utils.journal import journal_path, replay_journal
+from src.utils.subject_store import get_subject_reader
+
+# {数据文件路径: (缓存键, 数据)}
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def file_stat(file_path):
+    """文件的 (修改时间, 大小)，文件不存在时返回 None"""
+    try:
+        stat = os.stat(file_path)
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+
+def data_file_version(file_path, store=None):
+    """数据文件当前的版本：(数据文件的修改时间和大小, 增量日志的修改时间和大小, 条目缓存的版本)
+
+    任何一项变化都说明读取结果可能不同，可以用作基于数据文件的缓存的键
+    """
+    store = store or get_subject_reader()
+    return file_stat(file_path), file_stat(journal_path(file_path)), store.version()
+
+
+def load_data_file(file_path):
+    """读取数据文件（包含尚未合并的增量日志，并从条目缓存补全元数据）
+
+    文件不存在或读取失败时返回空字典。返回的数据在多个请求之间共享，调用方不应修改
+    """
+    try:
+        store = get_subject_reader()
+        # 加共享锁，快照和日志在读取期间不会被解析器合并
+        with file_lock(file_path, shared=True):
+            key = data_file_version(file_path, store)
+            with _cache_lock:
+                cached = _cache.get(file_path)
+            if cached and cached[0] == key:
+                return cached[1]
+
+            data = serializer.read_file(file_path) if key[0] else {}
+            replay_journal(file_path, data)
+
+        hydrate_data(data, store)
+        with _cache_lock:
+            _cache[file_path] = (key, data)
+        return data
+    except Exception as e:
+        print(f"加载数据失败: {file_path}, 错误: {e}")
+        return {}
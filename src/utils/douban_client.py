@@ -0,0 +1,165 @@
+"""
+豆瓣 HTTP 客户端模块
+所有访问豆瓣的请求共用同一个连接池，避免每个请求重新建立 TCP/TLS 连接
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.utils.pacing import Pacer, DEFAULT_REQUESTS_PER_SECOND
+
+# 默认请求超时（连接超时, 读取超时），单位秒
+DEFAULT_TIMEOUT = (5, 15)
+
+# 连接池缓存的主机数量
+POOL_CONNECTIONS = 10
+
+# 每个主机的最大连接数
+POOL_MAXSIZE = 4
+
+
+class DoubanClient:
+    """基于 requests.Session 的豆瓣客户端
+
+    - 复用 keep-alive 连接，每个主机单独一个连接池并限制最大连接数
+    - 统一设置默认超时和请求头（由 make_douban_headers 生成）
+    - 所有请求共享同一个 Pacer，按自适应的每秒请求数控制节奏，遇到限流自动降速
+    - 按主机统计请求数、传输字节数和耗时
+    """
+
+    def __init__(self, cookie='', timeout=DEFAULT_TIMEOUT,
+                 pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                 pacer=None):
+        self.timeout = timeout
+        self.pacer = pacer or Pacer()
+        self.session = requests.Session()
+
+        # pool_block=True 时超过每主机连接上限的请求会等待空闲连接，而不是新建连接
+        adapter = HTTPAdapter(pool_connections=pool_connections,
+                              pool_maxsize=pool_maxsize,
+                              pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+        self.cookie = None
+        self.set_cookie(cookie)
+
+    def set_cookie(self, cookie):
+        """更新共享请求头中的 Cookie"""
+        if cookie == self.cookie:
+            return
+
+        # 延迟导入，避免与 douban_utils 循环导入
+        from src.utils.douban_utils import make_douban_headers
+
+        self.cookie = cookie
+        self.session.headers.update(make_douban_headers(cookie))
+
+    def request(self, method, url, **kwargs):
+        """发送请求并记录统计信息"""
+        kwargs.setdefault('timeout', self.timeout)
+        host = urlsplit(url).netloc
+
+        self.pacer.acquire()
+
+        start = time.monotonic()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except Exception:
+            self._record(host, time.monotonic() - start, 0, error=True)
+            raise
+
+        self._record(host, time.monotonic() - start, len(response.content))
+        self.pacer.record(response.status_code)
+        return response
+
+    def get(self, url, **kwargs):
+        """发送 GET 请求"""
+        return self.request('GET', url, **kwargs)
+
+    def head(self, url, **kwargs):
+        """发送 HEAD 请求"""
+        kwargs.setdefault('allow_redirects', False)
+        return self.request('HEAD', url, **kwargs)
+
+    def _record(self, host, elapsed, size, error=False):
+        """记录单个请求的统计信息"""
+        with self._stats_lock:
+            stats = self._stats.setdefault(host, {
+                'requests': 0,
+                'errors': 0,
+                'bytes': 0,
+                'total_latency': 0.0,
+                'max_latency': 0.0
+            })
+            stats['requests'] += 1
+            stats['bytes'] += size
+            stats['total_latency'] += elapsed
+            stats['max_latency'] = max(stats['max_latency'], elapsed)
+            if error:
+                stats['errors'] += 1
+
+    def get_stats(self):
+        """获取按主机统计的请求信息"""
+        with self._stats_lock:
+            result = {}
+            for host, stats in self._stats.items():
+                item = dict(stats)
+                item['avg_latency'] = stats['total_latency'] / stats['requests'] if stats['requests'] else 0.0
+                result[host] = item
+            return result
+
+    def print_stats(self):
+        """输出请求统计信息"""
+        # 因失败结果缓存而跳过的请求（即使本次没有发出任何请求也输出）
+        from src.utils.negative_cache import get_negative_cache
+
+        stats = self.get_stats()
+        if not stats:
+            get_negative_cache().print_stats()
+            return
+
+        print("\n=== 豆瓣请求统计 ===")
+        for host, item in sorted(stats.items()):
+            print(f"{host}: {item['requests']} 次请求, {item['errors']} 次失败, "
+                  f"{item['bytes'] / 1024:.1f} KB, 平均耗时 {item['avg_latency']:.2f} 秒, "
+                  f"最长耗时 {item['max_latency']:.2f} 秒")
+
+        pacer_stats = self.pacer.get_stats()
+        print(f"请求速率: 当前 {pacer_stats['rate']:.3f} 次/秒 (上限 {pacer_stats['max_rate']:.3f}), "
+              f"限流降速 {pacer_stats['backoffs']} 次, 累计等待 {pacer_stats['total_wait']:.1f} 秒")
+        get_negative_cache().print_stats()
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+
+
+# 进程内共享的客户端实例
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_douban_client(cookie=None):
+    """获取进程内共享的豆瓣客户端
+
+    cookie 不为 None 时会同步更新共享请求头中的 Cookie
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            # 延迟导入，避免与 douban_utils 循环导入
+            from src.utils.douban_utils import load_config
+            config = load_config()
+            pacer = Pacer(config.get('requests_per_second', DEFAULT_REQUESTS_PER_SECOND))
+            _client = DoubanClient(cookie or '', pacer=pacer)
+        elif cookie is not None:
+            _client.set_cookie(cookie)
+        return _client
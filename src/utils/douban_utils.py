@@ -6,6 +6,14 @@ import re
 from typing import Dict, List, Any, Optional, Union, Tuple
 from bs4 import BeautifulSoup
 import random
+from src.utils.douban_client import get_douban_client
+from src.utils.subject_extractor import extract_subject_info
+from src.utils.subject_store import get_subject_store, is_entry_expired
+from src.utils.journal import replay_journal, remove_journal
+from src.utils import serializer
+from src.utils.file_lock import file_lock
+from src.utils.item_metadata import is_item_data_file, normalize_data, hydrate_data
+from src.utils.negative_cache import get_negative_cache, subject_key, REASON_NOT_FOUND
 
 # 定义可导出的函数列表
 __all__ = [
@@ -22,8 +30,6 @@ __all__ = [
     'save_json_data',
     'load_subject_cache',
     'save_subject_cache',
-    'is_cache_expired',
-    'update_cache_item',
     'migrate_legacy_cache_data',
     'get_subject_info_with_cache'
 ]
@@ -36,9 +42,6 @@ CONFIG_DIR = os.getenv('CONFIG_DIR', 'config')
 CONFIG_FILE = os.path.join(CONFIG_DIR, 'config.json')
 CACHE_FILE = os.path.join(CONFIG_DIR, 'subject_cache.json')
 
-# 缓存过期天数（30天）
-CACHE_EXPIRE_DAYS = 30
-
 def load_config():
     """加载配置文件"""
     try:
@@ -55,12 +58,7 @@ def load_config():
 def check_cookie_valid(cookie):
     """检查 cookie 是否有效"""
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Cookie': cookie
-        }
-        
-        response = requests.get('https://www.douban.com', headers=headers, timeout=10)
+        response = get_douban_client(cookie).get('https://www.douban.com', timeout=10)
         
         if 'login' in response.url or response.status_code == 403:
             print("\n❌ Cookie 已失效，需要重新登录")
@@ -82,123 +80,24 @@ def extract_subject_id(url):
 
 def get_subject_info(subject_id, cookie, max_retries=3):
     """获取条目详细信息"""
+    # 最近确认不存在的条目直接跳过
+    failure = get_negative_cache().get(subject_key(subject_id))
+    if failure:
+        print(f"条目 {subject_id} 在 {failure['failed_at']} 确认不存在，暂不重新获取")
+        return None
+    
     for attempt in range(max_retries):
         try:
             url = f'https://movie.douban.com/subject/{subject_id}/'
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Cookie': cookie
-            }
             
             print(f"正在获取条目 {subject_id} 的信息...")
             
-            # 随机延迟2-5秒，避免请求过快
-            delay = random.uniform(2, 5)
-            time.sleep(delay)
-            
-            response = requests.get(url, headers=headers)
+            # 请求节奏由共享客户端统一控制
+            response = get_douban_client(cookie).get(url)
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
-                
-                # 初始化条目信息
-                info = {
-                    'type': 'movie',  # 默认为电影
-                    'imdb_id': None,
-                    'year': '',
-                    'duration': '',
-                    'region': '',
-                    'director': [],
-                    'actors': [],
-                    'genres': [],
-                    'languages': [],
-                    'release_date': '',
-                    'vote_count': '',
-                    'episodes_info': {}
-                }
-                
-                # 判断类型（电影/电视剧）
-                # 检查是否有分集短评（电视剧特有）
-                is_tv = '的分集短评' in response.text
-                episode_info = soup.find('span', text=re.compile(r'集数:|共\d+集'))
-                episode_duration = soup.find(text=re.compile(r'单集片长:'))
-                
-                if is_tv or episode_info or episode_duration:
-                    info['type'] = 'tv'
-                    if episode_info and episode_info.next_sibling:
-                        info['episodes_info']['count'] = episode_info.next_sibling.strip()
-                    if episode_duration and episode_duration.next_sibling:
-                        info['episodes_info']['duration'] = episode_duration.next_sibling.strip()
-                
-                info_div = soup.find('div', {'id': 'info'})
-                if info_div:
-                    # 获取IMDB ID
-                    imdb_link = soup.find('a', {'href': re.compile(r'www\.imdb\.com/title/(tt\d+)')})
-                    if imdb_link:
-                        match = re.search(r'tt\d+', imdb_link['href'])
-                        if match:
-                            info['imdb_id'] = match.group()
-                    
-                    if not info['imdb_id']:
-                        imdb_span = info_div.find('span', text=re.compile(r'IMDb:'))
-                        if imdb_span and imdb_span.next_sibling:
-                            imdb_text = imdb_span.next_sibling.strip()
-                            match = re.search(r'tt\d+', imdb_text)
-                            if match:
-                                info['imdb_id'] = match.group()
-                    
-                    # 获取年份
-                    year_span = soup.find('span', {'class': 'year'})
-                    if year_span:
-                        year_match = re.search(r'\d{4}', year_span.text)
-                        if year_match:
-                            info['year'] = year_match.group()
-                    
-                    # 获取导演
-                    director_span = info_div.find('span', text='导演')
-                    if director_span:
-                        director_links = director_span.find_next('span')
-                        if director_links:
-                            info['director'] = [link.text.strip() for link in director_links.find_all('a')]
-                    
-                    # 获取主演
-                    actors_span = info_div.find('span', text='主演')
-                    if actors_span:
-                        actor_links = actors_span.find_next('span')
-                        if actor_links:
-                            info['actors'] = [link.text.strip() for link in actor_links.find_all('a')][:3]  # 只取前三个主演
-                    
-                    # 获取类型
-                    genre_spans = info_div.find_all('span', {'property': 'v:genre'})
-                    if genre_spans:
-                        info['genres'] = [span.text.strip() for span in genre_spans]
-                    
-                    # 获取制片国家/地区
-                    region_text = info_div.find(text=re.compile(r'制片国家/地区:'))
-                    if region_text and region_text.next_sibling:
-                        info['region'] = region_text.next_sibling.strip()
-                    
-                    # 获取语言
-                    language_text = info_div.find(text=re.compile(r'语言:'))
-                    if language_text and language_text.next_sibling:
-                        languages = language_text.next_sibling.strip()
-                        if languages:
-                            info['languages'] = [lang.strip() for lang in languages.split('/') if lang.strip()]
-                    
-                    # 获取片长
-                    duration_span = info_div.find('span', {'property': 'v:runtime'})
-                    if duration_span:
-                        info['duration'] = duration_span.text.strip()
-                    
-                    # 获取上映日期
-                    release_date_span = info_div.find('span', {'property': 'v:initialReleaseDate'})
-                    if release_date_span:
-                        info['release_date'] = release_date_span.text.strip()
-                
-                # 获取评分人数
-                votes_span = soup.find('span', {'property': 'v:votes'})
-                if votes_span:
-                    info['vote_count'] = votes_span.text.strip()
+                # 只解析详情页中需要的片段
+                info = extract_subject_info(response.text)
                 
                 print(f"条目 {subject_id} 的类型为: {info['type']}")
                 if info['imdb_id']:
@@ -206,31 +105,30 @@ def get_subject_info(subject_id, cookie, max_retries=3):
                     
                 return info
             
-            elif response.status_code == 403:
-                print(f"请求被限制，等待后重试 (尝试 {attempt + 1}/{max_retries})")
-                time.sleep(random.uniform(5, 10))
+            elif response.status_code in (403, 429):
+                # 客户端的节奏控制器已经降低请求速率，重试时会自动等待更久
+                print(f"请求被限制，降速后重试 (尝试 {attempt + 1}/{max_retries})")
                 continue
             elif response.status_code == 404:
                 print(f"条目 {subject_id} 不存在")
+                get_negative_cache().add(subject_key(subject_id), REASON_NOT_FOUND)
                 return None
             else:
                 print(f"获取条目 {subject_id} 失败: HTTP {response.status_code}")
                 if attempt < max_retries - 1:
-                    time.sleep(random.uniform(2, 5))
                     continue
                 return None
                 
         except Exception as e:
             print(f"获取条目 {subject_id} 时出错: {e}")
             if attempt < max_retries - 1:
-                time.sleep(random.uniform(2, 5))
                 continue
             return None
     
     print(f"已达到最大重试次数 ({max_retries})")
     return None
 
-def get_api_data(type_value, tag_value, cookie, page_limit=50, page_start=0):
+def get_api_data(type_value, tag_value, cookie, page_limit=50, page_start=0, conditional=False):
     """获取豆瓣API数据，用于热门、最新、冷门佳片等标签
     
     参数:
@@ -239,6 +137,7 @@ def get_api_data(type_value, tag_value, cookie, page_limit=50, page_start=0):
         cookie: 豆瓣cookie
         page_limit: 每页条目数量
         page_start: 起始位置
+        conditional: 是否使用条件请求，为 True 时数据没有变化会返回 None
     
     返回:
         API返回的json数据
@@ -250,20 +149,31 @@ def get_api_data(type_value, tag_value, cookie, page_limit=50, page_start=0):
         'page_limit': page_limit,
         'page_start': page_start
     }
-    headers = make_douban_headers(cookie)
+    if conditional:
+        # 延迟导入，避免循环导入
+        from src.utils.validator_store import conditional_get
+        response, changed = conditional_get(url, cookie, params=params)
+        if not changed:
+            print(f"{tag_value}（{type_value}）数据没有变化，跳过解析")
+            return None
+    else:
+        response = get_douban_client(cookie).get(url, params=params)
     
-    response = requests.get(url, params=params, headers=headers)
     if response.status_code == 200:
         return response.json()
     else:
         raise requests.RequestException(f"获取数据失败: HTTP {response.status_code}")
 
-def parse_api_item(item, cookie):
-    """解析 API 返回的条目数据"""
+def parse_api_item(item, cookie, info=None):
+    """解析 API 返回的条目数据
+    
+    info: 预先获取的条目详细信息，为 None 时自动获取
+    """
     try:
         # 获取详细信息
         subject_id = item['id']
-        info = get_subject_info_with_cache(subject_id, cookie)
+        if info is None:
+            info = get_subject_info_with_cache(subject_id, cookie)
         
         if not info:
             return None
@@ -490,34 +400,57 @@ def load_json_data(file_path, default_value=None):
         default_value = {'movies': [], 'tv_shows': [], 'update_time': ''}
         
     try:
-        if os.path.exists(file_path):
-            with open(file_path, 'r', encoding='utf-8') as f:
+        # 加共享锁，快照和日志在读取期间不会被其他进程合并
+        with file_lock(file_path, shared=True):
+            if os.path.exists(file_path):
                 print(f"读取文件: {file_path}")
-                data = json.load(f)
+                data = serializer.read_file(file_path)
                 print(f"读取文件成功: {file_path}")
-                return data
-        else:
-            print(f"文件不存在，使用默认值: {file_path}")
+            else:
+                print(f"文件不存在，使用默认值: {file_path}")
+                data = default_value
+            
+            # 重放上次合并后追加的增量日志
+            replayed = replay_journal(file_path, data)
+        if replayed:
+            print(f"已重放 {replayed} 条增量日志: {file_path}")
     except Exception as e:
         print(f"加载数据失败: {e}")
-    return default_value
+        return default_value
+    
+    # 数据文件中只保存成员记录，从条目缓存补全元数据
+    if is_item_data_file(file_path):
+        try:
+            hydrate_data(data)
+        except Exception as e:
+            print(f"补全条目元数据失败: {file_path}, 错误: {e}")
+    return data
 
 def save_json_data(data, file_path):
     """保存JSON数据到文件"""
+    if is_item_data_file(file_path):
+        # 条目元数据由条目缓存统一保存，数据文件中只写成员记录
+        try:
+            data = normalize_data(data)
+        except Exception as e:
+            print(f"精简条目元数据失败，按原样保存: {file_path}, 错误: {e}")
+    
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-            print(f"写入文件成功: {file_path}")
+        # 先写临时文件再原子替换，读取方只会看到旧快照或新快照
+        with file_lock(file_path):
+            serializer.write_file(data, file_path)
+            # 快照已包含全部改动，增量日志不再需要
+            remove_journal(file_path)
+        print(f"写入文件成功: {file_path}")
         return True
     except Exception as e:
         print(f"保存数据失败: {file_path}, 错误: {e}")
         return False
 
 def load_subject_cache():
-    """加载条目缓存"""
+    """加载全部条目缓存（单个条目请使用 get_subject_store().get）"""
     try:
-        cache_data = load_json_data(CACHE_FILE, {})
+        cache_data = get_subject_store().load_all()
         print(f"已加载条目缓存: {len(cache_data)} 条记录")
         return cache_data
     except Exception as e:
@@ -525,58 +458,13 @@ def load_subject_cache():
         return {}
 
 def save_subject_cache(cache_data):
-    """保存条目缓存"""
+    """写入条目缓存（按条目更新，不会删除未包含的条目）"""
     try:
-        save_json_data(cache_data, CACHE_FILE)
+        get_subject_store().upsert_many(cache_data)
         print(f"已保存条目缓存: {len(cache_data)} 条记录")
     except Exception as e:
         print(f"保存条目缓存失败: {e}")
 
-def is_cache_expired(cache_timestamp, expire_days=CACHE_EXPIRE_DAYS):
-    """检查缓存是否过期
-    
-    Args:
-        cache_timestamp: 缓存时间戳（字符串格式：'2024-01-01 12:00:00'）
-        expire_days: 过期天数，默认30天
-    
-    Returns:
-        bool: True表示已过期，False表示未过期
-    """
-    if not cache_timestamp:
-        return True
-    
-    try:
-        import datetime
-        cache_time = datetime.datetime.strptime(cache_timestamp, '%Y-%m-%d %H:%M:%S')
-        current_time = datetime.datetime.now()
-        expired = (current_time - cache_time).days >= expire_days
-        
-        if expired:
-            print(f"缓存已过期: {cache_timestamp} (超过{expire_days}天)")
-        
-        return expired
-    except Exception as e:
-        print(f"检查缓存过期时间出错: {e}")
-        return True  # 如果无法解析时间，则认为已过期
-
-def update_cache_item(cache_data, subject_id, info):
-    """更新缓存条目
-    
-    Args:
-        cache_data: 缓存数据字典
-        subject_id: 条目ID  
-        info: 条目信息
-    """
-    import time
-    current_time = time.strftime('%Y-%m-%d %H:%M:%S')
-    
-    cache_data[subject_id] = {
-        'info': info,
-        'cached_at': current_time
-    }
-    
-    print(f"已缓存条目 {subject_id}: {info.get('type', 'unknown')} - {current_time}")
-
 def migrate_legacy_cache_data():
     """迁移旧的缓存数据，为没有缓存日期的数据设置当天日期"""
     try:
@@ -586,8 +474,6 @@ def migrate_legacy_cache_data():
             return
         
         print("发现旧的缓存数据，开始迁移...")
-        import time
-        current_time = time.strftime('%Y-%m-%d %H:%M:%S')
         
         # 加载现有缓存
         cache_data = load_subject_cache()
@@ -596,6 +482,7 @@ def migrate_legacy_cache_data():
         legacy_data = load_json_data(legacy_movies_file, {})
         
         migrated_count = 0
+        migrated = {}
         
         # 迁移所有用户数据
         for user_id, user_data in legacy_data.items():
@@ -619,10 +506,9 @@ def migrate_legacy_cache_data():
                             'episodes_info': movie.get('episodes_info', {})
                         }
                         
-                        cache_data[movie['id']] = {
-                            'info': info,
-                            'cached_at': current_time  # 设置为当天
-                        }
+                        # 不指定缓存时间，写入时按当前时间加随机浮动的有效期计算过期时间，
+                        # 避免迁移的条目在同一天集中过期
+                        cache_data[movie['id']] = migrated[movie['id']] = {'info': info}
                         migrated_count += 1
                 
                 # 处理电视剧数据
@@ -644,14 +530,11 @@ def migrate_legacy_cache_data():
                             'episodes_info': tv.get('episodes_info', {})
                         }
                         
-                        cache_data[tv['id']] = {
-                            'info': info,
-                            'cached_at': current_time  # 设置为当天
-                        }
+                        cache_data[tv['id']] = migrated[tv['id']] = {'info': info}
                         migrated_count += 1
         
         if migrated_count > 0:
-            save_subject_cache(cache_data)
+            save_subject_cache(migrated)
             print(f"缓存迁移完成: 迁移了 {migrated_count} 条记录")
         else:
             print("没有需要迁移的缓存数据")
@@ -659,31 +542,38 @@ def migrate_legacy_cache_data():
     except Exception as e:
         print(f"迁移缓存数据时出错: {e}")
 
-def get_subject_info_with_cache(subject_id, cookie, max_retries=3):
-    """获取条目详细信息（带缓存和过期检查）"""
-    # 加载缓存
-    cache_data = load_subject_cache()
+def get_subject_info_with_cache(subject_id, cookie, max_retries=3, required_fields=()):
+    """获取条目详细信息（带缓存）
     
-    # 检查缓存是否存在且未过期
-    if subject_id in cache_data:
-        cached_item = cache_data[subject_id]
-        cached_at = cached_item.get('cached_at')
-        
-        if not is_cache_expired(cached_at):
-            print(f"从缓存获取条目 {subject_id} 信息 (缓存时间: {cached_at})")
-            return cached_item['info']
+    缓存过期后仍先返回旧数据，由续期任务（refresh_subject_cache）分批重新获取，解析过程中不集中刷新
+    可以在多个线程中同时调用：缓存存储本身是线程安全的，网络请求不加锁
+    required_fields 为调用方需要的字段：较早版本缓存的条目没有这些字段，视为过时并立即重新获取一次，
+    重新获取失败时仍返回旧数据
+    """
+    store = get_subject_store()
+    
+    cached_item = store.get(subject_id)
+    if cached_item:
+        missing = [field for field in required_fields if field not in cached_item['info']]
+        if missing:
+            print(f"条目 {subject_id} 缓存缺少字段 {', '.join(missing)}，重新获取")
+            info = get_subject_info(subject_id, cookie, max_retries)
+            if info:
+                store.upsert(subject_id, info)
+                return info
+            print(f"警告: 条目 {subject_id} 重新获取失败，使用缺少字段的缓存数据")
+        elif is_entry_expired(subject_id, cached_item):
+            print(f"条目 {subject_id} 缓存已过期，先使用缓存数据，等待续期")
         else:
-            print(f"条目 {subject_id} 缓存已过期，将重新获取")
-            # 删除过期缓存
-            del cache_data[subject_id]
+            print(f"从缓存获取条目 {subject_id} 信息 (缓存时间: {cached_item.get('cached_at')})")
+        return cached_item['info']
     
-    # 缓存不存在或已过期，重新获取
+    # 缓存不存在，从网络获取
     print(f"从网络获取条目 {subject_id} 信息...")
     info = get_subject_info(subject_id, cookie, max_retries)
     
     if info:
-        # 更新缓存
-        update_cache_item(cache_data, subject_id, info)
-        save_subject_cache(cache_data)
+        store.upsert(subject_id, info)
+        print(f"已缓存条目 {subject_id}: {info.get('type', 'unknown')}")
     
-    return info 
\ No newline at end of file
+    return info
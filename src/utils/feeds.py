@@ -0,0 +1,421 @@
+"""
+订阅内容生成模块
+/rss/* 接口返回 Radarr/Sonarr 使用的 JSON 列表，/rsshub/* 接口返回 RSS XML。每个解析器运行结束后
+调用 write_feeds 把对应数据文件的全部订阅内容写入数据目录下的 feeds 目录（同时写入 gzip/brotli 压缩版本），
+API 直接发送这些文件；文件比数据文件旧（或还没有生成）时 API 再按请求生成
+
+RSS 中的链接需要站点地址：配置了 feed_base_url 时才预先生成 XML，否则 /rsshub/* 在第一次请求时
+以请求的站点地址生成订阅文件。订阅内容中的元数据来自条目缓存，条目缓存在订阅文件生成之后有写入
+（包括其他进程的写入，见 subject_store.UPDATED_FILE）时订阅文件同样视为过期
+"""
+
+import os
+import re
+import shutil
+from email.utils import formatdate
+from functools import partial
+from itertools import islice
+from xml.sax.saxutils import escape, quoteattr
+
+from src.utils import serializer
+from src.utils.compression import ENCODINGS, SUFFIXES, compress
+from src.utils.data_reader import file_stat
+from src.utils.journal import journal_path
+from src.utils.subject_store import UPDATED_FILE
+
+FEEDS_DIRNAME = 'feeds'
+
+# 各类订阅的 Content-Type，按文件扩展名区分
+MIMETYPES = {
+    '.json': 'application/json',
+    '.xml': 'application/xml'
+}
+
+
+def get_unique_items(data, item_type='movies'):
+    """获取去重后的条目列表"""
+    all_items = []
+
+    # 遍历所有用户的数据
+    for user_data in data.values():
+        if isinstance(user_data, dict):
+            all_items.extend(user_data.get(item_type, []))
+
+    # 去重（基于标题）
+    seen = set()
+    unique_items = []
+    for item in all_items:
+        title = item.get('title', '')
+        if title and title not in seen:
+            seen.add(title)
+            unique_items.append(item)
+
+    return unique_items
+
+
+def convert_to_radarr_format(items, is_tv=False):
+    """转换为Radarr格式"""
+    result = []
+    for item in items:
+        # 获取标题和年份
+        title = item.get('title', '')
+        year = item.get('year')  # 直接从item中获取year字段
+
+        # 处理标题
+        main_title = title.split(' / ')[0].strip()
+        if is_tv:
+            # 电视剧去掉"第x季"的部分
+            main_title = re.sub(r'\s*第[一二三四五六七八九十\d]+季.*$', '', main_title)
+        elif year:
+            # 电影添加年份
+            main_title = f"{main_title} {year}"
+
+        # 构建返回数据
+        media_data = {
+            "title": main_title,
+            "poster_url": item.get('cover_url', '')
+        }
+
+        # 只有在有 imdb_id 时才添加该字段
+        if item.get('imdb_id'):
+            media_data["imdb_id"] = item.get('imdb_id')
+
+        result.append(media_data)
+    return result
+
+
+# RSS 每次输出的条目数：逐条生成后按批输出，避免大量很小的写入
+RSS_CHUNK_ITEMS = 64
+
+
+def format_rfc822(timestamp=None):
+    """RSS 使用的 RFC 822 格式时间（GMT），默认为当前时间"""
+    return formatdate(timestamp, usegmt=True)
+
+
+def xml_text(text):
+    """转义 XML 文本内容"""
+    return escape(str(text), {'"': '&quot;'})
+
+
+def rss_item(item, pub_date):
+    """生成单个条目的 <item> 元素"""
+    # 链接（没有链接的条目使用详情页地址）
+    link_text = xml_text(item.get('url') or f"https://movie.douban.com/subject/{item.get('id', '')}/")
+
+    # 描述和内容
+    description_text = xml_text(f"""
+        <img src="{item.get('cover_url', item.get('cover', ''))}" />
+        <p>评分: {item.get('rating', 'N/A')}</p>
+        <p>{item.get('intro', '')}</p>
+        """)
+
+    return (
+        '    <item>\n'
+        f'      <title>{xml_text(item.get("title", ""))}</title>\n'
+        f'      <link>{link_text}</link>\n'
+        f'      <guid isPermaLink="true">{link_text}</guid>\n'
+        f'      <pubDate>{xml_text(item.get("pub_date", pub_date))}</pubDate>\n'
+        f'      <description>{description_text}</description>\n'
+        f'      <content:encoded>{description_text}</content:encoded>\n'
+        '    </item>\n'
+    )
+
+
+def iter_rss(items, title, description, link, build_date=None):
+    """逐段生成符合 RSSHub 格式的 RSS XML
+
+    items 可以是任意可迭代对象，条目逐个转换后按批输出，不在内存中构建整个文档。
+    build_date 为 RFC 822 格式的生成时间，同时作为没有发布日期的条目的发布日期，默认为当前时间
+    """
+    build_date = build_date or format_rfc822()
+    link_text = xml_text(link)
+    yield (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<rss xmlns:atom="http://www.w3.org/2005/Atom" '
+        'xmlns:content="http://purl.org/rss/1.0/modules/content/" version="2.0">\n'
+        '  <channel>\n'
+        f'    <title>{xml_text(title)}</title>\n'
+        f'    <link>{link_text}</link>\n'
+        f'    <description>{xml_text(description)}</description>\n'
+        '    <language>zh-cn</language>\n'
+        f'    <lastBuildDate>{build_date}</lastBuildDate>\n'
+        f'    <atom:link href={quoteattr(link)} rel="self" type="application/rss+xml"/>\n'
+    )
+
+    chunk = []
+    for item in items:
+        chunk.append(rss_item(item, build_date))
+        if len(chunk) >= RSS_CHUNK_ITEMS:
+            yield ''.join(chunk)
+            chunk = []
+    chunk.append('  </channel>\n</rss>\n')
+    yield ''.join(chunk)
+
+
+def generate_rss(items, title, description, link, build_date=None):
+    """生成符合 RSSHub 格式的 RSS XML（完整字符串）"""
+    return ''.join(iter_rss(items, title, description, link, build_date))
+
+
+def paged(items, offset=0, limit=None):
+    """按 offset/limit 截取条目，不复制列表"""
+    return islice(items, offset, offset + limit if limit is not None else None)
+
+
+# 各订阅的生成函数：参数为 (数据, 订阅地址, 生成时间, (offset, limit), 路由参数)，
+# 返回逐段输出响应内容（bytes）的可迭代对象；片单不存在时返回 None
+
+def radarr_json(items, is_tv, page):
+    return [serializer.dumps(convert_to_radarr_format(paged(items, *page), is_tv), 'compact')]
+
+
+def rss_xml(items, title, description, link, build_date, page):
+    return (chunk.encode('utf-8') for chunk in iter_rss(paged(items, *page), title, description, link, build_date))
+
+
+def unique_items_json(data, link, build_date, page, item_type, is_tv=False):
+    return radarr_json(get_unique_items(data, item_type), is_tv, page)
+
+
+def list_items_json(data, link, build_date, page, list_name, is_tv=False):
+    return radarr_json(data.get(list_name, []), is_tv, page)
+
+
+def doulist_items(data, media_type, doulist_id=None):
+    """片单中指定类型的条目：给出 doulist_id 时只取该片单，片单不存在时返回 None"""
+    lists = data.get('lists', {})
+    if doulist_id is not None:
+        if not lists.get(doulist_id):
+            return None
+        lists = {doulist_id: lists[doulist_id]}
+    return [item for doulist_data in lists.values() for item in doulist_data.get('items', [])
+            if item.get('type') == media_type]
+
+
+def doulist_items_json(data, link, build_date, page, media_type, doulist_id=None):
+    items = doulist_items(data, media_type, doulist_id)
+    return None if items is None else radarr_json(items, media_type == 'tv', page)
+
+
+def unique_items_rss(data, link, build_date, page, item_types, title, description):
+    items = (item for item_type in item_types for item in get_unique_items(data, item_type))
+    return rss_xml(items, title, description, link, build_date, page)
+
+
+def list_items_rss(data, link, build_date, page, list_name, title, description):
+    return rss_xml(data.get(list_name, []), title, description, link, build_date, page)
+
+
+def doulists_rss(data, link, build_date, page):
+    # 按添加时间排序（最新的在前）
+    all_items = [item for doulist_data in data.get('lists', {}).values() for item in doulist_data.get('items', [])]
+    all_items.sort(key=lambda x: x.get('add_time', ''), reverse=True)
+    return rss_xml(all_items, "豆瓣片单合集", "所有关注的豆瓣片单中的电影和剧集", link, build_date, page)
+
+
+def doulist_rss(data, link, build_date, page, doulist_id):
+    doulist_data = data.get('lists', {}).get(doulist_id, {})
+    if not doulist_data:
+        return None
+    list_info = doulist_data.get('list_info', {})
+    title = list_info.get('title', f"豆瓣片单 {doulist_id}")
+    description = list_info.get('description', "豆瓣片单中的电影和剧集")
+    return rss_xml(doulist_data.get('items', []), title, description, list_info.get('url', link), build_date, page)
+
+
+# 全部订阅：{路由: (数据文件名, 生成函数)}，/rss/* 为 JSON，/rsshub/* 为 XML
+FEEDS = {
+    '/rss/movies': ('movies.json', partial(unique_items_json, item_type='movies')),
+    '/rss/tv': ('movies.json', partial(unique_items_json, item_type='tv_shows', is_tv=True)),
+    '/rss/status_movies': ('status.json', partial(unique_items_json, item_type='movies')),
+    '/rss/status_tv': ('status.json', partial(unique_items_json, item_type='tv_shows', is_tv=True)),
+    '/rss/new_movies': ('new_movies.json', partial(list_items_json, list_name='movies')),
+    '/rss/hot_movies': ('hot_movies.json', partial(list_items_json, list_name='movies')),
+    '/rss/hot_tv': ('hot_movies.json', partial(list_items_json, list_name='tv_shows', is_tv=True)),
+    '/rss/hidden_gems_movies': ('hidden_gems.json', partial(list_items_json, list_name='movies')),
+    '/rss/doulists': ('doulists.json', partial(doulist_items_json, media_type='movie')),
+    '/rss/doulist/<doulist_id>': ('doulists.json', partial(doulist_items_json, media_type='movie')),
+    '/rss/doulists_tv': ('doulists.json', partial(doulist_items_json, media_type='tv')),
+    '/rss/doulist_tv/<doulist_id>': ('doulists.json', partial(doulist_items_json, media_type='tv')),
+    '/rsshub/wish': ('movies.json', partial(unique_items_rss, item_types=('movies', 'tv_shows'),
+                                            title="豆瓣用户想看", description="豆瓣用户想看的电影和电视剧")),
+    '/rsshub/movies': ('movies.json', partial(unique_items_rss, item_types=('movies',),
+                                              title="豆瓣用户想看的电影", description="豆瓣用户想看的电影")),
+    '/rsshub/tv': ('movies.json', partial(unique_items_rss, item_types=('tv_shows',),
+                                          title="豆瓣用户想看的电视剧", description="豆瓣用户想看的电视剧")),
+    '/rsshub/new_movies': ('new_movies.json', partial(list_items_rss, list_name='movies',
+                                                      title="豆瓣最新电影", description="豆瓣最新上映的电影")),
+    '/rsshub/hot_movies': ('hot_movies.json', partial(list_items_rss, list_name='movies',
+                                                      title="豆瓣热门电影", description="豆瓣热门的电影")),
+    '/rsshub/hot_tv': ('hot_movies.json', partial(list_items_rss, list_name='tv_shows',
+                                                  title="豆瓣热门电视剧", description="豆瓣热门的电视剧")),
+    '/rsshub/hidden_gems_movies': ('hidden_gems.json', partial(list_items_rss, list_name='movies',
+                                                               title="豆瓣冷门佳片电影", description="豆瓣冷门但评分很高的电影")),
+    '/rsshub/status_movies': ('status.json', partial(unique_items_rss, item_types=('movies',),
+                                                     title="豆瓣广播电影", description="从豆瓣用户广播中提取的电影")),
+    '/rsshub/status_tv': ('status.json', partial(unique_items_rss, item_types=('tv_shows',),
+                                                 title="豆瓣广播剧集", description="从豆瓣用户广播中提取的电视剧")),
+    '/rsshub/doulists': ('doulists.json', doulists_rss),
+    '/rsshub/doulist/<doulist_id>': ('doulists.json', doulist_rss),
+}
+
+
+# 订阅用到的全部数据文件名
+SOURCE_NAMES = sorted({source for source, _ in FEEDS.values()})
+
+
+def feed_extension(route):
+    """订阅文件的扩展名"""
+    return '.xml' if route.startswith('/rsshub/') else '.json'
+
+
+def feed_path(route, **params):
+    """填入路由参数后的订阅地址，例如 /rss/doulist/123"""
+    for name, value in params.items():
+        route = route.replace(f'<{name}>', str(value))
+    return route
+
+
+def feeds_dir(source_file):
+    """数据文件对应的订阅文件目录"""
+    return os.path.join(os.path.dirname(source_file) or '.', FEEDS_DIRNAME)
+
+
+def artifact_path(source_file, route, **params):
+    """订阅文件路径，例如 feeds/rss/doulist/123.json"""
+    return os.path.join(feeds_dir(source_file), feed_path(route, **params).lstrip('/') + feed_extension(route))
+
+
+def source_stats(source_file):
+    """数据文件、增量日志和条目缓存标记文件的 (修改时间, 大小)，不存在的文件为 None
+
+    每次调用读取三个文件的信息（三次 stat）；判断订阅文件是否过期还要再读取订阅文件本身的信息
+    """
+    return file_stat(source_file), file_stat(journal_path(source_file)), file_stat(UPDATED_FILE)
+
+
+def source_mtime_ns(stats):
+    """source_stats 中最晚的修改时间（纳秒），文件都不存在时返回 None"""
+    mtimes = [stat[0] for stat in stats if stat]
+    return max(mtimes) if mtimes else None
+
+
+def source_mtime(stats):
+    """source_stats 中最晚的修改时间（Unix 时间戳），文件都不存在时返回 None"""
+    mtime_ns = source_mtime_ns(stats)
+    return mtime_ns / 1e9 if mtime_ns is not None else None
+
+
+def fresh_artifact_stat(artifact_file, source_file, stats=None):
+    """订阅文件不早于数据文件、增量日志和条目缓存的最后修改时间时返回它的 (修改时间, 大小)，否则（包括文件不存在）返回 None
+
+    stats 为已经获取的 source_stats(source_file)，同一请求中多次检查时避免重复读取文件信息
+    """
+    artifact_stat = file_stat(artifact_file)
+    if not artifact_stat:
+        return None
+    for stat in stats or source_stats(source_file):
+        if stat and stat[0] > artifact_stat[0]:
+            return None
+    return artifact_stat
+
+
+def is_artifact_fresh(artifact_file, source_file, stats=None):
+    """订阅文件是否存在，且不早于数据文件、增量日志和条目缓存的最后修改时间"""
+    return fresh_artifact_stat(artifact_file, source_file, stats) is not None
+
+
+def build_feed(route, data, link, build_date=None, page=(0, None), **params):
+    """生成单个订阅，返回逐段输出内容（bytes）的可迭代对象，片单不存在时返回 None
+
+    build_date 为 RFC 822 格式的生成时间（默认为当前时间），page 为 (offset, limit)
+    """
+    _, builder = FEEDS[route]
+    return builder(data, link, build_date, page, **params)
+
+
+def write_artifact(raw, file_path, mtime_ns=None):
+    """写入订阅文件及其各个压缩版本，返回 {编码: 压缩后的大小}
+
+    先写压缩版本，订阅文件的修改时间不早于压缩版本；当前不可用的编码（例如卸载了 brotli）留下的旧压缩文件会被删除。
+    给出 mtime_ns 时把各个文件的修改时间设为它：按请求生成时传入读取数据之前的 source_mtime_ns，
+    读取到写入之间数据有更新时，订阅文件仍比数据旧，下次请求会重新生成
+    """
+    sizes = {}
+    written = []
+    for encoding, suffix in SUFFIXES.items():
+        if encoding in ENCODINGS:
+            compressed = compress(raw, encoding)
+            serializer.write_bytes(compressed, file_path + suffix)
+            sizes[encoding] = len(compressed)
+            written.append(file_path + suffix)
+        elif os.path.exists(file_path + suffix):
+            os.remove(file_path + suffix)
+    serializer.write_bytes(raw, file_path)
+    if mtime_ns is not None:
+        for path in written + [file_path]:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+    return sizes
+
+
+def write_feed(source_file, route, data, base_url, build_date=None, mtime_ns=None, **params):
+    """生成单个订阅并写入订阅文件，返回 (未压缩的大小, {编码: 压缩后的大小})，片单不存在时返回 None
+
+    base_url 为站点地址，用于 RSS 中的链接；mtime_ns 见 write_artifact
+    """
+    link = base_url.rstrip('/') + feed_path(route, **params) if base_url else ''
+    chunks = build_feed(route, data, link, build_date, **params)
+    if chunks is None:
+        return None
+    raw = b''.join(chunks)
+    return len(raw), write_artifact(raw, artifact_path(source_file, route, **params), mtime_ns)
+
+
+def write_feeds(source_file, base_url=None):
+    """生成数据文件对应的全部订阅文件，返回写入的订阅数
+
+    base_url 为站点地址（例如 http://192.168.1.2:5000/），默认读取配置 feed_base_url，
+    没有站点地址时只生成 JSON 订阅，RSS 订阅在第一次请求时生成（见 feed_server.serve_feed）
+    """
+    from src.utils.douban_utils import load_config, load_json_data
+
+    try:
+        if base_url is None:
+            base_url = load_config().get('feed_base_url', '')
+        name = os.path.basename(source_file)
+        # 先记下数据的更新时间再读取：以它作为 RSS 的生成时间和订阅文件的修改时间，内容相同的订阅每次生成的结果也相同
+        mtime_ns = source_mtime_ns(source_stats(source_file))
+        data = load_json_data(source_file, {})
+        directory = feeds_dir(source_file)
+        build_date = format_rfc822(mtime_ns / 1e9 if mtime_ns is not None else None)
+
+        written = 0
+        raw_size = 0
+        compressed_sizes = {}
+        for route, (feed_source, _) in FEEDS.items():
+            if feed_source != name or (route.startswith('/rsshub/') and not base_url):
+                continue
+
+            params_list = [{}]
+            if '<doulist_id>' in route:
+                # 每个片单一个订阅文件；先清空目录，移除已删除片单的订阅
+                route_dir = os.path.dirname(artifact_path(source_file, route, doulist_id='_'))
+                shutil.rmtree(route_dir, ignore_errors=True)
+                params_list = [{'doulist_id': doulist_id} for doulist_id in data.get('lists', {})]
+
+            for params in params_list:
+                result = write_feed(source_file, route, data, base_url, build_date, mtime_ns, **params)
+                if result is not None:
+                    size, sizes = result
+                    written += 1
+                    raw_size += size
+                    for encoding, size in sizes.items():
+                        compressed_sizes[encoding] = compressed_sizes.get(encoding, 0) + size
+
+        savings = ', '.join(f"{encoding} {size / 1024:.1f} KB" for encoding, size in compressed_sizes.items())
+        print(f"已生成 {written} 个订阅文件: {directory} (原始 {raw_size / 1024:.1f} KB" + (f", {savings})" if savings else ')'))
+        return written
+    except Exception as e:
+        print(f"生成订阅文件失败: {source_file}, 错误: {e}")
+        return 0
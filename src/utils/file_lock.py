@@ -0,0 +1,59 @@
+"""
+数据文件锁模块
+多个解析器进程和 API 进程会同时读写同一个数据文件及其增量日志，用数据文件旁边的 .lock 文件加锁：
+- 写入快照、追加或合并日志时加排他锁
+- 读取快照和日志时加共享锁，避免读到合并到一半的状态
+同一线程内可以重复加锁（例如合并日志时再保存快照），重入时沿用已持有的锁。不支持 fcntl 的平台上不加锁
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# 当前线程持有的锁：{锁文件路径: [文件描述符, 重入次数]}
+_held = threading.local()
+
+
+def lock_path(file_path):
+    """数据文件对应的锁文件路径"""
+    return f"{file_path}.lock"
+
+
+@contextmanager
+def file_lock(file_path, shared=False):
+    """对数据文件加锁（shared 为 True 时加共享锁）"""
+    if fcntl is None:
+        yield
+        return
+
+    path = lock_path(file_path)
+    held = getattr(_held, 'locks', None)
+    if held is None:
+        held = _held.locks = {}
+
+    if path in held:
+        # 同一线程已持有该锁（排他锁或共享锁），直接重入
+        held[path][1] += 1
+        try:
+            yield
+        finally:
+            held[path][1] -= 1
+        return
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        held[path] = [fd, 1]
+        try:
+            yield
+        finally:
+            del held[path]
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
@@ -0,0 +1,45 @@
+"""
+条目索引模块
+为一个用户已保存的条目建立内存索引：以豆瓣ID为主键，标题和完整标题为辅助键，
+查重从线性扫描变为字典查找
+"""
+
+
+class ItemIndex:
+    """已保存条目的索引
+
+    每次运行为每个用户构建一次，新增条目时同步更新
+    """
+
+    def __init__(self, items=()):
+        self.by_id = {}
+        self.by_title = {}
+        for item in items:
+            self.add(item)
+
+    @classmethod
+    def from_user_data(cls, user_data):
+        """从用户数据（movies / tv_shows）构建索引"""
+        return cls(user_data.get('movies', []) + user_data.get('tv_shows', []))
+
+    def add(self, item):
+        """加入条目，同一ID或标题已存在时保留先加入的条目"""
+        subject_id = item.get('id')
+        if subject_id:
+            self.by_id.setdefault(subject_id, item)
+        for key in (item.get('title'), item.get('full_title')):
+            if key:
+                self.by_title.setdefault(key, item)
+
+    def find(self, subject_id=None, title=None):
+        """按豆瓣ID或标题查找已保存的条目，找不到时返回 None"""
+        if subject_id and subject_id in self.by_id:
+            return self.by_id[subject_id]
+        if title:
+            return self.by_title.get(title)
+        return None
+
+    def known_ids(self):
+        """已保存条目的豆瓣ID集合（副本，可在其他线程中使用）"""
+        return set(self.by_id)
+
@@ -0,0 +1,152 @@
+"""
+条目元数据规范化模块
+各监控的数据文件（movies.json、status.json、new_movies.json、hot_movies.json、hidden_gems.json、doulists.json）
+不再各自保存一份条目元数据（导演、演员、类型、语言、IMDb ID 等）：
+- 元数据按条目ID只在条目缓存（subject_store）中保存一份，刷新元数据只需写一次
+- 数据文件中只保留成员记录：ID、标题、链接、封面、来源、加入时间、通知状态等监控自己的字段
+- 写入数据文件时去掉与条目缓存中相同的元数据字段，并在记录中记下去掉了哪些字段（_stripped），
+  读取时只补全这些字段：原本没有某个字段的记录（例如想看列表的条目没有 year）读取后仍然没有，订阅内容不变
+- imdb_id 是 Radarr/Sonarr 订阅识别条目所用的字段，始终保留在成员记录中，条目缓存丢失时也不受影响
+"""
+
+import os
+
+from src.utils.subject_store import get_subject_store
+
+# 由条目缓存统一保存的元数据字段（与条目详细信息中的字段同名）
+SHARED_FIELDS = (
+    'year', 'director', 'actors', 'genres', 'region',
+    'languages', 'duration', 'release_date', 'vote_count', 'episodes_info'
+)
+
+# 成员记录中记录写入时去掉了哪些元数据字段的键
+STRIPPED_KEY = '_stripped'
+
+# 保存条目成员记录的数据文件
+ITEM_DATA_FILES = (
+    'movies.json', 'status.json', 'new_movies.json',
+    'hot_movies.json', 'hidden_gems.json', 'doulists.json'
+)
+
+
+def is_item_data_file(file_path):
+    """是否为保存条目成员记录的数据文件"""
+    return os.path.basename(file_path) in ITEM_DATA_FILES
+
+
+def is_item(node):
+    """条目记录为带 id 的字典"""
+    return isinstance(node, dict) and bool(node.get('id'))
+
+
+def iter_items(node):
+    """遍历数据中的所有条目记录（条目记录位于列表中）"""
+    if isinstance(node, dict):
+        for value in node.values():
+            yield from iter_items(value)
+    elif isinstance(node, list):
+        for value in node:
+            if is_item(value):
+                yield value
+            else:
+                yield from iter_items(value)
+
+
+def load_infos(subject_ids, store=None):
+    """从条目缓存批量获取条目详细信息，返回 {subject_id: info}"""
+    store = store or get_subject_store()
+    entries = store.get_many(set(subject_ids))
+    return {subject_id: entry.get('info') or {} for subject_id, entry in entries.items()}
+
+
+def strip_item(item, info):
+    """去掉与条目缓存中相同的元数据字段，返回成员记录（新字典），去掉的字段记在 _stripped 中"""
+    info = info or {}
+    stripped = [field for field in SHARED_FIELDS if field in item and field in info and item[field] == info[field]]
+    if not stripped:
+        return item
+    record = {key: value for key, value in item.items() if key not in stripped}
+    # 之前补全时缓存中缺少的字段仍记在 _stripped 中，缓存恢复后可以再补全
+    record[STRIPPED_KEY] = sorted(set(stripped) | set(item.get(STRIPPED_KEY, ())))
+    return record
+
+
+def hydrate_item(item, info):
+    """用条目缓存中的元数据补全成员记录写入时去掉的字段（原地修改），返回条目缓存中缺少的字段"""
+    fields = item.pop(STRIPPED_KEY, None)
+    if not fields:
+        return []
+    info = info or {}
+    missing = []
+    for field in fields:
+        if field in info:
+            item[field] = info[field]
+        else:
+            missing.append(field)
+    if missing:
+        # 保留缺少的字段，再次保存时不会丢失需要补全的记录
+        item[STRIPPED_KEY] = missing
+    return missing
+
+
+def _normalize(node, infos):
+    if isinstance(node, dict):
+        return {key: _normalize(value, infos) for key, value in node.items()}
+    if isinstance(node, list):
+        return [strip_item(value, infos.get(value['id'])) if is_item(value) else _normalize(value, infos)
+                for value in node]
+    return node
+
+
+def flush_stripped(records, store):
+    """把去掉了元数据字段的条目写入存储：元数据必须先写入存储，再写只引用它的成员记录
+
+    只写回这些条目，条目缓存中其他待写回的更新仍按批量写回
+    """
+    store.flush([record['id'] for record in records if record.get(STRIPPED_KEY)])
+
+
+def normalize_data(data, store=None):
+    """生成只包含成员记录的数据副本（用于写入文件，不修改内存中的数据）"""
+    store = store or get_subject_store()
+    # 内存缓存中尚未写回的条目也能读到
+    infos = load_infos((item['id'] for item in iter_items(data)), store)
+    normalized = _normalize(data, infos)
+    flush_stripped(iter_items(normalized), store)
+    return normalized
+
+
+def normalize_records(records, store=None):
+    """去掉增量日志记录中条目的元数据字段，返回新的记录列表"""
+    store = store or get_subject_store()
+    ids = [record['value']['id'] for record in records
+           if record.get('op') == 'upsert' and is_item(record.get('value'))]
+    if not ids:
+        return records
+
+    infos = load_infos(ids, store)
+    normalized = []
+    for record in records:
+        if record.get('op') == 'upsert' and is_item(record.get('value')):
+            record = dict(record, value=strip_item(record['value'], infos.get(record['value']['id'])))
+        normalized.append(record)
+    flush_stripped((record['value'] for record in normalized if record.get('op') == 'upsert'
+                    and is_item(record.get('value'))), store)
+    return normalized
+
+
+def hydrate_data(data, store=None):
+    """用条目缓存中的元数据补全数据中的所有成员记录（原地修改），返回 data
+
+    条目缓存被删除或损坏时部分记录无法补全，输出警告（imdb_id 保存在成员记录中，不受影响）
+    """
+    items = [item for item in iter_items(data) if item.get(STRIPPED_KEY)]
+    if not items:
+        return data
+
+    infos = load_infos((item['id'] for item in items), store)
+    incomplete = [item['id'] for item in items if hydrate_item(item, infos.get(item['id']))]
+    if incomplete:
+        print(f"警告: {len(incomplete)} 个条目在条目缓存中找不到元数据，年份等字段将缺失"
+              f"（例如 {', '.join(incomplete[:5])}），条目缓存恢复后会自动补全")
+    return data
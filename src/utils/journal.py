@@ -0,0 +1,188 @@
+"""
+数据文件增量日志模块
+解析器每处理一个条目只把这次的改动追加到数据文件旁边的 .journal 文件中，不再改写整个 JSON 文件；
+读取时先加载快照再按顺序重放日志，日志超过阈值或一次运行结束时合并回快照
+
+日志每行是一条 JSON 记录，支持的操作（重复重放结果不变）：
+- set:        {"op": "set", "path": [...], "value": ...}           设置路径上的值
+- setdefault: {"op": "setdefault", "path": [...], "value": ...}    路径不存在时才设置
+- upsert:     {"op": "upsert", "path": [...], "value": {...}, "key": "id", "head": false}
+              在列表中按 key 替换同一条目，不存在时追加到末尾（head 为 true 时插入到开头）
+- remove:     {"op": "remove", "path": [...], "key": "id", "value": 条目ID}  从列表中删除条目
+"""
+
+import json
+import os
+import threading
+
+from src.utils.file_lock import file_lock
+from src.utils.item_metadata import is_item_data_file, normalize_records
+
+# 日志文件超过该大小（字节）时合并回快照
+JOURNAL_COMPACT_BYTES = 512 * 1024
+
+_journal_lock = threading.Lock()
+
+
+def journal_path(file_path):
+    """数据文件对应的日志文件路径"""
+    return f"{file_path}.journal"
+
+
+def op_set(path, value):
+    """设置路径上的值"""
+    return {'op': 'set', 'path': list(path), 'value': value}
+
+
+def op_setdefault(path, value):
+    """路径不存在时设置默认值"""
+    return {'op': 'setdefault', 'path': list(path), 'value': value}
+
+
+def op_upsert(path, item, key='id', head=False):
+    """在列表中按 key 写入条目"""
+    return {'op': 'upsert', 'path': list(path), 'value': item, 'key': key, 'head': head}
+
+
+def op_remove(path, item_id, key='id'):
+    """从列表中按 key 删除条目"""
+    return {'op': 'remove', 'path': list(path), 'value': item_id, 'key': key}
+
+
+def _parent(data, path):
+    """获取路径的父容器，中间不存在的层级按字典创建"""
+    node = data
+    for part in path[:-1]:
+        if not isinstance(node.get(part), dict):
+            node[part] = {}
+        node = node[part]
+    return node
+
+
+def apply_op(data, record):
+    """在数据上执行一条日志记录"""
+    op = record['op']
+    path = record['path']
+    parent = _parent(data, path)
+    name = path[-1]
+
+    if op == 'set':
+        parent[name] = record['value']
+    elif op == 'setdefault':
+        parent.setdefault(name, record['value'])
+    elif op in ('upsert', 'remove'):
+        items = parent.get(name)
+        if not isinstance(items, list):
+            items = parent[name] = []
+        key = record.get('key', 'id')
+
+        if op == 'remove':
+            items[:] = [item for item in items if item.get(key) != record['value']]
+            return
+
+        item = record['value']
+        item_id = item.get(key)
+        if item_id is not None:
+            for index, existing in enumerate(items):
+                if existing.get(key) == item_id:
+                    items[index] = item
+                    return
+        if record.get('head'):
+            items.insert(0, item)
+        else:
+            items.append(item)
+    else:
+        raise ValueError(f"未知的日志操作: {op}")
+
+
+def replay_journal(file_path, data):
+    """在快照数据上重放日志，返回重放的记录数
+
+    最后一行可能因进程中断而不完整，这种记录会被忽略
+    """
+    path = journal_path(file_path)
+    if not os.path.exists(path):
+        return 0
+
+    replayed = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                print(f"忽略不完整的日志记录: {path}")
+                continue
+            apply_op(data, record)
+            replayed += 1
+    return replayed
+
+
+def _ends_without_newline(path):
+    """日志文件非空且最后一个字符不是换行"""
+    try:
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b'\n'
+    except OSError:
+        return False
+
+
+def append_journal(file_path, records, data=None):
+    """追加日志记录并立即落盘
+
+    data 为调用方内存中的完整数据（已包含这些改动），日志超过阈值时用它合并回快照
+    """
+    path = journal_path(file_path)
+    if is_item_data_file(file_path):
+        # 条目元数据由条目缓存统一保存，日志中只记录成员记录
+        try:
+            records = normalize_records(records)
+        except Exception as e:
+            print(f"精简条目元数据失败，按原样记录: {e}")
+    lines = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+
+    # 先加文件锁再加线程锁，与 save_json_data（持有文件锁时删除日志）的加锁顺序一致
+    with file_lock(file_path), _journal_lock:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        if _ends_without_newline(path):
+            # 上次写入中断留下了不完整的一行，另起一行避免新记录与其连在一起
+            lines = '\n' + lines
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        size = os.path.getsize(path)
+
+    if data is not None and size >= JOURNAL_COMPACT_BYTES:
+        print(f"日志超过 {JOURNAL_COMPACT_BYTES // 1024} KB，合并到 {file_path}")
+        # 延迟导入，避免与 douban_utils 循环导入
+        from src.utils.douban_utils import save_json_data
+        save_json_data(data, file_path)
+
+
+def remove_journal(file_path):
+    """快照写入完成后删除日志"""
+    path = journal_path(file_path)
+    with _journal_lock:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def compact_journal(file_path, default_value=None):
+    """把日志合并回快照（一次运行结束时调用）
+
+    读取和写回期间持有排他锁，其他进程此时追加的日志不会丢失
+    """
+    if not os.path.exists(journal_path(file_path)):
+        return
+
+    from src.utils.douban_utils import load_json_data, save_json_data
+    with file_lock(file_path):
+        data = load_json_data(file_path, default_value)
+        save_json_data(data, file_path)
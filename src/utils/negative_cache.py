@@ -0,0 +1,147 @@
+"""
+失败结果缓存模块
+不存在的条目（404）、找不到对应条目的预告片、无法解析的短链接每轮都会被重新请求。
+把这些失败结果连同原因记录下来，在有效期（配置 negative_cache_ttl_hours，比条目缓存短得多）内直接跳过，
+过期后再重新尝试。不同进程共用 negative_cache.json，写入时加文件锁并与文件中的记录合并
+"""
+
+import os
+import threading
+import time
+
+from src.utils import serializer
+from src.utils.file_lock import file_lock
+
+# 获取配置目录
+CONFIG_DIR = os.getenv('CONFIG_DIR', 'config')
+NEGATIVE_CACHE_FILE = os.path.join(CONFIG_DIR, 'negative_cache.json')
+
+# 默认有效期（小时）
+DEFAULT_TTL_HOURS = 24
+
+# 失败原因
+REASON_NOT_FOUND = 'not_found'              # 页面返回 404
+REASON_NO_SUBJECT = 'no_subject'            # 预告片页面中找不到对应的条目
+REASON_REDIRECT_FAILED = 'redirect_failed'  # 短链接无法解析
+
+
+# 各类记录的键
+def subject_key(subject_id):
+    return f"subject:{subject_id}"
+
+
+def trailer_key(trailer_id):
+    return f"trailer:{trailer_id}"
+
+
+def short_url_key(short_url):
+    return f"short_url:{short_url}"
+
+
+def get_ttl_hours():
+    """读取配置中的有效期（小时）"""
+    from src.utils.douban_utils import load_config
+    return load_config().get('negative_cache_ttl_hours', DEFAULT_TTL_HOURS)
+
+
+class NegativeCache:
+    """失败结果缓存
+
+    记录格式：{键: {'reason': 失败原因, 'failed_at': 'YYYY-mm-dd HH:MM:SS', 'expires_at': Unix 时间戳}}，
+    键带有类型前缀（subject: / trailer: / short_url:）
+    """
+
+    def __init__(self, file_path=NEGATIVE_CACHE_FILE):
+        self.file_path = file_path
+        self._entries = None
+        self._lock = threading.Lock()
+        # 本进程内的统计：命中（跳过的请求）和新增的失败记录，按原因计数
+        self._hits = {}
+        self._added = {}
+
+    def _read_file(self):
+        if not os.path.exists(self.file_path):
+            return {}
+        try:
+            return serializer.read_file(self.file_path)
+        except Exception as e:
+            print(f"读取失败结果缓存出错: {e}")
+            return {}
+
+    def _load(self):
+        if self._entries is None:
+            self._entries = self._read_file()
+        return self._entries
+
+    def get(self, key, now=None):
+        """获取未过期的失败记录，没有或已过期时返回 None"""
+        now = now or time.time()
+        with self._lock:
+            entry = self._load().get(key)
+            if not entry or entry.get('expires_at', 0) <= now:
+                return None
+            self._hits[entry['reason']] = self._hits.get(entry['reason'], 0) + 1
+            return entry
+
+    def add(self, key, reason, ttl_hours=None, now=None):
+        """记录一次失败结果并立即保存"""
+        now = now or time.time()
+        if ttl_hours is None:
+            ttl_hours = get_ttl_hours()
+        if ttl_hours <= 0:
+            return
+
+        entry = {
+            'reason': reason,
+            'failed_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now)),
+            'expires_at': now + ttl_hours * 3600
+        }
+        with self._lock:
+            self._added[reason] = self._added.get(reason, 0) + 1
+            # 其他进程可能同时写入：加锁后重新读取文件再合并，顺便清理已过期的记录
+            with file_lock(self.file_path):
+                entries = self._read_file()
+                entries[key] = entry
+                entries = {k: v for k, v in entries.items() if v.get('expires_at', 0) > now}
+                serializer.write_file(entries, self.file_path, 'json')
+            self._entries = entries
+
+    def get_stats(self, now=None):
+        """统计信息：有效记录数（按原因）以及本进程的命中和新增次数"""
+        now = now or time.time()
+        with self._lock:
+            # 重新读取文件，包含其他进程新增的记录
+            self._entries = self._read_file()
+            active = {}
+            for entry in self._entries.values():
+                if entry.get('expires_at', 0) > now:
+                    active[entry['reason']] = active.get(entry['reason'], 0) + 1
+            return {
+                'entries': sum(active.values()),
+                'by_reason': active,
+                'hits': dict(self._hits),
+                'added': dict(self._added)
+            }
+
+    def print_stats(self):
+        """输出统计信息"""
+        stats = self.get_stats()
+        if not stats['entries'] and not stats['hits']:
+            return
+        by_reason = ', '.join(f"{reason} {count}" for reason, count in sorted(stats['by_reason'].items()))
+        print(f"失败结果缓存: 共 {stats['entries']} 条" + (f" ({by_reason})" if by_reason else '')
+              + f", 本次跳过 {sum(stats['hits'].values())} 次请求, 新增 {sum(stats['added'].values())} 条")
+
+
+# 进程内共享的失败结果缓存
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_negative_cache():
+    """获取进程内共享的失败结果缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = NegativeCache()
+        return _cache
@@ -0,0 +1,90 @@
+"""
+请求节奏控制模块
+所有访问豆瓣的请求共享同一个自适应的请求速率，取代各处分散的随机延迟：
+只有真正发出的请求才需要等待，命中缓存的条目不再额外延迟
+"""
+
+import threading
+import time
+
+# 默认每秒请求数（同时也是速率上限）
+DEFAULT_REQUESTS_PER_SECOND = 0.5
+
+# 速率下限，被限流时最多降到这个速率
+MIN_REQUESTS_PER_SECOND = 0.05
+
+# 被限流（403/429）时速率乘以该系数
+BACKOFF_FACTOR = 0.5
+
+# 每次请求成功后速率增加的值
+RECOVERY_STEP = 0.02
+
+# 被视为限流的 HTTP 状态码
+THROTTLE_STATUS_CODES = (403, 429)
+
+
+class Pacer:
+    """自适应请求节奏控制器（加性增、乘性减）
+
+    - 每次真实发出请求前调用 acquire()，保证相邻两次请求的间隔不小于 1/rate 秒
+    - 请求完成后调用 record()：遇到 403/429 时速率按 BACKOFF_FACTOR 成倍降低，
+      请求成功时速率按 RECOVERY_STEP 逐步恢复，直到配置的上限
+    - 多个线程共用同一个实例时，请求会被依次分配到不同的时间槽
+    """
+
+    def __init__(self, requests_per_second=DEFAULT_REQUESTS_PER_SECOND,
+                 min_rate=MIN_REQUESTS_PER_SECOND):
+        if requests_per_second <= 0:
+            requests_per_second = DEFAULT_REQUESTS_PER_SECOND
+        self.max_rate = float(requests_per_second)
+        self.min_rate = min(float(min_rate), self.max_rate)
+        self.rate = self.max_rate
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.backoffs = 0
+        self.total_wait = 0.0
+
+    def acquire(self):
+        """等待直到允许发出下一个请求，返回实际等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1.0 / self.rate
+            self.requests += 1
+
+        wait = slot - now
+        if wait > 0:
+            time.sleep(wait)
+            with self._lock:
+                self.total_wait += wait
+        return wait
+
+    def record(self, status_code):
+        """根据请求结果调整速率"""
+        with self._lock:
+            if status_code in THROTTLE_STATUS_CODES:
+                self.rate = max(self.min_rate, self.rate * BACKOFF_FACTOR)
+                self.backoffs += 1
+                # 被限流后按新的速率重新安排下一个时间槽
+                self._next_slot = max(self._next_slot, time.monotonic() + 1.0 / self.rate)
+                print(f"请求被限流 (HTTP {status_code})，请求速率降低到 {self.rate:.3f} 次/秒")
+            elif status_code < 400 or status_code == 404:
+                self.rate = min(self.max_rate, self.rate + RECOVERY_STEP)
+
+    def current_rate(self):
+        """获取当前的请求速率（次/秒）"""
+        with self._lock:
+            return self.rate
+
+    def get_stats(self):
+        """获取节奏控制统计信息"""
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'max_rate': self.max_rate,
+                'requests': self.requests,
+                'backoffs': self.backoffs,
+                'total_wait': self.total_wait
+            }
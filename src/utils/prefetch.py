@@ -0,0 +1,61 @@
+"""
+后台预取模块
+在后台线程中提前迭代下一步（例如下载并解析下一页），调用方处理当前结果时下一页已经在获取中
+"""
+
+import queue
+import threading
+
+# 队列中的消息类型
+_ITEM = 'item'
+_ERROR = 'error'
+_DONE = 'done'
+
+
+def prefetch(iterable, buffer_size=1):
+    """在后台线程中迭代 iterable，最多提前缓冲 buffer_size 个结果
+
+    - 后台线程中抛出的异常会在调用方取到对应位置时重新抛出
+    - 调用方提前结束迭代时，后台线程会在当前这一步完成后停止
+    """
+    results = queue.Queue(maxsize=max(1, buffer_size))
+    stop_event = threading.Event()
+
+    def put(message):
+        # 调用方已停止读取时不再阻塞等待
+        while not stop_event.is_set():
+            try:
+                results.put(message, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((_ITEM, item)):
+                    break
+            else:
+                put((_DONE, None))
+        except Exception as e:
+            put((_ERROR, e))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close:
+                close()
+
+    worker = threading.Thread(target=produce, daemon=True)
+    worker.start()
+    try:
+        while True:
+            kind, value = results.get()
+            if kind == _DONE:
+                return
+            if kind == _ERROR:
+                raise value
+            yield value
+    finally:
+        stop_event.set()
+        worker.join()
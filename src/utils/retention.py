@@ -0,0 +1,141 @@
+"""
+榜单历史保留模块
+热门、最新和冷门佳片每次运行都会把新条目追加到数据文件中，通过配置 history_retention 限制保留的范围：
+- max_age_days：条目最近一次出现在榜单中超过这么多天后移出
+- max_batches：只保留最近这么多次运行（批次）中出现过的条目
+- max_items：电影和剧集各最多保留这么多条，超出时移出最久没有出现的条目
+取值为 0 表示不按该项限制。移出的条目写入 archive 目录下的 gzip 压缩归档，数据文件和 RSS 保持固定规模
+"""
+
+import gzip
+import os
+import time
+
+from src.utils import serializer
+from src.utils.douban_utils import load_config, save_json_data
+
+# 获取配置目录
+CONFIG_DIR = os.getenv('CONFIG_DIR', 'config')
+ARCHIVE_DIR = os.path.join(CONFIG_DIR, 'archive')
+
+# 默认保留策略
+DEFAULT_RETENTION = {
+    'max_age_days': 90,
+    'max_batches': 0,
+    'max_items': 500
+}
+
+# 需要按策略清理的条目列表
+LIST_NAMES = ('movies', 'tv_shows')
+
+
+def get_retention_policy():
+    """读取配置中的保留策略，未配置的项使用默认值"""
+    policy = dict(DEFAULT_RETENTION)
+    policy.update(load_config().get('history_retention') or {})
+    return policy
+
+
+def item_last_seen(item):
+    """条目最近一次出现在榜单中的时间（批次ID，即 Unix 时间戳）"""
+    return int(item.get('last_seen') or item.get('batch_id') or 0)
+
+
+def apply_retention(data, policy=None, now=None):
+    """按保留策略从数据中移出旧条目（原地修改），返回 {列表名: 移出的条目列表}"""
+    policy = policy or get_retention_policy()
+    now = int(now or time.time())
+
+    # 没有时间记录的旧数据从本次开始计时，避免升级后一次性全部移出
+    for list_name in LIST_NAMES:
+        for item in data.get(list_name, []):
+            if not item_last_seen(item):
+                item['last_seen'] = now
+
+    max_age_days = policy.get('max_age_days') or 0
+    cutoff = now - max_age_days * 86400 if max_age_days > 0 else None
+
+    max_batches = policy.get('max_batches') or 0
+    kept_batches = None
+    if max_batches > 0:
+        batches = sorted({item_last_seen(item) for list_name in LIST_NAMES for item in data.get(list_name, [])},
+                         reverse=True)
+        kept_batches = set(batches[:max_batches])
+
+    max_items = policy.get('max_items') or 0
+
+    archived = {}
+    for list_name in LIST_NAMES:
+        items = data.get(list_name, [])
+        kept = [item for item in items
+                if (cutoff is None or item_last_seen(item) >= cutoff)
+                and (kept_batches is None or item_last_seen(item) in kept_batches)]
+
+        if max_items > 0 and len(kept) > max_items:
+            # 保留最近出现过的条目，其余保持原有顺序
+            newest = sorted(kept, key=item_last_seen, reverse=True)[:max_items]
+            newest_ids = {id(item) for item in newest}
+            kept = [item for item in kept if id(item) in newest_ids]
+
+        if len(kept) < len(items):
+            kept_ids = {id(item) for item in kept}
+            archived[list_name] = [item for item in items if id(item) not in kept_ids]
+            data[list_name] = kept
+    return archived
+
+
+def archive_dir(file_path):
+    """数据文件对应的归档目录"""
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    return os.path.join(ARCHIVE_DIR, name)
+
+
+def write_archive_segment(file_path, archived, now=None):
+    """把移出的条目写入一个新的压缩归档文件，返回归档文件路径"""
+    now = now or time.time()
+    directory = archive_dir(file_path)
+    os.makedirs(directory, exist_ok=True)
+
+    stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(now))
+    segment_path = os.path.join(directory, f"{stamp}.json.gz")
+    suffix = 1
+    while os.path.exists(segment_path):
+        segment_path = os.path.join(directory, f"{stamp}-{suffix}.json.gz")
+        suffix += 1
+
+    segment = {'archived_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))}
+    segment.update(archived)
+    with gzip.open(segment_path, 'wb') as f:
+        f.write(serializer.dumps(segment, 'compact'))
+    return segment_path
+
+
+def segment_order(name):
+    """归档文件的排序键：文件名为 时间.json.gz，同一秒内的后续归档为 时间-序号.json.gz"""
+    parts = name[:-len('.json.gz')].split('-')
+    return parts[:2], int(parts[2]) if len(parts) > 2 else 0
+
+
+def iter_archive_segments(file_path):
+    """按时间顺序读取数据文件的全部归档"""
+    directory = archive_dir(file_path)
+    if not os.path.isdir(directory):
+        return
+    names = [name for name in os.listdir(directory) if name.endswith('.json.gz')]
+    for name in sorted(names, key=segment_order):
+        with gzip.open(os.path.join(directory, name), 'rb') as f:
+            yield serializer.loads(f.read())
+
+
+def rotate_history(data, file_path, policy=None):
+    """按保留策略移出旧条目，写入归档后保存数据文件，返回移出的条目数"""
+    archived = apply_retention(data, policy)
+    archived_count = sum(len(items) for items in archived.values())
+
+    if archived_count:
+        # 先写归档再保存数据文件，中途出错时条目最多重复归档，不会丢失
+        segment_path = write_archive_segment(file_path, archived)
+        print(f"已将 {archived_count} 个旧条目移入归档: {segment_path}")
+
+    save_json_data(data, file_path)
+    return archived_count
@@ -0,0 +1,123 @@
+"""
+数据文件序列化模块
+数据文件的读写统一经过这里，通过配置 data_format 选择写入格式：
+- json（默认）：带缩进的 JSON，与原来的文件格式相同，便于直接查看
+- compact：不带缩进的 JSON，文件更小，读写更快
+- msgpack：MessagePack 二进制格式，需要安装 msgpack，未安装时按 compact 写入
+安装了 orjson 时使用 orjson 编解码 JSON，否则使用标准库 json。
+读取时根据文件内容自动识别格式，切换 data_format 后旧文件仍可正常读取，下次保存时转换为新格式。
+写入时先写同目录下的临时文件再原子替换，读取方不会读到写了一半的文件
+"""
+
+import json
+import os
+import tempfile
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# 支持的写入格式
+FORMATS = ('json', 'compact', 'msgpack')
+
+# 默认写入格式
+DEFAULT_FORMAT = 'json'
+
+# JSON 文本开头可能出现的字节（UTF-8 BOM、空白、对象、数组）
+JSON_LEADING_BYTES = b'\xef \t\r\n{['
+
+_data_format = None
+_format_lock = threading.Lock()
+
+
+def get_data_format():
+    """获取配置的写入格式（进程内只读取一次配置）"""
+    global _data_format
+    with _format_lock:
+        if _data_format is None:
+            # 延迟导入，避免与 douban_utils 循环导入
+            from src.utils.douban_utils import load_config
+            data_format = load_config().get('data_format', DEFAULT_FORMAT)
+            if data_format not in FORMATS:
+                print(f"未知的数据文件格式: {data_format}，使用 {DEFAULT_FORMAT}")
+                data_format = DEFAULT_FORMAT
+            if data_format == 'msgpack' and msgpack is None:
+                print("未安装 msgpack，数据文件按 compact 格式写入")
+                data_format = 'compact'
+            _data_format = data_format
+        return _data_format
+
+
+def is_json(raw):
+    """根据开头的字节判断内容是否为 JSON 文本"""
+    return not raw or raw[:1] in JSON_LEADING_BYTES
+
+
+def loads(raw):
+    """解析数据文件内容（bytes），自动识别 JSON 和 MessagePack"""
+    if is_json(raw):
+        if raw.startswith(b'\xef\xbb\xbf'):
+            raw = raw[3:]
+        if orjson is not None:
+            return orjson.loads(raw)
+        return json.loads(raw.decode('utf-8'))
+
+    if msgpack is None:
+        raise ValueError("数据文件为 MessagePack 格式，但未安装 msgpack")
+    return msgpack.unpackb(raw, raw=False, strict_map_key=False)
+
+
+def dumps(data, data_format=None):
+    """按指定格式（为空时使用配置的格式）序列化数据，返回 bytes"""
+    data_format = data_format or get_data_format()
+
+    if data_format == 'msgpack' and msgpack is not None:
+        return msgpack.packb(data, use_bin_type=True)
+
+    indent = data_format == 'json'
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_INDENT_2 if indent else 0)
+        except TypeError:
+            # orjson 不支持的数据（如非字符串的键）交给标准库处理
+            pass
+    if indent:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def read_file(file_path):
+    """读取并解析数据文件"""
+    with open(file_path, 'rb') as f:
+        return loads(f.read())
+
+
+def write_file(data, file_path, data_format=None):
+    """序列化数据并原子写入文件（临时文件 + os.replace）"""
+    write_bytes(dumps(data, data_format), file_path)
+
+
+def write_bytes(raw, file_path):
+    """原子写入字节内容：先写临时文件并刷到磁盘，再替换目标文件，读取方不会读到写了一半的文件"""
+    directory = os.path.dirname(file_path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp 创建的文件只有所有者可读写，保持与普通写入相同的权限
+        os.chmod(temp_path, 0o644)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
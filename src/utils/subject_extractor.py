@@ -0,0 +1,194 @@
+"""
+条目详情页解析模块
+详情页有两百 KB 左右，但需要的信息只在 #info 区块、标题年份、海报、评分和简介这几处：
+先按位置截取这几段 HTML 再解析，并在安装了 lxml 时使用更快的 lxml 解析器
+"""
+
+import re
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_BACKEND = 'lxml'
+except ImportError:
+    DEFAULT_BACKEND = 'html.parser'
+
+# 需要截取的页面片段
+INFO_START_PATTERN = re.compile(r'<div\b[^>]*\bid=["\']info["\']', re.I)
+DIV_TAG_PATTERN = re.compile(r'<(/?)div\b', re.I)
+YEAR_PATTERN = re.compile(r'<span\b[^>]*\bclass=["\']year["\'][^>]*>.*?</span>', re.I | re.S)
+VOTES_PATTERN = re.compile(r'<span\b[^>]*\bproperty=["\']v:votes["\'][^>]*>.*?</span>', re.I | re.S)
+TITLE_PATTERN = re.compile(r'<span\b[^>]*\bproperty=["\']v:itemreviewed["\'][^>]*>.*?</span>', re.I | re.S)
+COVER_PATTERN = re.compile(r'<img\b[^>]*\brel=["\']v:image["\'][^>]*>', re.I | re.S)
+RATING_PATTERN = re.compile(r'<strong\b[^>]*\bproperty=["\']v:average["\'][^>]*>.*?</strong>', re.I | re.S)
+SUMMARY_PATTERN = re.compile(r'<span\b[^>]*\bproperty=["\']v:summary["\'][^>]*>.*?</span>', re.I | re.S)
+
+
+def _slice_div(html, start):
+    """从 start 位置的 <div> 开始截取到与之匹配的 </div>"""
+    depth = 0
+    for match in DIV_TAG_PATTERN.finditer(html, start):
+        depth += -1 if match.group(1) else 1
+        if depth == 0:
+            end = html.find('>', match.end())
+            return html[start:end + 1 if end != -1 else len(html)]
+    return html[start:]
+
+
+def extract_subject_fragments(html):
+    """截取详情页中需要解析的片段，找不到 #info 区块时返回 None"""
+    info_match = INFO_START_PATTERN.search(html)
+    if not info_match:
+        return None
+
+    fragments = [_slice_div(html, info_match.start())]
+    for pattern in (YEAR_PATTERN, VOTES_PATTERN, TITLE_PATTERN, COVER_PATTERN, RATING_PATTERN, SUMMARY_PATTERN):
+        match = pattern.search(html)
+        if match:
+            fragments.append(match.group())
+    return ''.join(fragments)
+
+
+def extract_subject_info(html, backend=None, scoped=True):
+    """从条目详情页 HTML 中提取条目信息
+
+    参数:
+        html: 详情页 HTML
+        backend: BeautifulSoup 解析器，默认优先使用 lxml
+        scoped: 是否只解析需要的片段；为 False 或找不到 #info 时解析整个页面
+
+    返回:
+        条目信息字典，字段与 get_subject_info 返回的一致
+    """
+    backend = backend or DEFAULT_BACKEND
+
+    markup = extract_subject_fragments(html) if scoped else None
+    soup = BeautifulSoup(markup if markup is not None else html, backend)
+
+    # 初始化条目信息
+    info = {
+        'type': 'movie',  # 默认为电影
+        'title': '',
+        'cover_url': '',
+        'rating': '',
+        'description': '',
+        'imdb_id': None,
+        'year': '',
+        'duration': '',
+        'region': '',
+        'director': [],
+        'actors': [],
+        'all_actors': [],
+        'genres': [],
+        'languages': [],
+        'release_date': '',
+        'release_dates': [],
+        'vote_count': '',
+        'episodes_info': {}
+    }
+
+    # 判断类型（电影/电视剧）
+    # 检查是否有分集短评（电视剧特有），需要在完整页面中查找
+    is_tv = '的分集短评' in html
+    episode_info = soup.find('span', string=re.compile(r'集数:|共\d+集'))
+    episode_duration = soup.find(string=re.compile(r'单集片长:'))
+
+    if is_tv or episode_info or episode_duration:
+        info['type'] = 'tv'
+        if episode_info and episode_info.next_sibling:
+            info['episodes_info']['count'] = episode_info.next_sibling.strip()
+        if episode_duration and episode_duration.next_sibling:
+            info['episodes_info']['duration'] = episode_duration.next_sibling.strip()
+
+    info_div = soup.find('div', {'id': 'info'})
+    if info_div:
+        # 获取IMDB ID
+        imdb_link = soup.find('a', {'href': re.compile(r'www\.imdb\.com/title/(tt\d+)')})
+        if imdb_link:
+            match = re.search(r'tt\d+', imdb_link['href'])
+            if match:
+                info['imdb_id'] = match.group()
+
+        if not info['imdb_id']:
+            imdb_span = info_div.find('span', string=re.compile(r'IMDb:'))
+            if imdb_span and imdb_span.next_sibling:
+                imdb_text = imdb_span.next_sibling.strip()
+                match = re.search(r'tt\d+', imdb_text)
+                if match:
+                    info['imdb_id'] = match.group()
+
+        # 获取年份
+        year_span = soup.find('span', {'class': 'year'})
+        if year_span:
+            year_match = re.search(r'\d{4}', year_span.text)
+            if year_match:
+                info['year'] = year_match.group()
+
+        # 获取导演
+        director_span = info_div.find('span', string='导演')
+        if director_span:
+            director_links = director_span.find_next('span')
+            if director_links:
+                info['director'] = [link.text.strip() for link in director_links.find_all('a')]
+
+        # 获取主演
+        actors_span = info_div.find('span', string='主演')
+        if actors_span:
+            actor_links = actors_span.find_next('span')
+            if actor_links:
+                # 完整的主演列表供广播条目使用，actors 与原来一样只取前三个主演
+                info['all_actors'] = [link.text.strip() for link in actor_links.find_all('a')]
+                info['actors'] = info['all_actors'][:3]
+
+        # 获取类型
+        genre_spans = info_div.find_all('span', {'property': 'v:genre'})
+        if genre_spans:
+            info['genres'] = [span.text.strip() for span in genre_spans]
+
+        # 获取制片国家/地区
+        region_text = info_div.find(string=re.compile(r'制片国家/地区:'))
+        if region_text and region_text.next_sibling:
+            info['region'] = region_text.next_sibling.strip()
+
+        # 获取语言
+        language_text = info_div.find(string=re.compile(r'语言:'))
+        if language_text and language_text.next_sibling:
+            languages = language_text.next_sibling.strip()
+            if languages:
+                info['languages'] = [lang.strip() for lang in languages.split('/') if lang.strip()]
+
+        # 获取片长
+        duration_span = info_div.find('span', {'property': 'v:runtime'})
+        if duration_span:
+            info['duration'] = duration_span.text.strip()
+
+        # 获取上映日期：release_date 为第一个日期，release_dates 为全部日期（各地区的上映日期）
+        release_date_spans = info_div.find_all('span', {'property': 'v:initialReleaseDate'})
+        if release_date_spans:
+            info['release_date'] = release_date_spans[0].text.strip()
+            info['release_dates'] = [span.text.strip() for span in release_date_spans if span.text.strip()]
+
+    # 获取评分人数
+    votes_span = soup.find('span', {'property': 'v:votes'})
+    if votes_span:
+        info['vote_count'] = votes_span.text.strip()
+
+    # 获取标题、海报、评分和简介
+    title_span = soup.find('span', {'property': 'v:itemreviewed'})
+    if title_span:
+        info['title'] = title_span.text.strip()
+
+    cover_img = soup.find('img', {'rel': 'v:image'})
+    if cover_img:
+        info['cover_url'] = cover_img.get('src', '')
+
+    rating_elem = soup.find('strong', {'property': 'v:average'})
+    if rating_elem:
+        info['rating'] = rating_elem.text.strip()
+
+    summary_span = soup.find('span', {'property': 'v:summary'})
+    if summary_span:
+        info['description'] = re.sub(r'\s+', ' ', summary_span.text).strip()
+
+    return info
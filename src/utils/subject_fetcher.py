@@ -0,0 +1,54 @@
+"""
+条目详情并发获取模块
+使用线程池批量获取条目详情，请求节奏由共享客户端的 Pacer 统一控制
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.utils.douban_utils import load_config, get_subject_info_with_cache
+
+# 默认并发线程数
+DEFAULT_FETCH_WORKERS = 4
+
+
+def fetch_subject_infos(subject_ids, cookie, max_workers=None, fetch=None):
+    """并发获取一批条目的详细信息
+
+    按完成顺序逐个产出 (subject_id, info)，获取失败时 info 为 None，
+    调用方可以每拿到一个结果就立即保存，不必等待整批完成。
+
+    参数:
+        subject_ids: 条目ID列表，重复和空ID会被忽略
+        cookie: 豆瓣cookie
+        max_workers: 并发线程数，默认读取配置中的 fetch_workers
+        fetch: 获取单个条目的函数 fetch(subject_id, cookie)，默认 get_subject_info_with_cache
+    """
+    # 去重并保持原有顺序
+    pending_ids = list(dict.fromkeys(sid for sid in subject_ids if sid))
+    if not pending_ids:
+        return
+
+    if max_workers is None:
+        max_workers = load_config().get('fetch_workers', DEFAULT_FETCH_WORKERS)
+    max_workers = max(1, min(int(max_workers), len(pending_ids)))
+    fetch = fetch or get_subject_info_with_cache
+
+    print(f"开始并发获取 {len(pending_ids)} 个条目的详细信息（{max_workers} 个线程）...")
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            executor.submit(fetch, subject_id, cookie): subject_id
+            for subject_id in pending_ids
+        }
+        for future in as_completed(futures):
+            subject_id = futures[future]
+            try:
+                info = future.result()
+            except Exception as e:
+                print(f"获取条目 {subject_id} 时出错: {e}")
+                info = None
+            yield subject_id, info
+    finally:
+        # 调用方提前结束迭代时取消尚未开始的任务
+        executor.shutdown(wait=True, cancel_futures=True)
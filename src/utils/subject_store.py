@@ -0,0 +1,621 @@
+"""
+条目缓存存储模块
+条目详细信息缓存支持两种存储方式，通过配置 subject_cache_backend 选择：
+- sqlite（默认）：带索引的 SQLite 数据库，按条目单行读写，首次使用时自动导入旧的 JSON 缓存
+- json：原来的 subject_cache.json，整个文件读写
+进程内在存储之上再加一层有容量上限的内存缓存，写入先记在内存中，再批量写回存储
+
+每条缓存记录带有过期时间 expires_at（Unix 时间戳），有效期在 CACHE_TTL_DAYS 上下随机浮动，
+同一批写入的缓存不会在同一天过期；存储按过期时间建有索引，续期任务据此分批更新即将过期的条目
+"""
+
+import atexit
+import datetime
+import heapq
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from src.utils import serializer
+from src.utils.file_lock import file_lock
+
+# 获取配置目录
+CONFIG_DIR = os.getenv('CONFIG_DIR', 'config')
+CACHE_FILE = os.path.join(CONFIG_DIR, 'subject_cache.json')
+CACHE_DB_FILE = os.path.join(CONFIG_DIR, 'subject_cache.db')
+# 每次写入存储后更新修改时间的标记文件，其他进程据此判断条目缓存是否在某个时间之后变化过（例如订阅文件是否过期）
+UPDATED_FILE = os.path.join(CONFIG_DIR, 'subject_cache.updated')
+
+# 默认存储方式
+DEFAULT_BACKEND = 'sqlite'
+
+# 内存缓存默认最多保留的条目数
+DEFAULT_MEMORY_CACHE_SIZE = 5000
+
+# 累计多少条未写回的更新后批量写回
+FLUSH_EVERY = 20
+
+# 定时写回的间隔（秒）
+FLUSH_INTERVAL = 30
+
+# 缓存有效期（天）及随机浮动比例（±20%，即 24 到 36 天）
+CACHE_TTL_DAYS = 30
+CACHE_TTL_JITTER = 0.2
+
+
+def format_cutoff(expire_days):
+    """计算过期时间点（与 cached_at 相同的字符串格式，可直接比较大小）"""
+    cutoff = datetime.datetime.now() - datetime.timedelta(days=expire_days)
+    return cutoff.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def new_expires_at(now=None):
+    """计算新写入的缓存的过期时间，有效期随机浮动"""
+    ttl = CACHE_TTL_DAYS * 86400 * random.uniform(1 - CACHE_TTL_JITTER, 1 + CACHE_TTL_JITTER)
+    return (now or time.time()) + ttl
+
+
+def mark_updated(file_path=UPDATED_FILE):
+    """把标记文件的修改时间更新为当前时间"""
+    try:
+        os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
+        with open(file_path, 'a'):
+            pass
+        os.utime(file_path)
+    except OSError as e:
+        print(f"更新条目缓存标记失败: {e}")
+
+def legacy_expires_at(subject_id, cached_at):
+    """根据旧记录的 cached_at 推算过期时间，浮动比例由条目ID决定（每次计算结果相同）
+
+    cached_at 无法解析时返回 0，即视为已过期
+    """
+    try:
+        cached_time = time.mktime(time.strptime(cached_at, '%Y-%m-%d %H:%M:%S'))
+    except (TypeError, ValueError):
+        return 0
+    spread = zlib.crc32(str(subject_id).encode('utf-8')) % 10000 / 10000
+    return cached_time + CACHE_TTL_DAYS * 86400 * (1 - CACHE_TTL_JITTER + 2 * CACHE_TTL_JITTER * spread)
+
+
+def make_entry(subject_id, info, cached_at=None, expires_at=None):
+    """生成缓存记录
+
+    只给出 cached_at 时（导入或迁移的旧记录）按 cached_at 推算过期时间，都没有给出时按当前时间计算
+    """
+    if expires_at is None:
+        expires_at = legacy_expires_at(subject_id, cached_at) if cached_at else new_expires_at()
+    return {
+        'info': info,
+        'cached_at': cached_at or time.strftime('%Y-%m-%d %H:%M:%S'),
+        'expires_at': expires_at
+    }
+
+
+def entry_expires_at(subject_id, entry):
+    """缓存记录的过期时间（Unix 时间戳）"""
+    expires_at = entry.get('expires_at')
+    if expires_at is None:
+        return legacy_expires_at(subject_id, entry.get('cached_at'))
+    return expires_at
+
+
+def is_entry_expired(subject_id, entry, now=None):
+    """缓存记录是否已过期"""
+    return entry_expires_at(subject_id, entry) <= (now or time.time())
+
+
+class SubjectStore:
+    """条目缓存存储接口
+
+    缓存记录的格式：{'info': 条目信息, 'cached_at': 'YYYY-mm-dd HH:MM:SS', 'expires_at': Unix 时间戳}，
+    旧记录可能没有 expires_at，请使用 entry_expires_at 获取过期时间
+    """
+
+    def get(self, subject_id):
+        """获取单个条目的缓存记录，不存在时返回 None"""
+        raise NotImplementedError
+
+    def get_many(self, subject_ids):
+        """批量获取缓存记录，返回 {subject_id: 缓存记录}，不存在的条目不包含在结果中"""
+        entries = {}
+        for subject_id in subject_ids:
+            entry = self.get(subject_id)
+            if entry is not None:
+                entries[subject_id] = entry
+        return entries
+
+    def upsert(self, subject_id, info, cached_at=None):
+        """写入或更新单个条目"""
+        raise NotImplementedError
+
+    def upsert_many(self, entries):
+        """批量写入 {subject_id: 缓存记录}"""
+        raise NotImplementedError
+
+    def delete(self, subject_id):
+        """删除单个条目"""
+        raise NotImplementedError
+
+    def expired_ids(self, expire_days):
+        """获取缓存时间早于 expire_days 天前的条目ID列表"""
+        raise NotImplementedError
+
+    def expiring(self, before, limit):
+        """按过期时间从早到晚返回在 before（Unix 时间戳）之前过期的条目，最多 limit 条
+
+        返回 [(subject_id, expires_at)]
+        """
+        raise NotImplementedError
+
+    def load_all(self):
+        """以字典形式返回全部缓存记录"""
+        raise NotImplementedError
+
+    def count(self):
+        """缓存记录数"""
+        return len(self.load_all())
+
+    def version(self):
+        """存储内容的版本标识，其他进程写入后会变化，用于判断依赖缓存数据的结果是否需要更新
+
+        版本只能与同一实例之前返回的版本比较；需要与文件修改时间比较时使用 UPDATED_FILE 的修改时间
+        """
+        raise NotImplementedError
+
+    def flush(self, subject_ids=None):
+        """把尚未写入的更新写入存储，给出 subject_ids 时只写入这些条目"""
+
+    def close(self):
+        """关闭存储"""
+
+
+class JsonSubjectStore(SubjectStore):
+    """基于 subject_cache.json 的存储（整个文件读写）
+
+    文件内容在进程内保留一份，文件没有被其他进程修改时不重复解析；
+    写入时加文件锁并重新检查文件，多个进程同时写入不会互相覆盖；先写临时文件再原子替换，中途出错不会留下损坏的缓存文件
+    """
+
+    def __init__(self, file_path=CACHE_FILE, updated_file=UPDATED_FILE):
+        self.file_path = file_path
+        self.updated_file = updated_file
+        self._lock = threading.RLock()
+        self._data = None
+        self._stat = None
+
+    def _file_stat(self):
+        try:
+            stat = os.stat(self.file_path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _load(self):
+        stat = self._file_stat()
+        if self._data is None or stat != self._stat:
+            # 延迟导入，避免与 douban_utils 循环导入
+            from src.utils.douban_utils import load_json_data
+            self._data = load_json_data(self.file_path, {})
+            self._stat = stat
+        return self._data
+
+    def _save(self, cache_data):
+        serializer.write_file(cache_data, self.file_path)
+        self._data = cache_data
+        self._stat = self._file_stat()
+
+    def get(self, subject_id):
+        with self._lock:
+            return self._load().get(subject_id)
+
+    def get_many(self, subject_ids):
+        with self._lock:
+            cache_data = self._load()
+            return {subject_id: cache_data[subject_id] for subject_id in subject_ids if subject_id in cache_data}
+
+    def upsert(self, subject_id, info, cached_at=None):
+        self.upsert_many({subject_id: make_entry(subject_id, info, cached_at)})
+
+    def upsert_many(self, entries):
+        with self._lock, file_lock(self.file_path):
+            cache_data = self._load()
+            for subject_id, entry in entries.items():
+                cache_data[subject_id] = make_entry(subject_id, entry.get('info', {}),
+                                                    entry.get('cached_at'), entry.get('expires_at'))
+            self._save(cache_data)
+        mark_updated(self.updated_file)
+
+    def delete(self, subject_id):
+        with self._lock, file_lock(self.file_path):
+            cache_data = self._load()
+            if cache_data.pop(subject_id, None) is None:
+                return
+            self._save(cache_data)
+        mark_updated(self.updated_file)
+
+    def expired_ids(self, expire_days):
+        cutoff = format_cutoff(expire_days)
+        with self._lock:
+            return [subject_id for subject_id, entry in self._load().items()
+                    if (entry.get('cached_at') or '') < cutoff]
+
+    def version(self):
+        return self._file_stat()
+
+    def expiring(self, before, limit):
+        with self._lock:
+            candidates = [(entry_expires_at(subject_id, entry), subject_id)
+                          for subject_id, entry in self._load().items()]
+        return [(subject_id, expires_at)
+                for expires_at, subject_id in heapq.nsmallest(limit, candidates)
+                if expires_at <= before]
+
+    def load_all(self):
+        with self._lock:
+            return dict(self._load())
+
+
+class SqliteSubjectStore(SubjectStore):
+    """基于 SQLite 的存储
+
+    - 以条目ID为主键单行读写，不再每次解析和改写整个缓存文件
+    - cached_at 建有索引，用于按时间查找过期条目
+    - 使用 WAL 模式，解析器写入时 API 进程仍可读取
+    """
+
+    def __init__(self, db_path=CACHE_DB_FILE, legacy_json_path=CACHE_FILE, updated_file=UPDATED_FILE):
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.db_path = db_path
+        self.updated_file = updated_file
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS subjects (
+                    subject_id TEXT PRIMARY KEY,
+                    info TEXT NOT NULL,
+                    cached_at TEXT NOT NULL,
+                    expires_at REAL
+                )
+            ''')
+            self._migrate_expires_at()
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_subjects_cached_at ON subjects (cached_at)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS idx_subjects_expires_at ON subjects (expires_at)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self._conn.commit()
+
+        if legacy_json_path:
+            self.import_json(legacy_json_path)
+
+    def _migrate_expires_at(self):
+        """为旧数据库添加 expires_at 列，并按 cached_at 推算已有记录的过期时间"""
+        columns = [row[1] for row in self._conn.execute('PRAGMA table_info(subjects)')]
+        if 'expires_at' not in columns:
+            self._conn.execute('ALTER TABLE subjects ADD COLUMN expires_at REAL')
+
+        rows = self._conn.execute('SELECT subject_id, cached_at FROM subjects WHERE expires_at IS NULL').fetchall()
+        if rows:
+            self._conn.executemany('UPDATE subjects SET expires_at = ? WHERE subject_id = ?',
+                                   [(legacy_expires_at(subject_id, cached_at), subject_id)
+                                    for subject_id, cached_at in rows])
+            print(f"已为 {len(rows)} 条条目缓存设置过期时间")
+
+    def import_json(self, json_path):
+        """一次性导入旧的 JSON 缓存文件，已导入过或文件不存在时跳过
+
+        返回导入的记录数
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'json_imported'").fetchone()
+            if row or not os.path.exists(json_path):
+                return 0
+
+            try:
+                cache_data = serializer.read_file(json_path)
+            except Exception as e:
+                print(f"读取旧的条目缓存失败，跳过导入: {e}")
+                return 0
+
+            rows = [
+                (subject_id, json.dumps(entry.get('info', {}), ensure_ascii=False), entry.get('cached_at') or '',
+                 entry_expires_at(subject_id, entry))
+                for subject_id, entry in cache_data.items()
+                if isinstance(entry, dict)
+            ]
+            with self._conn:
+                # 已存在的记录比 JSON 文件中的更新，保留数据库中的
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO subjects (subject_id, info, cached_at, expires_at) VALUES (?, ?, ?, ?)',
+                    rows)
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_imported', ?)",
+                                   (time.strftime('%Y-%m-%d %H:%M:%S'),))
+            mark_updated(self.updated_file)
+            print(f"已从 {json_path} 导入 {len(rows)} 条条目缓存")
+            return len(rows)
+
+    def get(self, subject_id):
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT info, cached_at, expires_at FROM subjects WHERE subject_id = ?', (subject_id,)).fetchone()
+        if not row:
+            return None
+        return {'info': json.loads(row[0]), 'cached_at': row[1], 'expires_at': row[2]}
+
+    def get_many(self, subject_ids):
+        subject_ids = list(dict.fromkeys(subject_ids))
+        entries = {}
+        # 分批查询，避免超出 SQLite 的参数个数限制
+        for start in range(0, len(subject_ids), 500):
+            batch = subject_ids[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    f'SELECT subject_id, info, cached_at, expires_at FROM subjects WHERE subject_id IN ({placeholders})',
+                    batch).fetchall()
+            for subject_id, info, cached_at, expires_at in rows:
+                entries[subject_id] = {'info': json.loads(info), 'cached_at': cached_at, 'expires_at': expires_at}
+        return entries
+
+    def upsert(self, subject_id, info, cached_at=None):
+        self.upsert_many({subject_id: make_entry(subject_id, info, cached_at)})
+
+    def upsert_many(self, entries):
+        rows = []
+        for subject_id, entry in entries.items():
+            entry = make_entry(subject_id, entry.get('info', {}), entry.get('cached_at'), entry.get('expires_at'))
+            rows.append((subject_id, json.dumps(entry['info'], ensure_ascii=False),
+                         entry['cached_at'], entry['expires_at']))
+        with self._lock, self._conn:
+            self._conn.executemany('''
+                INSERT INTO subjects (subject_id, info, cached_at, expires_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(subject_id) DO UPDATE SET
+                    info = excluded.info, cached_at = excluded.cached_at, expires_at = excluded.expires_at
+            ''', rows)
+        mark_updated(self.updated_file)
+
+    def delete(self, subject_id):
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM subjects WHERE subject_id = ?', (subject_id,))
+        mark_updated(self.updated_file)
+
+    def expired_ids(self, expire_days):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT subject_id FROM subjects WHERE cached_at < ? ORDER BY cached_at',
+                (format_cutoff(expire_days),)).fetchall()
+        return [row[0] for row in rows]
+
+    def expiring(self, before, limit):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT subject_id, expires_at FROM subjects WHERE expires_at <= ? ORDER BY expires_at LIMIT ?',
+                (before, limit)).fetchall()
+        return [(subject_id, expires_at) for subject_id, expires_at in rows]
+
+    def load_all(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT subject_id, info, cached_at, expires_at FROM subjects').fetchall()
+        return {subject_id: {'info': json.loads(info), 'cached_at': cached_at, 'expires_at': expires_at}
+                for subject_id, info, cached_at, expires_at in rows}
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM subjects').fetchone()[0]
+
+    def version(self):
+        # data_version 在其他连接提交修改后变化（只对同一连接有意义，不能与其他进程比较）
+        with self._lock:
+            return self._conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MemoryCachedSubjectStore(SubjectStore):
+    """带容量上限的内存缓存层（LRU），写入延迟批量写回底层存储
+
+    - 读取先查内存，未命中时从底层存储读取并放入内存
+    - 写入只更新内存并标记为待写回，累计 flush_every 条、定时或进程退出时批量写回
+    - 内存中最多保留 max_entries 条，超出时淘汰最久未使用且已写回的条目
+    """
+
+    def __init__(self, backing_store, max_entries=DEFAULT_MEMORY_CACHE_SIZE,
+                 flush_every=FLUSH_EVERY, flush_interval=FLUSH_INTERVAL):
+        self.backing_store = backing_store
+        self.max_entries = max(1, int(max_entries))
+        self.flush_every = max(1, int(flush_every))
+        self.flush_interval = flush_interval
+
+        self._entries = OrderedDict()
+        self._dirty = {}
+        self._lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._flusher = None
+
+        atexit.register(self.close)
+
+    def _remember(self, subject_id, entry):
+        self._entries[subject_id] = entry
+        self._entries.move_to_end(subject_id)
+
+        # 超出容量时淘汰最久未使用的条目，未写回的条目先写回
+        while len(self._entries) > self.max_entries:
+            oldest_id = next(iter(self._entries))
+            if oldest_id in self._dirty:
+                self._flush_locked()
+            self._entries.popitem(last=False)
+
+    def _start_flusher(self):
+        if self._flusher is None and self.flush_interval:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def _flush_locked(self, subject_ids=None):
+        if subject_ids is None:
+            pending = self._dirty
+            self._dirty = {}
+        else:
+            pending = {subject_id: self._dirty.pop(subject_id) for subject_id in set(subject_ids)
+                       if subject_id in self._dirty}
+        if not pending:
+            return
+        try:
+            self.backing_store.upsert_many(pending)
+        except Exception as e:
+            # 写回失败时保留待写回的条目，下次再试
+            pending.update(self._dirty)
+            self._dirty = pending
+            print(f"写回条目缓存失败: {e}")
+
+    def flush(self, subject_ids=None):
+        """把待写回的条目批量写入底层存储
+
+        给出 subject_ids 时只写回其中待写回的条目，其余条目继续等待批量写回
+        """
+        with self._lock:
+            self._flush_locked(subject_ids)
+
+    def get(self, subject_id):
+        with self._lock:
+            entry = self._entries.get(subject_id)
+            if entry is not None:
+                self._entries.move_to_end(subject_id)
+                return entry
+
+        entry = self.backing_store.get(subject_id)
+        if entry is not None:
+            with self._lock:
+                # 读取期间其他线程可能已写入更新的数据
+                if subject_id not in self._entries:
+                    self._remember(subject_id, entry)
+                else:
+                    entry = self._entries[subject_id]
+        return entry
+
+    def get_many(self, subject_ids):
+        entries = {}
+        missing = []
+        with self._lock:
+            for subject_id in subject_ids:
+                entry = self._entries.get(subject_id)
+                if entry is not None:
+                    self._entries.move_to_end(subject_id)
+                    entries[subject_id] = entry
+                else:
+                    missing.append(subject_id)
+
+        if missing:
+            loaded = self.backing_store.get_many(missing)
+            with self._lock:
+                for subject_id, entry in loaded.items():
+                    # 读取期间其他线程可能已写入更新的数据
+                    if subject_id in self._entries:
+                        entry = self._entries[subject_id]
+                    else:
+                        self._remember(subject_id, entry)
+                    entries[subject_id] = entry
+        return entries
+
+    def upsert(self, subject_id, info, cached_at=None):
+        entry = make_entry(subject_id, info, cached_at)
+        with self._lock:
+            self._dirty[subject_id] = entry
+            self._remember(subject_id, entry)
+            if len(self._dirty) >= self.flush_every:
+                self._flush_locked()
+            else:
+                self._start_flusher()
+
+    def upsert_many(self, entries):
+        with self._lock:
+            for subject_id, entry in entries.items():
+                entry = make_entry(subject_id, entry.get('info', {}), entry.get('cached_at'), entry.get('expires_at'))
+                self._dirty[subject_id] = entry
+                self._remember(subject_id, entry)
+            self._flush_locked()
+
+    def delete(self, subject_id):
+        with self._lock:
+            self._entries.pop(subject_id, None)
+            self._dirty.pop(subject_id, None)
+            self.backing_store.delete(subject_id)
+
+    def expired_ids(self, expire_days):
+        self.flush()
+        return self.backing_store.expired_ids(expire_days)
+
+    def expiring(self, before, limit):
+        self.flush()
+        return self.backing_store.expiring(before, limit)
+
+    def load_all(self):
+        self.flush()
+        return self.backing_store.load_all()
+
+    def count(self):
+        self.flush()
+        return self.backing_store.count()
+
+    def version(self):
+        self.flush()
+        return self.backing_store.version()
+
+    def close(self):
+        self._stop_event.set()
+        self.flush()
+
+
+# 进程内共享的存储实例
+_store = None
+_reader = None
+_store_lock = threading.Lock()
+
+
+def create_subject_store(backend=None):
+    """按名称创建条目缓存存储，backend 为空时读取配置中的 subject_cache_backend"""
+    if backend is None:
+        # 延迟导入，避免与 douban_utils 循环导入
+        from src.utils.douban_utils import load_config
+        backend = load_config().get('subject_cache_backend', DEFAULT_BACKEND)
+
+    if backend == 'json':
+        return JsonSubjectStore()
+    if backend != 'sqlite':
+        print(f"未知的条目缓存存储方式: {backend}，使用 {DEFAULT_BACKEND}")
+    return SqliteSubjectStore()
+
+
+def get_subject_store():
+    """获取进程内共享的条目缓存存储（带内存缓存层）"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            from src.utils.douban_utils import load_config
+            max_entries = load_config().get('subject_cache_size', DEFAULT_MEMORY_CACHE_SIZE)
+            _store = MemoryCachedSubjectStore(create_subject_store(), max_entries)
+        return _store
+
+
+def get_subject_reader():
+    """获取进程内共享的只读存储实例（不带内存缓存层）
+
+    供 API 等不写入缓存的进程使用，每次都读取解析器写入的最新数据
+    """
+    global _reader
+    with _store_lock:
+        if _reader is None:
+            _reader = create_subject_store()
+        return _reader
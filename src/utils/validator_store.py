@@ -0,0 +1,127 @@
+"""
+条件请求校验信息存储模块
+按 URL 持久化保存 ETag / Last-Modified 以及内容哈希，列表页没有变化时跳过解析
+"""
+
+import hashlib
+import os
+import threading
+
+import requests
+
+from src.utils.douban_client import get_douban_client
+from src.utils.douban_utils import load_json_data, save_json_data
+from src.utils.file_lock import file_lock
+
+# 获取配置目录
+CONFIG_DIR = os.getenv('CONFIG_DIR', 'config')
+VALIDATOR_FILE = os.path.join(CONFIG_DIR, 'http_validators.json')
+
+
+def make_validator_key(url, params=None):
+    """生成校验信息的键（包含查询参数的完整 URL）"""
+    if not params:
+        return url
+    return requests.Request('GET', url, params=params).prepare().url
+
+
+class ValidatorStore:
+    """按 URL 保存的校验信息
+
+    新的校验信息先暂存，调用方处理完页面内容后再 commit()，
+    这样即使处理过程中出错，下次运行仍会重新解析该页面。
+    """
+
+    def __init__(self, file_path=VALIDATOR_FILE):
+        self.file_path = file_path
+        self._validators = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._validators is None:
+            self._validators = load_json_data(self.file_path, {})
+        return self._validators
+
+    def request_headers(self, key):
+        """生成条件请求头"""
+        with self._lock:
+            stored = self._load().get(key, {})
+        headers = {}
+        if stored.get('etag'):
+            headers['If-None-Match'] = stored['etag']
+        if stored.get('last_modified'):
+            headers['If-Modified-Since'] = stored['last_modified']
+        return headers
+
+    def check(self, key, response):
+        """检查响应内容是否有变化，有变化时暂存新的校验信息
+
+        返回 True 表示内容有变化（或首次获取），需要解析
+        """
+        if response.status_code == 304:
+            return False
+
+        content_hash = hashlib.sha256(response.content).hexdigest()
+        with self._lock:
+            stored = self._load().get(key)
+            if stored and stored.get('content_hash') == content_hash:
+                return False
+
+            self._pending[key] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'content_hash': content_hash
+            }
+        return True
+
+    def commit(self):
+        """确认暂存的校验信息并保存到文件"""
+        with self._lock:
+            if not self._pending:
+                return
+            # 其他解析器进程可能同时保存过校验信息：加锁后重新读取文件再合并，避免互相覆盖
+            with file_lock(self.file_path):
+                validators = load_json_data(self.file_path, {})
+                validators.update(self._pending)
+                save_json_data(validators, self.file_path)
+            self._validators = validators
+            self._pending = {}
+
+    def discard(self):
+        """丢弃暂存的校验信息（页面处理失败时调用）"""
+        with self._lock:
+            self._pending = {}
+
+
+# 进程内共享的校验信息存储
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_validator_store():
+    """获取进程内共享的校验信息存储"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ValidatorStore()
+        return _store
+
+
+def conditional_get(url, cookie=None, params=None, **kwargs):
+    """发送条件 GET 请求
+
+    优先使用服务器返回的 ETag / Last-Modified；服务器不支持时比较内容哈希。
+    返回 (response, changed)，changed 为 False 时调用方可以跳过解析。
+    """
+    store = get_validator_store()
+    key = make_validator_key(url, params)
+
+    headers = dict(kwargs.pop('headers', None) or {})
+    headers.update(store.request_headers(key))
+
+    response = get_douban_client(cookie).get(url, params=params, headers=headers, **kwargs)
+    if response.status_code not in (200, 304):
+        return response, True
+
+    return response, store.check(key, response)
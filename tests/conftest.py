@@ -0,0 +1,12 @@
+"""
+测试公共设置
+各模块在导入时读取 CONFIG_DIR，必须在导入 src 之前指向临时目录，测试不会读写真实的配置和数据文件
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+os.environ['CONFIG_DIR'] = tempfile.mkdtemp(prefix='douban-rss-test-')
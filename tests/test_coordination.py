@@ -0,0 +1,117 @@
+"""
+多工作进程协调测试：会话密钥共用、锁的检查不影响获取、定时器响应其他进程保存的配置
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+from src.utils.coordination import ProcessLock, load_secret_key
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def run_python(code):
+    """在另一个进程中（使用相同的配置目录）运行代码，返回输出的最后一行"""
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=dict(os.environ, PYTHONPATH=ROOT),
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def test_workers_share_the_session_key():
+    from src.api.api import app
+
+    # 另一个工作进程签名的登录状态在本进程中有效
+    cookie = run_python(
+        "from src.api.api import app\n"
+        "print(app.session_interface.get_signing_serializer(app).dumps({'logged_in': True}))"
+    )
+    assert app.session_interface.get_signing_serializer(app).loads(cookie) == {'logged_in': True}
+
+
+def test_secret_key_is_created_once(tmp_path):
+    file_path = str(tmp_path / 'secret_key')
+    key = load_secret_key(file_path)
+    assert len(key) == 32
+    assert load_secret_key(file_path) == key
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.tmp')]
+
+
+def test_status_probes_do_not_block_acquire(tmp_path):
+    lock_file = str(tmp_path / 'parser.lock')
+    # 另一个进程不停地检查锁状态（例如各工作进程的状态页和定时器）
+    prober = subprocess.Popen([sys.executable, '-c', (
+        "import sys, time\n"
+        "from src.utils.coordination import ProcessLock\n"
+        "lock = ProcessLock(sys.argv[1])\n"
+        "end = time.monotonic() + 3\n"
+        "while time.monotonic() < end:\n"
+        "    lock.locked()\n"
+    ), lock_file], cwd=ROOT, env=dict(os.environ, PYTHONPATH=ROOT))
+    try:
+        time.sleep(0.5)
+        lock = ProcessLock(lock_file)
+        end = time.monotonic() + 1.5
+        while time.monotonic() < end:
+            assert lock.acquire()
+            lock.release()
+    finally:
+        prober.wait()
+
+
+def test_acquire_fails_while_held_elsewhere(tmp_path):
+    lock_file = str(tmp_path / 'parser.lock')
+    holder, other = ProcessLock(lock_file), ProcessLock(lock_file)
+    assert holder.acquire()
+    assert other.locked()
+    assert not other.acquire(retry_seconds=0.1)
+    holder.release()
+    assert not other.locked()
+    assert other.acquire()
+
+
+def wait_for(predicate, timeout):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if predicate():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def test_interval_saved_by_another_worker_reaches_the_scheduler(tmp_path):
+    config_dir = str(tmp_path)
+    config_file = tmp_path / 'config.json'
+    marker = tmp_path / 'parser_ran'
+    config_file.write_text(json.dumps({'update_interval': 3600, 'monitors': {}}), encoding='utf-8')
+    env = dict(os.environ, PYTHONPATH=ROOT, CONFIG_DIR=config_dir)
+
+    # 工作进程 A 持有调度锁，按 3600 秒的更新间隔等待
+    leader = subprocess.Popen([sys.executable, '-c', (
+        "import sys, time\n"
+        "import src.api.api as api\n"
+        "api.CONFIG_CHECK_SECONDS = 1\n"
+        "api.run_parser = lambda **kwargs: open(sys.argv[1], 'w').close()\n"
+        "api.start_scheduler()\n"
+        "time.sleep(20)\n"
+    ), str(marker)], cwd=ROOT, env=env)
+    try:
+        assert wait_for(lambda: (tmp_path / 'parser_status.json').exists(), 10)
+
+        # 工作进程 B 保存新的更新间隔并重启定时器（只影响 B 自己的定时器线程）
+        subprocess.run([sys.executable, '-c', (
+            "import json, os\n"
+            "import src.api.api as api\n"
+            "config = api.load_config()\n"
+            "config['update_interval'] = 1\n"
+            "with open(api.CONFIG_FILE, 'w', encoding='utf-8') as f:\n"
+            "    json.dump(config, f)\n"
+            "assert api.app.test_client().post('/restart_scheduler').get_json()['status'] == 'success'\n"
+        )], cwd=ROOT, env=env, check=True)
+
+        assert wait_for(marker.exists, 8)
+    finally:
+        leader.kill()
+        leader.wait()
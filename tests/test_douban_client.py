@@ -0,0 +1,55 @@
+"""
+豆瓣客户端测试：请求共用会话并按主机统计，检测 Cookie 不改动共享客户端
+"""
+
+from unittest import mock
+
+import pytest
+import requests
+
+from src.utils.douban_client import DoubanClient, DEFAULT_TIMEOUT
+from src.utils.pacing import Pacer
+
+
+def make_response(status_code=200, content=b''):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    return response
+
+
+def test_requests_use_default_timeout_and_count_per_host():
+    client = DoubanClient('bid=1', pacer=Pacer(requests_per_second=1000))
+    with mock.patch.object(client.session, 'request', return_value=make_response(content=b'x' * 10)) as send:
+        client.get('https://movie.douban.com/subject/1/')
+        with pytest.raises(requests.ConnectionError):
+            send.side_effect = requests.ConnectionError()
+            client.get('https://movie.douban.com/subject/2/')
+
+    assert send.call_args.kwargs['timeout'] == DEFAULT_TIMEOUT
+    stats = client.get_stats()['movie.douban.com']
+    assert stats['requests'] == 2
+    assert stats['errors'] == 1
+    assert stats['bytes'] == 10
+
+
+def test_set_cookie_updates_shared_headers():
+    client = DoubanClient('bid=1')
+    assert client.session.headers['Cookie'] == 'bid=1'
+
+    client.set_cookie('bid=2')
+    assert client.session.headers['Cookie'] == 'bid=2'
+
+
+def test_check_cookie_leaves_shared_client_cookie():
+    from src.api import api
+    from src.utils.douban_client import get_douban_client
+
+    shared = get_douban_client('bid=shared')
+    page = make_response(content='<a>我的豆瓣</a>'.encode('utf-8'))
+    with mock.patch.object(requests.Session, 'request', return_value=page):
+        response = api.app.test_client().post('/check_cookie', json={'cookie': 'bid=checked'})
+
+    assert response.get_json()['status'] == 'success'
+    assert shared.cookie == 'bid=shared'
+    assert shared.session.headers['Cookie'] == 'bid=shared'
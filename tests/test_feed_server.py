@@ -0,0 +1,130 @@
+"""
+订阅接口条件请求测试：内容没有变化的轮询返回 304，不打开订阅文件，也不重复查询条目缓存版本
+"""
+
+import json
+import os
+from unittest import mock
+
+from src.api import response_cache
+from src.api.api import MOVIES_FILE, app
+from src.utils.feeds import artifact_path, write_feeds
+from src.utils.subject_store import SqliteSubjectStore, get_subject_reader
+
+
+def write_movies():
+    items = [{'id': str(3000 + index), 'title': f'电影{index}', 'imdb_id': f'tt{index:07d}',
+              'cover_url': f'https://img1.doubanio.com/{index}.jpg', 'type': 'movie'} for index in range(20)]
+    with open(MOVIES_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'user1': {'movies': items, 'tv_shows': []}}, f, ensure_ascii=False)
+
+
+def test_artifact_poll_is_answered_without_opening_the_file():
+    write_movies()
+    write_feeds(MOVIES_FILE)
+    client = app.test_client()
+
+    first = client.get('/rss/movies', headers={'Accept-Encoding': 'gzip'})
+    assert first.status_code == 200
+    assert first.headers['Content-Encoding'] == 'gzip'
+
+    with mock.patch('src.api.feed_server.send_file') as send_file, \
+            mock.patch('src.utils.data_reader.os.stat', wraps=os.stat) as stat:
+        again = client.get('/rss/movies', headers={'Accept-Encoding': 'gzip', 'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    send_file.assert_not_called()
+    # 数据文件、增量日志、条目缓存标记文件和 gzip 订阅文件各一次
+    assert stat.call_count == 4
+
+    # 原文件和压缩版本的 ETag 不同
+    plain = client.get('/rss/movies')
+    assert plain.status_code == 200 and 'Content-Encoding' not in plain.headers
+    assert plain.headers['ETag'] != first.headers['ETag']
+
+
+def test_cached_poll_reuses_the_store_version():
+    write_movies()
+    client = app.test_client()
+    reader = get_subject_reader()
+    # 带分页参数的请求不使用订阅文件，走响应缓存
+    first = client.get('/rss/movies?limit=5')
+    assert first.status_code == 200
+    assert len(first.get_json()) == 5
+
+    with mock.patch.object(reader, 'version', wraps=reader.version) as version:
+        for _ in range(5):
+            again = client.get('/rss/movies?limit=5', headers={'If-None-Match': first.headers['ETag']})
+            assert again.status_code == 304
+        version.assert_not_called()
+
+        # 数据文件变化后重新查询
+        write_movies()
+        os.utime(MOVIES_FILE, ns=(0, os.stat(MOVIES_FILE).st_mtime_ns + 1_000_000))
+        assert client.get('/rss/movies?limit=5', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+        # 检查版本一次，重新生成时读取数据文件一次
+        assert version.call_count == 2
+    assert response_cache.get_stats()['misses'] >= 2
+
+
+def test_built_response_poll_returns_304():
+    write_movies()
+    write_feeds(MOVIES_FILE)
+    # 数据文件比订阅文件新时按请求生成
+    mtime = os.stat(artifact_path(MOVIES_FILE, '/rss/movies')).st_mtime + 1
+    os.utime(MOVIES_FILE, (mtime, mtime))
+    client = app.test_client()
+
+    first = client.get('/rss/movies')
+    assert first.status_code == 200
+    assert len(first.get_json()) == 20
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    again = client.get('/rss/movies', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    modified = client.get('/rss/movies', headers={'If-Modified-Since': first.headers['Last-Modified']})
+    assert modified.status_code == 304
+
+
+def test_cached_response_expires_when_another_process_writes_the_subject_store(tmp_path):
+    write_movies()
+    client = app.test_client()
+    first = client.get('/rss/movies?limit=5')
+    assert client.get('/rss/movies?limit=5', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+
+    # 另一个连接（相当于其他进程）写入条目缓存，不必等到下次查询条目缓存版本
+    store = SqliteSubjectStore(str(tmp_path / 'subject_cache.db'), legacy_json_path=None)
+    try:
+        store.upsert('3000', {'title': '电影0'})
+    finally:
+        store.close()
+    assert client.get('/rss/movies?limit=5', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+
+def test_not_modified_polls_are_counted_separately():
+    write_movies()
+    client = app.test_client()
+    first = client.get('/rss/movies?offset=1')
+    # 响应发送完成后才缓存
+    assert len(first.get_json()) == 19
+    stats = response_cache.get_stats()['routes']['/rss/movies']
+    misses, hits, not_modified = stats['misses'], stats['hits'], stats['not_modified']
+
+    for _ in range(3):
+        assert client.get('/rss/movies?offset=1', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    assert client.get('/rss/movies?offset=1').status_code == 200
+
+    stats = response_cache.get_stats()['routes']['/rss/movies']
+    assert stats['not_modified'] == not_modified + 3
+    assert stats['misses'] == misses
+    assert stats['hits'] == hits + 1
+
+
+def test_cache_stats_requires_login():
+    client = app.test_client()
+    assert client.get('/cache_stats').get_json() == {"status": "error", "message": "未登录"}
+
+    with client.session_transaction() as session:
+        session['logged_in'] = True
+    stats = client.get('/cache_stats').get_json()
+    assert 'not_modified' in stats['response_cache']
+    assert 'negative_cache' in stats
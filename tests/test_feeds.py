@@ -0,0 +1,145 @@
+"""
+订阅文件测试：解析器运行后写入订阅文件及压缩版本，接口在文件不早于数据文件和条目缓存时直接发送，否则按请求生成；
+未配置站点地址时 RSS 订阅文件在第一次请求时生成
+"""
+
+import gzip
+import json
+import os
+from unittest import mock
+
+from flask import Flask
+
+from src.api.api import HOT_MOVIES_FILE, app
+from src.api.rss_api import register_rss_routes
+from src.utils import feeds
+from src.utils.feeds import artifact_path, convert_to_radarr_format, is_artifact_fresh, write_feeds
+from src.utils.journal import journal_path
+from src.utils.subject_store import UPDATED_FILE, SqliteSubjectStore, mark_updated
+
+MOVIES = [{'id': str(4000 + index), 'title': f'热门电影{index}', 'year': '2024', 'type': 'movie',
+           'cover_url': f'https://img1.doubanio.com/{index}.jpg'} for index in range(3)]
+
+
+def write_hot_movies(file_path):
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump({'movies': MOVIES, 'tv_shows': []}, f, ensure_ascii=False)
+
+
+def set_mtime(file_path, seconds):
+    os.utime(file_path, (seconds, seconds))
+
+
+def reset_store_marker():
+    """把条目缓存标记文件改为很早以前，之前的测试写入的条目缓存不影响订阅文件是否过期"""
+    mark_updated()
+    set_mtime(UPDATED_FILE, 0)
+
+
+def test_write_feeds_writes_json_and_gzip(tmp_path):
+    source_file = str(tmp_path / 'hot_movies.json')
+    write_hot_movies(source_file)
+
+    # 没有站点地址时只生成 JSON 订阅
+    assert write_feeds(source_file, base_url='') == 2
+    file_path = artifact_path(source_file, '/rss/hot_movies')
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    assert json.loads(raw) == convert_to_radarr_format(MOVIES)
+    with gzip.open(file_path + '.gz', 'rb') as f:
+        assert f.read() == raw
+    assert not os.path.exists(artifact_path(source_file, '/rsshub/hot_movies'))
+
+    assert write_feeds(source_file, base_url='http://nas:9150/') == 4
+    with open(artifact_path(source_file, '/rsshub/hot_movies'), 'r', encoding='utf-8') as f:
+        assert '<link>http://nas:9150/rsshub/hot_movies</link>' in f.read()
+
+
+def test_artifact_is_stale_after_data_or_journal_changes(tmp_path):
+    source_file = str(tmp_path / 'hot_movies.json')
+    write_hot_movies(source_file)
+    reset_store_marker()
+    write_feeds(source_file, base_url='')
+    file_path = artifact_path(source_file, '/rss/hot_movies')
+    set_mtime(source_file, 1_000)
+    set_mtime(file_path, 1_010)
+    assert is_artifact_fresh(file_path, source_file)
+
+    with open(journal_path(source_file), 'w', encoding='utf-8') as f:
+        f.write('')
+    set_mtime(journal_path(source_file), 1_020)
+    assert not is_artifact_fresh(file_path, source_file)
+
+    os.remove(journal_path(source_file))
+    assert is_artifact_fresh(file_path, source_file)
+    set_mtime(source_file, 1_020)
+    assert not is_artifact_fresh(file_path, source_file)
+
+
+def test_artifact_is_stale_after_another_process_writes_the_subject_store(tmp_path):
+    source_file = str(tmp_path / 'hot_movies.json')
+    write_hot_movies(source_file)
+    reset_store_marker()
+    write_feeds(source_file, base_url='')
+    file_path = artifact_path(source_file, '/rss/hot_movies')
+    set_mtime(source_file, 1_000)
+    set_mtime(file_path, 1_010)
+    assert is_artifact_fresh(file_path, source_file)
+
+    # 另一个连接（相当于其他进程）写入条目缓存后更新标记文件
+    store = SqliteSubjectStore(str(tmp_path / 'subject_cache.db'), legacy_json_path=None)
+    try:
+        store.upsert('4000', {'title': '热门电影0', 'year': '2024'})
+    finally:
+        store.close()
+    assert not is_artifact_fresh(file_path, source_file)
+
+
+def test_rss_artifact_is_built_on_first_request_without_base_url():
+    write_hot_movies(HOT_MOVIES_FILE)
+    reset_store_marker()
+    # 没有站点地址时解析器只生成 JSON 订阅
+    write_feeds(HOT_MOVIES_FILE, base_url='')
+    file_path = artifact_path(HOT_MOVIES_FILE, '/rsshub/hot_movies')
+    assert not os.path.exists(file_path)
+    rss_app = Flask(__name__)
+    register_rss_routes(rss_app)
+    client = rss_app.test_client()
+
+    first = client.get('/rsshub/hot_movies', base_url='http://nas:9150')
+    assert first.status_code == 200
+    assert b'<link>http://nas:9150/rsshub/hot_movies</link>' in first.data
+    with open(file_path, 'rb') as f:
+        assert f.read() == first.data
+    # 订阅文件的修改时间为数据的更新时间，数据有更新时会过期
+    assert os.stat(file_path).st_mtime_ns == os.stat(HOT_MOVIES_FILE).st_mtime_ns
+
+    # 之后的请求直接发送订阅文件，不再生成
+    with mock.patch('src.utils.feeds.build_feed') as build_feed:
+        again = client.get('/rsshub/hot_movies', base_url='http://nas:9150')
+    build_feed.assert_not_called()
+    assert again.data == first.data
+    assert again.headers['ETag'] == first.headers['ETag']
+
+    # 条目缓存有写入后重新生成
+    mark_updated()
+    with mock.patch('src.utils.feeds.build_feed', wraps=feeds.build_feed) as build_feed:
+        assert client.get('/rsshub/hot_movies', base_url='http://nas:9150').status_code == 200
+    build_feed.assert_called_once()
+
+
+def test_route_sends_fresh_artifact_and_rebuilds_stale_one():
+    write_hot_movies(HOT_MOVIES_FILE)
+    reset_store_marker()
+    write_feeds(HOT_MOVIES_FILE, base_url='')
+    client = app.test_client()
+
+    # 订阅文件是最新的时直接发送文件内容
+    file_path = artifact_path(HOT_MOVIES_FILE, '/rss/hot_movies')
+    with open(file_path, 'w', encoding='utf-8') as f:
+        json.dump([{'title': 'from artifact'}], f)
+    assert client.get('/rss/hot_movies').get_json() == [{'title': 'from artifact'}]
+
+    # 数据文件更新后按请求生成
+    set_mtime(HOT_MOVIES_FILE, os.stat(file_path).st_mtime + 1)
+    assert client.get('/rss/hot_movies').get_json() == convert_to_radarr_format(MOVIES)
@@ -0,0 +1,115 @@
+"""
+条目元数据规范化测试：数据文件只保存成员记录，读取后的数据和订阅内容与原来相同
+"""
+
+import copy
+import json
+import os
+
+from src.utils.douban_utils import load_json_data, save_json_data
+from src.utils.feeds import build_feed
+from src.utils.item_metadata import STRIPPED_KEY, normalize_records
+from src.utils.journal import op_upsert
+from src.utils.subject_store import MemoryCachedSubjectStore, SqliteSubjectStore, get_subject_store
+
+CONFIG_DIR = os.environ['CONFIG_DIR']
+
+INFO = {
+    'type': 'movie', 'imdb_id': 'tt0000001', 'year': '2020', 'director': ['导演'],
+    'actors': ['演员甲', '演员乙'], 'genres': ['剧情'], 'region': '中国大陆', 'languages': ['汉语普通话'],
+    'duration': '120分钟', 'release_date': '2020-01-01', 'vote_count': 1000, 'episodes_info': ''
+}
+
+
+def wish_item(subject_id, title):
+    """与原来 parse_movie_item 生成的记录结构相同：没有 year 等元数据字段"""
+    return {
+        'title': title, 'subtitle': '', 'full_title': title, 'info': ['2020-01-01', '导演'],
+        'date_added': '2024-01-01', 'cover_url': f'https://img1.doubanio.com/{subject_id}.jpg',
+        'url': f'https://movie.douban.com/subject/{subject_id}/', 'playable': False,
+        'type': 'movie', 'id': subject_id, 'imdb_id': 'tt0000001'
+    }
+
+
+def feed_bytes(data):
+    return b''.join(build_feed('/rss/movies', data, 'http://localhost/rss/movies'))
+
+
+def read_bytes(file_path):
+    with open(file_path, 'rb') as f:
+        return f.read()
+
+
+def test_baseline_file_round_trips_unchanged():
+    get_subject_store().upsert('1001', dict(INFO))
+    original = {'user1': {'movies': [wish_item('1001', '电影')], 'tv_shows': [], 'update_time': ''}}
+    file_path = os.path.join(CONFIG_DIR, 'movies.json')
+
+    save_json_data(copy.deepcopy(original), file_path)
+    first_save = read_bytes(file_path)
+    loaded = load_json_data(file_path, {})
+
+    # 原来没有的字段不会从条目缓存补上，订阅中的标题也不会多出年份
+    assert loaded == original
+    assert feed_bytes(loaded) == feed_bytes(original)
+
+    save_json_data(loaded, file_path)
+    assert read_bytes(file_path) == first_save
+
+
+def test_stripped_fields_are_restored():
+    get_subject_store().upsert('1002', dict(INFO))
+    item = dict(wish_item('1002', '电影二'), year='2020', genres=['剧情'])
+    original = {'user1': {'movies': [item], 'tv_shows': [], 'update_time': ''}}
+    file_path = os.path.join(CONFIG_DIR, 'status.json')
+
+    save_json_data(copy.deepcopy(original), file_path)
+    with open(file_path, encoding='utf-8') as f:
+        record = json.load(f)['user1']['movies'][0]
+    assert 'year' not in record and 'genres' not in record
+    assert record[STRIPPED_KEY] == ['genres', 'year']
+
+    assert load_json_data(file_path, {}) == original
+
+
+def test_missing_cache_keeps_imdb_id(capsys):
+    store = get_subject_store()
+    store.upsert('1003', dict(INFO))
+    item = dict(wish_item('1003', '电影三'), year='2020')
+    original = {'user1': {'movies': [item], 'tv_shows': [], 'update_time': ''}}
+    file_path = os.path.join(CONFIG_DIR, 'hot_movies.json')
+    save_json_data(copy.deepcopy(original), file_path)
+
+    # 条目缓存丢失：imdb_id 仍在成员记录中，缺少的字段有警告
+    store.delete('1003')
+    store.flush()
+    loaded = load_json_data(file_path, {})
+    item = loaded['user1']['movies'][0]
+    assert item['imdb_id'] == 'tt0000001'
+    assert 'year' not in item
+    assert b'tt0000001' in feed_bytes(loaded)
+    assert '找不到元数据' in capsys.readouterr().out
+
+    # 再次保存不会丢掉需要补全的字段，条目缓存恢复后重新补全
+    save_json_data(loaded, file_path)
+    store.upsert('1003', dict(INFO))
+    assert load_json_data(file_path, {}) == original
+
+
+def test_journal_records_flush_only_the_stripped_items(tmp_path):
+    backing = SqliteSubjectStore(str(tmp_path / 'subject_cache.db'), legacy_json_path=None)
+    store = MemoryCachedSubjectStore(backing, flush_every=100, flush_interval=None)
+    for subject_id in ('1004', '1005', '1006'):
+        store.upsert(subject_id, dict(INFO))
+
+    records = [op_upsert(['user1', 'movies'], dict(wish_item('1004', '电影四'), year='2020')),
+               op_upsert(['user1', 'movies'], wish_item('1005', '电影五'))]
+    normalized = normalize_records(records, store)
+
+    # 去掉了元数据字段的条目先写入存储，其他条目仍等待批量写回
+    assert normalized[0]['value'][STRIPPED_KEY] == ['year']
+    assert STRIPPED_KEY not in normalized[1]['value']
+    assert backing.get('1004') is not None
+    assert backing.get('1005') is None and backing.get('1006') is None
+    store.close()
+    backing.close()
@@ -0,0 +1,51 @@
+"""
+增量日志测试：日志超过阈值时合并回快照
+"""
+
+import json
+import os
+
+from src.utils import journal
+from src.utils.douban_utils import load_json_data
+from src.utils.journal import append_journal, journal_path, op_set, op_upsert
+
+
+def test_journal_below_threshold_leaves_snapshot_alone(tmp_path):
+    file_path = str(tmp_path / 'state.json')
+    data = {'items': [{'id': '1'}]}
+
+    append_journal(file_path, [op_upsert(['items'], {'id': '1'})], data)
+
+    assert not os.path.exists(file_path)
+    assert os.path.exists(journal_path(file_path))
+    assert load_json_data(file_path, {}) == data
+
+
+def test_journal_over_threshold_is_compacted_into_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal, 'JOURNAL_COMPACT_BYTES', 200)
+    file_path = str(tmp_path / 'state.json')
+    data = {}
+
+    appended = 0
+    while os.path.exists(journal_path(file_path)) or not appended:
+        item = {'id': str(appended), 'title': 'x' * 20}
+        data.setdefault('items', []).append(item)
+        append_journal(file_path, [op_upsert(['items'], item)], data)
+        appended += 1
+        assert appended < 20
+
+    # 第一条记录不足阈值，之后某次追加超过阈值时合并并删除日志
+    assert appended > 1
+    with open(file_path, 'r', encoding='utf-8') as f:
+        assert json.load(f) == data
+    assert load_json_data(file_path, {}) == data
+
+
+def test_journal_without_data_is_not_compacted(tmp_path, monkeypatch):
+    monkeypatch.setattr(journal, 'JOURNAL_COMPACT_BYTES', 10)
+    file_path = str(tmp_path / 'state.json')
+
+    append_journal(file_path, [op_set(['last_run'], '2024-01-01')])
+
+    assert not os.path.exists(file_path)
+    assert load_json_data(file_path, {}) == {'last_run': '2024-01-01'}
@@ -0,0 +1,52 @@
+"""
+失败结果缓存测试：有效期内跳过请求，过期后重新尝试，多个进程的记录合并保存
+"""
+
+from src.utils.negative_cache import (NegativeCache, REASON_NOT_FOUND, REASON_NO_SUBJECT,
+                                      subject_key, trailer_key)
+
+NOW = 1_700_000_000
+
+
+def test_entry_is_skipped_until_ttl_expires(tmp_path):
+    cache = NegativeCache(str(tmp_path / 'negative_cache.json'))
+    cache.add(subject_key('1'), REASON_NOT_FOUND, ttl_hours=2, now=NOW)
+
+    assert cache.get(subject_key('1'), now=NOW + 2 * 3600 - 1)['reason'] == REASON_NOT_FOUND
+    assert cache.get(subject_key('1'), now=NOW + 2 * 3600) is None
+    assert cache.get(subject_key('2'), now=NOW) is None
+    assert cache.get_stats(now=NOW)['hits'] == {REASON_NOT_FOUND: 1}
+
+
+def test_zero_ttl_disables_caching(tmp_path):
+    cache = NegativeCache(str(tmp_path / 'negative_cache.json'))
+    cache.add(subject_key('1'), REASON_NOT_FOUND, ttl_hours=0, now=NOW)
+
+    assert cache.get(subject_key('1'), now=NOW) is None
+    assert not (tmp_path / 'negative_cache.json').exists()
+
+
+def test_ttl_defaults_to_config(tmp_path, monkeypatch):
+    from src.utils import douban_utils
+    monkeypatch.setattr(douban_utils, 'load_config', lambda: {'negative_cache_ttl_hours': 1})
+    cache = NegativeCache(str(tmp_path / 'negative_cache.json'))
+    cache.add(trailer_key('9'), REASON_NO_SUBJECT, now=NOW)
+
+    assert cache.get(trailer_key('9'), now=NOW + 3599) is not None
+    assert cache.get(trailer_key('9'), now=NOW + 3600) is None
+
+
+def test_writes_merge_with_other_processes_and_drop_expired(tmp_path):
+    file_path = str(tmp_path / 'negative_cache.json')
+    first = NegativeCache(file_path)
+    second = NegativeCache(file_path)
+
+    first.add(subject_key('1'), REASON_NOT_FOUND, ttl_hours=1, now=NOW)
+    second.add(subject_key('2'), REASON_NOT_FOUND, ttl_hours=1, now=NOW)
+    assert second.get(subject_key('1'), now=NOW) is not None
+
+    # 后写入时清理已过期的记录
+    first.add(subject_key('3'), REASON_NOT_FOUND, ttl_hours=1, now=NOW + 3600)
+    stats = NegativeCache(file_path).get_stats(now=NOW + 3600)
+    assert stats['entries'] == 1
+    assert stats['by_reason'] == {REASON_NOT_FOUND: 1}
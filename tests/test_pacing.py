@@ -0,0 +1,56 @@
+"""
+请求节奏测试：限流时成倍降速、成功时逐步恢复，请求按当前速率分配时间槽
+"""
+
+from unittest import mock
+
+from src.utils import pacing
+from src.utils.pacing import Pacer, BACKOFF_FACTOR, RECOVERY_STEP
+
+
+def test_backoff_halves_rate_down_to_min_rate():
+    pacer = Pacer(requests_per_second=0.4, min_rate=0.1)
+
+    pacer.record(429)
+    assert pacer.current_rate() == 0.4 * BACKOFF_FACTOR
+    pacer.record(403)
+    assert pacer.current_rate() == 0.1
+    pacer.record(429)
+    assert pacer.current_rate() == 0.1
+    assert pacer.get_stats()['backoffs'] == 3
+
+
+def test_recovery_is_additive_and_capped_at_max_rate():
+    pacer = Pacer(requests_per_second=0.5, min_rate=0.05)
+    pacer.record(429)
+    throttled = pacer.current_rate()
+
+    pacer.record(200)
+    assert abs(pacer.current_rate() - (throttled + RECOVERY_STEP)) < 1e-9
+    pacer.record(404)
+    assert abs(pacer.current_rate() - (throttled + 2 * RECOVERY_STEP)) < 1e-9
+
+    # 服务器错误不影响速率
+    pacer.record(500)
+    assert abs(pacer.current_rate() - (throttled + 2 * RECOVERY_STEP)) < 1e-9
+
+    for _ in range(100):
+        pacer.record(200)
+    assert pacer.current_rate() == 0.5
+
+
+def test_acquire_spaces_requests_by_current_rate():
+    pacer = Pacer(requests_per_second=2.0)
+    sleeps = []
+    with mock.patch.object(pacing.time, 'monotonic', return_value=100.0), \
+            mock.patch.object(pacing.time, 'sleep', side_effect=sleeps.append):
+        waits = [pacer.acquire() for _ in range(3)]
+
+        # 被限流后按降低后的速率安排下一个时间槽
+        pacer.record(429)
+        waits.append(pacer.acquire())
+
+    assert waits == [0.0, 0.5, 1.0, 1.5]
+    assert sleeps == [0.5, 1.0, 1.5]
+    assert pacer.get_stats()['requests'] == 4
+    assert pacer.get_stats()['total_wait'] == 3.0
@@ -0,0 +1,68 @@
+"""
+榜单历史保留测试：按批次数和条目数移出旧条目，并写入归档
+"""
+
+import json
+
+from src.utils.retention import apply_retention, iter_archive_segments, rotate_history
+
+NOW = 1_700_000_000
+DAY = 86400
+
+
+def ids(items):
+    return [item['id'] for item in items]
+
+
+def test_max_batches_keeps_latest_runs_across_lists():
+    data = {
+        'movies': [{'id': '1', 'last_seen': NOW - 2 * DAY}, {'id': '2', 'last_seen': NOW - DAY}],
+        'tv_shows': [{'id': '3', 'last_seen': NOW}, {'id': '4', 'last_seen': NOW - 2 * DAY}]
+    }
+
+    archived = apply_retention(data, {'max_age_days': 0, 'max_batches': 2, 'max_items': 0}, now=NOW)
+
+    assert ids(data['movies']) == ['2']
+    assert ids(data['tv_shows']) == ['3']
+    assert ids(archived['movies']) == ['1']
+    assert ids(archived['tv_shows']) == ['4']
+
+
+def test_max_items_drops_least_recently_seen_and_keeps_order():
+    data = {'movies': [
+        {'id': '1', 'last_seen': NOW},
+        {'id': '2', 'last_seen': NOW - 3 * DAY},
+        {'id': '3', 'last_seen': NOW - DAY},
+        {'id': '4', 'batch_id': NOW - 2 * DAY}
+    ]}
+
+    archived = apply_retention(data, {'max_age_days': 0, 'max_batches': 0, 'max_items': 2}, now=NOW)
+
+    assert ids(data['movies']) == ['1', '3']
+    assert ids(archived['movies']) == ['2', '4']
+
+
+def test_items_without_timestamp_start_counting_now():
+    data = {'movies': [{'id': '1'}, {'id': '2', 'last_seen': NOW - 100 * DAY}]}
+
+    archived = apply_retention(data, {'max_age_days': 90, 'max_batches': 0, 'max_items': 0}, now=NOW)
+
+    assert data['movies'] == [{'id': '1', 'last_seen': NOW}]
+    assert ids(archived['movies']) == ['2']
+
+
+def test_rotate_history_archives_before_saving(tmp_path):
+    file_path = str(tmp_path / 'retention_test.json')
+    policy = {'max_age_days': 0, 'max_batches': 1, 'max_items': 0}
+
+    first = {'movies': [{'id': '1', 'last_seen': NOW - DAY}, {'id': '2', 'last_seen': NOW}]}
+    assert rotate_history(first, file_path, policy) == 1
+    second = {'movies': [{'id': '2', 'last_seen': NOW}, {'id': '3', 'last_seen': NOW + DAY}]}
+    assert rotate_history(second, file_path, policy) == 1
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        assert ids(json.load(f)['movies']) == ['3']
+    segments = list(iter_archive_segments(file_path))
+    # 同一秒写入的归档也按写入顺序读取
+    assert [ids(segment['movies']) for segment in segments] == [['1'], ['2']]
+    assert all('archived_at' in segment for segment in segments)
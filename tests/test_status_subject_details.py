@@ -0,0 +1,62 @@
+"""
+广播条目详情测试：较早版本缓存的条目缺少封面、评分等字段时重新获取，简介列表与原来的格式相同
+"""
+
+import os
+from unittest import mock
+
+from src.parsers import parse_douban_status
+from src.utils.subject_extractor import extract_subject_info
+from src.utils.subject_store import get_subject_store
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), '..', 'benchmarks', 'fixtures')
+
+LEGACY_INFO = {'type': 'movie', 'imdb_id': 'tt0000002', 'year': '2021'}
+FULL_INFO = dict(LEGACY_INFO, title='电影 Movie', cover_url='https://img1.doubanio.com/2001.jpg',
+                 rating='8.5', description='简介', all_actors=[], release_dates=[])
+
+
+def test_legacy_entry_is_refetched_once():
+    store = get_subject_store()
+    store.upsert('2001', dict(LEGACY_INFO))
+    with mock.patch('src.utils.douban_utils.get_subject_info', return_value=dict(FULL_INFO)) as fetch:
+        details = parse_douban_status.get_subject_details('2001', 'cookie', title='广播标题')
+        assert details['cover_url'] == FULL_INFO['cover_url']
+        assert details['rating'] == '8.5'
+        assert details['title'] == '电影'
+
+        # 重新获取的结果已写入缓存，之后不再请求
+        parse_douban_status.get_subject_details('2001', 'cookie')
+        assert fetch.call_count == 1
+    assert store.get('2001')['info']['cover_url'] == FULL_INFO['cover_url']
+
+
+def test_legacy_entry_is_used_when_refetch_fails():
+    get_subject_store().upsert('2002', dict(LEGACY_INFO))
+    with mock.patch('src.utils.douban_utils.get_subject_info', return_value=None):
+        details = parse_douban_status.get_subject_details('2002', 'cookie', title='广播标题')
+    assert details['title'] == '广播标题'
+    assert details['imdb_id'] == 'tt0000002'
+
+
+def test_info_lines_prefer_mainland_date_and_list_more_actors():
+    actors = [f'演员{index}' for index in range(10)]
+    info = {'release_date': '2023-07-21(美国)', 'release_dates': ['2023-07-21(美国)', '2023-08-30(中国大陆)'],
+            'director': ['导演'], 'actors': actors[:3], 'all_actors': actors}
+
+    lines = parse_douban_status.build_info_lines(info)
+    assert lines == ['2023-08-30(中国大陆)', '导演'] + actors[:8]
+
+    # 较早版本的缓存只有第一个上映日期和前三个主演
+    legacy = {'release_date': '2023-07-21(美国)', 'director': ['导演'], 'actors': actors[:3]}
+    assert parse_douban_status.build_info_lines(legacy) == ['2023-07-21(美国)', '导演'] + actors[:3]
+
+
+def test_extractor_keeps_three_actors_and_first_date_for_other_monitors():
+    with open(os.path.join(FIXTURES_DIR, 'subject_movie.html'), encoding='utf-8') as f:
+        info = extract_subject_info(f.read())
+
+    assert info['actors'] == info['all_actors'][:3]
+    assert len(info['all_actors']) == 4
+    assert info['release_date'] == info['release_dates'][0]
+    assert info['release_dates'] == ['2023-08-30(中国大陆)', '2023-07-21(美国)']
@@ -0,0 +1,67 @@
+"""
+条目缓存过期测试：过期时间随机浮动，旧记录按条目ID推算，按过期时间顺序取出即将过期的条目
+"""
+
+import sqlite3
+
+import pytest
+
+from src.utils.subject_store import (CACHE_TTL_DAYS, CACHE_TTL_JITTER, JsonSubjectStore, SqliteSubjectStore,
+                                     is_entry_expired, legacy_expires_at, make_entry, new_expires_at)
+
+NOW = 1_700_000_000
+MIN_TTL = CACHE_TTL_DAYS * 86400 * (1 - CACHE_TTL_JITTER)
+MAX_TTL = CACHE_TTL_DAYS * 86400 * (1 + CACHE_TTL_JITTER)
+
+
+def test_new_deadlines_are_jittered_within_bounds():
+    deadlines = {new_expires_at(NOW) for _ in range(50)}
+
+    assert all(NOW + MIN_TTL <= deadline <= NOW + MAX_TTL for deadline in deadlines)
+    assert len(deadlines) > 1
+
+
+def test_legacy_deadline_is_stable_per_subject():
+    cached_at = '2024-01-01 00:00:00'
+
+    first = legacy_expires_at('1', cached_at)
+    assert first == legacy_expires_at('1', cached_at)
+    assert first != legacy_expires_at('2', cached_at)
+    assert legacy_expires_at('1', None) == 0
+    assert is_entry_expired('1', {'info': {}, 'cached_at': cached_at}, now=first)
+    assert not is_entry_expired('1', {'info': {}, 'cached_at': cached_at}, now=first - 1)
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def store(request, tmp_path):
+    if request.param == 'json':
+        store = JsonSubjectStore(str(tmp_path / 'subject_cache.json'))
+    else:
+        store = SqliteSubjectStore(str(tmp_path / 'subject_cache.db'), legacy_json_path=None)
+    yield store
+    store.close()
+
+
+def test_expiring_returns_earliest_deadlines_first(store):
+    store.upsert_many({
+        subject_id: make_entry(subject_id, {'title': subject_id}, expires_at=NOW + offset)
+        for subject_id, offset in (('a', 300), ('b', 100), ('c', 200), ('d', 10 ** 6))
+    })
+
+    assert store.expiring(NOW + 1000, 2) == [('b', NOW + 100), ('c', NOW + 200)]
+    assert [subject_id for subject_id, _ in store.expiring(NOW + 1000, 10)] == ['b', 'c', 'a']
+
+
+def test_old_database_is_backfilled_from_cached_at(tmp_path):
+    db_path = str(tmp_path / 'subject_cache.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE subjects (subject_id TEXT PRIMARY KEY, info TEXT NOT NULL, cached_at TEXT NOT NULL)')
+    conn.execute("INSERT INTO subjects VALUES ('1', '{}', '2024-01-01 00:00:00')")
+    conn.commit()
+    conn.close()
+
+    store = SqliteSubjectStore(db_path, legacy_json_path=None)
+    try:
+        assert store.get('1')['expires_at'] == legacy_expires_at('1', '2024-01-01 00:00:00')
+    finally:
+        store.close()
@@ -0,0 +1,102 @@
+"""
+条目缓存内存层测试：写入累计到 flush_every 条、定时或淘汰未写回的条目时批量写回
+"""
+
+import time
+
+from src.utils.subject_store import MemoryCachedSubjectStore
+
+
+class RecordingStore:
+    """只记录批量写入的底层存储"""
+
+    def __init__(self, fail_times=0):
+        self.entries = {}
+        self.batches = []
+        self.fail_times = fail_times
+
+    def upsert_many(self, entries):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise OSError('disk full')
+        self.batches.append(sorted(entries))
+        self.entries.update(entries)
+
+    def get(self, subject_id):
+        return self.entries.get(subject_id)
+
+    def get_many(self, subject_ids):
+        return {i: self.entries[i] for i in subject_ids if i in self.entries}
+
+
+def make_store(backing, **kwargs):
+    kwargs.setdefault('max_entries', 100)
+    kwargs.setdefault('flush_every', 100)
+    kwargs.setdefault('flush_interval', None)
+    return MemoryCachedSubjectStore(backing, **kwargs)
+
+
+def test_writes_are_batched_until_flush_every():
+    backing = RecordingStore()
+    store = make_store(backing, flush_every=3)
+
+    store.upsert('1', {'title': 'a'})
+    store.upsert('2', {'title': 'b'})
+    assert backing.batches == []
+    assert store.get('1')['info'] == {'title': 'a'}
+
+    store.upsert('3', {'title': 'c'})
+    assert backing.batches == [['1', '2', '3']]
+
+
+def test_pending_writes_are_flushed_on_interval():
+    backing = RecordingStore()
+    store = make_store(backing, flush_interval=0.05)
+    try:
+        store.upsert('1', {'title': 'a'})
+        deadline = time.monotonic() + 2
+        while not backing.batches and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert backing.batches == [['1']]
+    finally:
+        store.close()
+
+
+def test_evicting_dirty_entry_writes_it_back_first():
+    backing = RecordingStore()
+    store = make_store(backing, max_entries=2)
+
+    store.upsert('1', {'title': 'a'})
+    store.upsert('2', {'title': 'b'})
+    assert backing.batches == []
+
+    store.upsert('3', {'title': 'c'})
+    assert backing.batches == [['1', '2', '3']]
+    assert '1' not in store._entries
+    assert store.get('1')['info'] == {'title': 'a'}
+
+
+def test_failed_flush_keeps_entries_pending():
+    backing = RecordingStore(fail_times=1)
+    store = make_store(backing)
+
+    store.upsert('1', {'title': 'a'})
+    store.flush()
+    assert backing.batches == []
+
+    store.upsert('2', {'title': 'b'})
+    store.flush()
+    assert backing.batches == [['1', '2']]
+
+
+def test_flush_with_ids_writes_only_those_entries():
+    backing = RecordingStore()
+    store = make_store(backing)
+
+    for subject_id in ('1', '2', '3'):
+        store.upsert(subject_id, {'title': subject_id})
+    store.flush(['2', '4'])
+    assert backing.batches == [['2']]
+
+    store.flush()
+    assert backing.batches == [['2'], ['1', '3']]